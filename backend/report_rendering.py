@@ -0,0 +1,301 @@
+"""
+ReportLab rendering for the PDF reports.
+
+Everything here works on plain, already-aggregated data and returns PDF bytes, so it can run in
+a worker process (see run_pdf_render in server.py) without touching the database or the API's
+event loop.
+"""
+import copy
+import json
+import time
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Dict, Iterable, List, Tuple
+from xml.sax.saxutils import escape
+
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.legends import Legend
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import landscape, letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+# Rows per table in the detailed report; platypus only ever holds one chunk (plus a split remainder)
+DETAILED_CHUNK_ROWS = 200
+DETAILED_HEADER = ["Submitted At", "Location", "Template", "Submitted By", "Status", "Form Data"]
+DETAILED_COL_WIDTHS = [1.2*72, 1.3*72, 1.4*72, 1.1*72, 0.8*72, 3.2*72]
+
+CHART_WIDTH = 6*72
+CHART_HEIGHT = 3*72
+CHART_MAX_LOCATIONS = 12  # busiest locations shown in the bar chart; the breakdown table lists them all
+CHART_SERIES = [("Total", colors.HexColor("#4e79a7")), ("Approved", colors.HexColor("#59a14f"))]
+
+
+class LazyStory(list):
+    """A story that pulls flowables from an iterator as platypus consumes them.
+
+    The build loop checks len() before taking flowables[0], so refilling there keeps only the
+    flowable being laid out (and any split remainder platypus pushes back) in memory.
+    """
+    def __init__(self, flowables: Iterable):
+        super().__init__()
+        self._source = iter(flowables)
+
+    def __len__(self):
+        if not list.__len__(self):
+            flowable = next(self._source, None)
+            if flowable is not None:
+                self.append(flowable)
+        return list.__len__(self)
+
+
+def report_header(report: Dict[str, Any], styles) -> List[Any]:
+    """Title and metadata table shared by every report type"""
+    story = []
+
+    # Title
+    title = Paragraph(f"CLIENT SERVICES Platform - {report['report_type'].title()} Report", styles['Title'])
+    story.append(title)
+    story.append(Spacer(1, 12))
+
+    # Report metadata
+    report_info = [
+        ["Access Scope:", report["scope"]],
+        ["Generated At:", report["generated_at"]],
+        ["Report Type:", report["report_type"].title()]
+    ]
+    report_info.extend(report.get("parameters", []))
+
+    info_table = Table(report_info, colWidths=[2*72, 4*72])
+    info_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black)
+    ]))
+
+    story.append(info_table)
+    story.append(Spacer(1, 20))
+    return story
+
+
+def chart_frame(title: str) -> Drawing:
+    drawing = Drawing(CHART_WIDTH, CHART_HEIGHT)
+    drawing.add(String(CHART_WIDTH / 2, CHART_HEIGHT - 14, title, fontName="Helvetica-Bold", fontSize=11, textAnchor="middle"))
+    legend = Legend()
+    legend.x, legend.y = CHART_WIDTH - 90, CHART_HEIGHT - 28
+    legend.fontSize = 8
+    legend.colorNamePairs = [(color, name) for name, color in CHART_SERIES]
+    drawing.add(legend)
+    return drawing
+
+
+def location_bar_chart(rows: List[List[Any]]) -> Drawing:
+    """Total and approved submissions per location, rows as [location, total, approved]"""
+    drawing = chart_frame("Submissions by Location")
+    chart = VerticalBarChart()
+    chart.x, chart.y = 40, 60
+    chart.width, chart.height = CHART_WIDTH - 150, CHART_HEIGHT - 90
+    chart.data = [[row[1] for row in rows], [row[2] for row in rows]]
+    chart.categoryAxis.categoryNames = [str(row[0])[:20] for row in rows]
+    chart.categoryAxis.labels.angle = 30
+    chart.categoryAxis.labels.boxAnchor = "ne"
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    for index, (_, color) in enumerate(CHART_SERIES):
+        chart.bars[index].fillColor = color
+    drawing.add(chart)
+    return drawing
+
+
+def month_trend_chart(rows: List[List[Any]]) -> Drawing:
+    """Total and approved submissions per month, rows as [YYYY-MM, total, approved] in month order"""
+    drawing = chart_frame("Submissions by Month")
+    chart = HorizontalLineChart()
+    chart.x, chart.y = 40, 50
+    chart.width, chart.height = CHART_WIDTH - 150, CHART_HEIGHT - 80
+    chart.data = [[row[1] for row in rows], [row[2] for row in rows]]
+    chart.categoryAxis.categoryNames = [str(row[0]) for row in rows]
+    chart.categoryAxis.labels.angle = 30
+    chart.categoryAxis.labels.boxAnchor = "ne"
+    chart.categoryAxis.labels.fontSize = 7
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.labels.fontSize = 7
+    for index, (_, color) in enumerate(CHART_SERIES):
+        chart.lines[index].strokeColor = color
+        chart.lines[index].strokeWidth = 1.5
+    drawing.add(chart)
+    return drawing
+
+
+@lru_cache(maxsize=32)
+def chart_drawings(dataset: str) -> Tuple[Drawing, ...]:
+    """Drawings for one aggregated dataset (canonical JSON, so equal data is one cache entry).
+
+    Chart widgets lay themselves out every time they are drawn; expanding them to primitive shapes
+    does that once, and every report variant built from the same aggregates in this worker reuses it.
+    """
+    charts = json.loads(dataset)
+    drawings = []
+    if charts.get("by_location"):
+        drawings.append(location_bar_chart(charts["by_location"][:CHART_MAX_LOCATIONS]))
+    if charts.get("by_month"):
+        drawings.append(month_trend_chart(charts["by_month"]))
+    return tuple(drawing.expandUserNodes() for drawing in drawings)
+
+
+def render_pdf_report(report: Dict[str, Any]) -> bytes:
+    """Build the report PDF.
+
+    report: {"report_type", "scope", "generated_at", "parameters": [[label, value], ...],
+             "statistics": {"summary": {...}, "data": [...]} or None,
+             "charts": {"by_location": [...], "by_month": [...]} or None}
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    styles = getSampleStyleSheet()
+    story = report_header(report, styles)
+
+    stats_data = report.get("statistics")
+    if stats_data:
+        # Summary section
+        summary_title = Paragraph("Summary Statistics", styles['Heading2'])
+        story.append(summary_title)
+        story.append(Spacer(1, 12))
+
+        summary_data = [
+            ["Metric", "Value"],
+            ["Total Submissions", str(stats_data["summary"]["total_submissions"])],
+            ["Approved", str(stats_data["summary"]["total_approved"])],
+            ["Reviewed", str(stats_data["summary"]["total_reviewed"])],
+            ["Pending", str(stats_data["summary"]["total_submitted"])],
+            ["Rejected", str(stats_data["summary"]["total_rejected"])],
+            ["Approval Rate", f"{stats_data['summary']['approval_rate']}%"]
+        ]
+
+        summary_table = Table(summary_data, colWidths=[3*72, 2*72])
+        summary_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+
+        story.append(summary_table)
+        story.append(Spacer(1, 20))
+
+    if report.get("charts"):
+        for drawing in chart_drawings(json.dumps(report["charts"], sort_keys=True)):
+            # Platypus leaves layout flags on the flowables it places, so each document gets a shallow
+            # copy; the shapes themselves are shared
+            story.append(copy.copy(drawing))
+            story.append(Spacer(1, 12))
+
+    if stats_data:
+        # Detailed breakdown
+        details_title = Paragraph("Detailed Breakdown", styles['Heading2'])
+        story.append(details_title)
+        story.append(Spacer(1, 12))
+
+        details_data = [["Category", "Total", "Approved", "Reviewed", "Pending", "Rejected", "Users"]]
+        for item in stats_data["data"]:
+            details_data.append([
+                str(item.get("category", "Unknown")),
+                str(item["total_submissions"]),
+                str(item["approved_count"]),
+                str(item["reviewed_count"]),
+                str(item["submitted_count"]),
+                str(item["rejected_count"]),
+                str(item["unique_user_count"])
+            ])
+
+        details_table = Table(details_data, colWidths=[1.5*72, 0.7*72, 0.7*72, 0.7*72, 0.7*72, 0.7*72, 0.7*72])
+        details_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+
+        story.append(details_table)
+
+    # Build PDF
+    doc.build(story)
+    return buffer.getvalue()
+
+
+def detailed_table(rows: List[List[str]], cell_style) -> Table:
+    data = [DETAILED_HEADER]
+    for row in rows:
+        data.append(row[:-1] + [Paragraph(escape(row[-1]), cell_style)])
+    # repeatRows keeps the header on every page the chunk spills onto
+    table = Table(data, colWidths=DETAILED_COL_WIDTHS, repeatRows=1)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.beige]),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black)
+    ]))
+    return table
+
+
+def render_detailed_report(report: Dict[str, Any]) -> bytes:
+    """Build the detailed submission PDF, reading rows lazily from an NDJSON file.
+
+    report: report_header fields plus "rows_path" (one JSON list per line, ordered as
+            DETAILED_HEADER) and "row_count"
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=landscape(letter), leftMargin=36, rightMargin=36,
+                            topMargin=36, bottomMargin=36)
+    styles = getSampleStyleSheet()
+    cell_style = ParagraphStyle("DetailCell", parent=styles["BodyText"], fontSize=7, leading=8.5)
+
+    def story():
+        yield from report_header(report, styles)
+        yield Paragraph(f"Submissions ({report['row_count']})", styles['Heading2'])
+        yield Spacer(1, 12)
+        chunk = []
+        with open(report["rows_path"], encoding="utf-8") as rows:
+            for line in rows:
+                chunk.append(json.loads(line))
+                if len(chunk) >= DETAILED_CHUNK_ROWS:
+                    yield detailed_table(chunk, cell_style)
+                    chunk = []
+        if chunk:
+            yield detailed_table(chunk, cell_style)
+        elif not report["row_count"]:
+            yield Paragraph("No submissions match these filters.", styles['BodyText'])
+
+    doc.build(LazyStory(story()))
+    return buffer.getvalue()
+
+
+def timed_render(render, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Run a renderer in the worker and report when it started, for queue-wait metrics"""
+    started_at = time.time()
+    content = render(payload)
+    return {"content": content, "started_at": started_at, "render_seconds": time.time() - started_at}
+
+
+def warm_up() -> bool:
+    """No-op submitted to each worker at startup so the first report doesn't pay for imports"""
+    return True
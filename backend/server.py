@@ -1,27 +1,51 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Form, Header, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from bson import json_util
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import jwt
 import bcrypt
 import csv
 import io
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib import colors
+try:
+    from .report_rendering import render_detailed_report, render_pdf_report, timed_render, warm_up
+except ImportError:
+    # Run as a top-level module (uvicorn server:app from backend/)
+    from report_rendering import render_detailed_report, render_pdf_report, timed_render, warm_up
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+import zstandard
 import shutil
 from functools import lru_cache
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import asyncio
 import time
+import base64
+import secrets
+import json
+import hashlib
+import math
+import re
+import gzip
+import zlib
+import tempfile
+import itertools
 
 # Configure logging
 logging.basicConfig(
@@ -65,6 +89,239 @@ def set_cached_data(key, data):
     """Cache data with timestamp"""
     _cache[key] = (data, time.time())
 
+# Per-collection version counters backing ETags; bumped by every write path in this process.
+# The boot id keeps tags from an earlier process (or another worker) from ever matching.
+_BOOT_ID = uuid.uuid4().hex[:8]
+_collection_versions = {}  # collection name -> counter
+
+def bump_collection_version(collection: str):
+    _collection_versions[collection] = _collection_versions.get(collection, 0) + 1
+
+def collection_etag(collection: str, scope: str = "") -> str:
+    """Strong ETag from the collection version and the caller's visibility scope"""
+    tag = f"{collection}-{_BOOT_ID}-{_collection_versions.get(collection, 0)}"
+    if scope:
+        tag += "-" + hashlib.sha1(scope.encode('utf-8')).hexdigest()[:12]
+    return f'"{tag}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")]
+    return etag in candidates
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+
+# Principal cache for authenticated users (bounded LRU with TTL)
+PRINCIPAL_CACHE_MAX_SIZE = int(os.environ.get('PRINCIPAL_CACHE_MAX_SIZE', '1024'))
+PRINCIPAL_CACHE_TTL = int(os.environ.get('PRINCIPAL_CACHE_TTL', '60'))
+_principal_cache = OrderedDict()  # (user_id, version) -> (User, timestamp)
+_principal_versions = {}  # user_id -> version stamp, bumped on every user mutation
+_principal_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+# Shared user id -> username directory for enriching listings (user_id -> (username, timestamp))
+_username_directory = {}
+
+# Token version map for JWT revocation (user_id -> (token_version, timestamp))
+TOKEN_VERSION_CACHE_TTL = int(os.environ.get('TOKEN_VERSION_CACHE_TTL', '30'))
+_token_version_cache = {}
+
+def get_cached_principal(user_id: str):
+    """Get cached User for the current version stamp if not expired"""
+    key = (user_id, _principal_versions.get(user_id, 0))
+    entry = _principal_cache.get(key)
+    if entry:
+        user, timestamp = entry
+        if time.time() - timestamp < PRINCIPAL_CACHE_TTL:
+            _principal_cache.move_to_end(key)
+            _principal_cache_stats["hits"] += 1
+            return user
+        del _principal_cache[key]
+    _principal_cache_stats["misses"] += 1
+    return None
+
+def set_cached_principal(user_id: str, user, version: int):
+    """Cache User under the version stamp read before the DB lookup"""
+    # A mutation raced with the lookup; don't cache what may be stale data
+    if _principal_versions.get(user_id, 0) != version:
+        return
+    _principal_cache[(user_id, version)] = (user, time.time())
+    _principal_cache.move_to_end((user_id, version))
+    while len(_principal_cache) > PRINCIPAL_CACHE_MAX_SIZE:
+        _principal_cache.popitem(last=False)
+        _principal_cache_stats["evictions"] += 1
+
+def invalidate_principal(user_id: str):
+    """Drop cached User and bump its version stamp so in-flight lookups are not cached"""
+    version = _principal_versions.get(user_id, 0)
+    _principal_versions[user_id] = version + 1
+    _principal_cache.pop((user_id, version), None)
+    _token_version_cache.pop(user_id, None)
+    _username_directory.pop(user_id, None)
+    _principal_cache_stats["invalidations"] += 1
+
+def get_principal_cache_stats() -> Dict[str, Any]:
+    lookups = _principal_cache_stats["hits"] + _principal_cache_stats["misses"]
+    return {
+        **_principal_cache_stats,
+        "size": len(_principal_cache),
+        "max_size": PRINCIPAL_CACHE_MAX_SIZE,
+        "ttl_seconds": PRINCIPAL_CACHE_TTL,
+        "hit_rate": round((_principal_cache_stats["hits"] / lookups * 100) if lookups > 0 else 0, 2)
+    }
+
+# Submission list pagination
+SUBMISSIONS_PAGE_SIZE = int(os.environ.get('SUBMISSIONS_PAGE_SIZE', '100'))
+SUBMISSIONS_MAX_PAGE_SIZE = int(os.environ.get('SUBMISSIONS_MAX_PAGE_SIZE', '500'))
+SUBMISSIONS_SORT = [("submitted_at", -1), ("id", -1)]
+# Columns the Reports table renders; the summary view never materializes form_data
+SUBMISSION_SUMMARY_FIELDS = ["id", "template_id", "service_location", "month_year", "submitted_by", "submitted_at", "status"]
+SUBMISSION_FIELDS = SUBMISSION_SUMMARY_FIELDS + ["form_data", "attachments", "updated_at", "updated_by"]
+
+# Bulk submission import
+IMPORT_BATCH_SIZE = int(os.environ.get('IMPORT_BATCH_SIZE', '1000'))
+IMPORT_MAX_ERRORS = int(os.environ.get('IMPORT_MAX_ERRORS', '1000'))  # per-row errors returned in the report
+MONTH_YEAR_FORMAT = "%Y-%m"
+
+SUBMISSION_STATUSES = ["submitted", "reviewed", "approved", "rejected"]
+BULK_STATUS_MAX_IDS = int(os.environ.get('BULK_STATUS_MAX_IDS', '5000'))
+
+# Full-text search over submissions: search_text is derived at write time from text-like template fields
+SEARCHABLE_FIELD_TYPES = ["text", "textarea", "select"]
+# Commas are only accepted as thousands separators; "1,5" could be a decimal comma and is rejected
+THOUSANDS_GROUPED_NUMBER = re.compile(r"[+-]?\d{1,3}(,\d{3})+(\.\d+)?")
+SEARCH_MAX_RESULTS = int(os.environ.get('SEARCH_MAX_RESULTS', '10000'))  # deepest page reachable
+REINDEX_BATCH_SIZE = int(os.environ.get('REINDEX_BATCH_SIZE', '1000'))
+_reindex_status = {"running": False, "processed": 0, "started_at": None, "finished_at": None, "error": None}
+
+# Idempotency keys for retried POSTs (stored in db.idempotency_keys, expired by a TTL index)
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', str(24 * 3600)))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+# A claim still pending after this long belongs to a request that died; a retry may take it over
+IDEMPOTENCY_CLAIM_TIMEOUT = int(os.environ.get('IDEMPOTENCY_CLAIM_TIMEOUT', '60'))
+
+# Write-behind submission ingestion. In "journal" mode create_submission acknowledges once the
+# document is fsynced to a local append-only journal; a background task group-commits journaled
+# documents to data_submissions with insert_many and deletes each segment once it is stored.
+SUBMISSION_INGEST_MODE = os.environ.get('SUBMISSION_INGEST_MODE', 'direct')  # direct | journal
+INGEST_JOURNAL_DIR = Path(os.environ.get('INGEST_JOURNAL_DIR', str(ROOT_DIR / "ingest_journal")))
+INGEST_BATCH_SIZE = int(os.environ.get('INGEST_BATCH_SIZE', '500'))
+INGEST_FLUSH_INTERVAL = float(os.environ.get('INGEST_FLUSH_INTERVAL', '0.5'))
+INGEST_COMMIT_WINDOW = float(os.environ.get('INGEST_COMMIT_WINDOW', '0.005'))  # journal group commit window
+INGEST_MAX_PENDING = int(os.environ.get('INGEST_MAX_PENDING', '20000'))
+INGEST_RETRY_AFTER = int(os.environ.get('INGEST_RETRY_AFTER', '2'))
+_ingest_queue = asyncio.Queue()  # (document, future) waiting for the journal writer
+_ingest_lock = asyncio.Lock()  # guards the active segment between the writer and the flusher
+_ingest_flush_requested = asyncio.Event()
+_ingest_state = {"segment": None, "segment_path": None, "segment_docs": [], "pending": 0, "sequence": 0}
+_ingest_sealed = deque()  # (path, documents) journaled but not yet stored
+_ingest_tasks = []
+_ingest_stats = {"journaled": 0, "flushed": 0, "batches": 0, "rejected": 0, "recovered": 0}
+
+# Exports stream from a batched cursor and flush encoded chunks of roughly this size
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_CHUNK_BYTES = int(os.environ.get('EXPORT_CHUNK_BYTES', str(64 * 1024)))
+XLSX_MAX_ROWS = 1_048_576  # rows per sheet in Excel, header included
+_export_layout_cache = {}  # (template id or "*", form_templates version) -> column layout
+
+# Export jobs run in the background and keep their artifact on disk for EXPORT_JOB_TTL; a request
+# with the same filters and scope against the same data version reuses the job instead of recomputing
+EXPORT_JOB_DIR = Path(os.environ.get('EXPORT_JOB_DIR', str(ROOT_DIR / "exports")))
+EXPORT_JOB_TTL = int(os.environ.get('EXPORT_JOB_TTL', str(6 * 3600)))
+EXPORT_JOB_MAX_CONCURRENT = int(os.environ.get('EXPORT_JOB_MAX_CONCURRENT', '2'))
+EXPORT_JOB_EVENT_INTERVAL = 0.5
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "ndjson": "application/x-ndjson",
+    "pdf": "application/pdf"
+}
+_export_jobs = {}  # job id -> job
+_export_job_keys = {}  # cache key -> job id
+_export_job_slots = asyncio.Semaphore(EXPORT_JOB_MAX_CONCURRENT)
+
+# Response compression, negotiated per request from Accept-Encoding (zstd preferred over gzip)
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', '1024'))  # smaller bodies are sent as-is
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get('COMPRESSION_ZSTD_LEVEL', '3'))
+COMPRESSIBLE_MEDIA_TYPES = ("text/csv", "text/plain", "application/json", "application/x-ndjson")
+
+# Cold-tier archival: months older than the horizon move out of data_submissions into one gzipped
+# column-oriented file per archive run, catalogued in submission_archive. Statistics and CSV exports
+# read archived months back only when their filters reach into them; statistics without a date range
+# leave archived months out unless the caller asks for them with include_archived.
+ARCHIVE_DIR = Path(os.environ.get('ARCHIVE_DIR', str(ROOT_DIR / "archive")))
+ARCHIVE_HORIZON_MONTHS = int(os.environ.get('ARCHIVE_HORIZON_MONTHS', '0'))  # 0 disables scheduled archival
+ARCHIVE_CHECK_INTERVAL = int(os.environ.get('ARCHIVE_CHECK_INTERVAL', str(24 * 3600)))
+ARCHIVE_STAGE_TTL = int(os.environ.get('ARCHIVE_STAGE_TTL', '3600'))  # how long staged months stay queryable
+ARCHIVE_STAGE_GRACE = 600  # staged rows outlive their catalog stamp so in-flight queries still see them
+ARCHIVE_COLUMNS = SUBMISSION_FIELDS + ["form_values"]
+_archive_status = {"running": False, "archived_months": [], "archived_rows": 0, "started_at": None, "finished_at": None, "error": None}
+_archive_stage_locks = {}  # catalog entry id -> lock held while that entry is staged
+_archive_task = None
+
+# Month-close report packs: once the report_deadline setting passes, a detailed PDF and a CSV per
+# active location are rendered ahead of time for the month before the deadline, catalogued in
+# report_packs and re-rendered only when that location's submissions change
+REPORT_PACK_DIR = Path(os.environ.get('REPORT_PACK_DIR', str(ROOT_DIR / "report_packs")))
+REPORT_PACK_CHECK_INTERVAL = int(os.environ.get('REPORT_PACK_CHECK_INTERVAL', '900'))  # 0 disables the scheduler
+REPORT_PACK_FORMATS = ["pdf", "csv"]
+_report_pack_status = {"running": False, "month_year": None, "rendered": [], "failed": [], "started_at": None, "finished_at": None, "error": None}
+_report_pack_checked = {}  # month_year -> data version at the last check that left no pack stale
+_report_pack_task = None
+
+# Dashboard live updates
+ALL_LOCATIONS = "*"
+DASHBOARD_STREAM_DEBOUNCE = float(os.environ.get('DASHBOARD_STREAM_DEBOUNCE', '1.0'))
+DASHBOARD_STREAM_HEARTBEAT = int(os.environ.get('DASHBOARD_STREAM_HEARTBEAT', '15'))
+DASHBOARD_STREAM_QUEUE_SIZE = 100
+# EventSource can't send headers; it authenticates with a single-use ticket instead of the JWT in the URL
+STREAM_TICKET_TTL = int(os.environ.get('STREAM_TICKET_TTL', '30'))
+_stream_tickets = {}  # ticket -> {"token", "expires_at"}
+_dashboard_streams = {}  # (location scope, missing-reports scope, month_year) -> {"queues", "snapshot"}
+_dashboard_pending_scopes = set()
+_dashboard_refresh_task = None
+
+# Password hashing pool: bcrypt is CPU bound and must not run on the event loop
+PASSWORD_POOL_WORKERS = int(os.environ.get('PASSWORD_POOL_WORKERS', '4'))
+PASSWORD_POOL_MAX_QUEUE = int(os.environ.get('PASSWORD_POOL_MAX_QUEUE', '32'))
+PASSWORD_POOL_RETRY_AFTER = int(os.environ.get('PASSWORD_POOL_RETRY_AFTER', '2'))
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_POOL_WORKERS, thread_name_prefix="password-pool")
+_password_jobs_in_flight = 0
+_password_pool_stats = {"completed": 0, "rejected": 0, "peak_in_flight": 0}
+
+# ReportLab rendering runs in worker processes so a large PDF can't stall the event loop
+PDF_RENDER_WORKERS = int(os.environ.get('PDF_RENDER_WORKERS', '2'))
+PDF_RENDER_MAX_QUEUE = int(os.environ.get('PDF_RENDER_MAX_QUEUE', '16'))
+PDF_RENDER_PER_USER = int(os.environ.get('PDF_RENDER_PER_USER', '2'))
+PDF_RENDER_RETRY_AFTER = int(os.environ.get('PDF_RENDER_RETRY_AFTER', '5'))
+_pdf_executor = ProcessPoolExecutor(max_workers=PDF_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+_pdf_jobs_in_flight = 0
+_pdf_user_jobs = {}  # user id -> renders in flight
+PDF_CACHE_DIR = Path(os.environ.get('PDF_CACHE_DIR', str(ROOT_DIR / "pdf_cache")))
+PDF_CACHE_MAX_BYTES = int(os.environ.get('PDF_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+_pdf_cache = OrderedDict()  # cache key -> {"path", "size"}, least recently used first
+_pdf_cache_bytes = 0
+PDF_CACHE_EVICT_GRACE = int(os.environ.get('PDF_CACHE_EVICT_GRACE', '60'))  # seconds before an evicted file is deleted
+_pdf_cache_evicted = deque()  # (evicted at, path) awaiting deletion, oldest first
+_pdf_cache_pending = {}  # cache key -> future of a render in progress
+_pdf_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+# Detailed reports list submissions grouped by location, newest first (matches the location index)
+DETAILED_REPORT_SORT = [("service_location", 1), ("submitted_at", -1), ("id", -1)]
+REPORT_TREND_MONTHS = int(os.environ.get('REPORT_TREND_MONTHS', '24'))  # trailing months in the trend chart
+# Report packs rendered at once; the default leaves one PDF worker free for interactive reports
+REPORT_PACK_CONCURRENCY = int(os.environ.get('REPORT_PACK_CONCURRENCY', str(max(1, PDF_RENDER_WORKERS - 1))))
+_pdf_render_stats = {
+    "completed": 0, "failed": 0, "rejected_queue_full": 0, "rejected_user_limit": 0, "peak_in_flight": 0,
+    "total_wait_ms": 0.0, "max_wait_ms": 0.0, "total_render_ms": 0.0, "max_render_ms": 0.0
+}
+
 # Create the main app without a prefix
 app = FastAPI(title="CLIENT SERVICES Platform")
 
@@ -91,6 +348,17 @@ class User(BaseModel):
     deleted_at: Optional[datetime] = None
     deleted_by: Optional[str] = None
 
+class TokenPrincipal(BaseModel):
+    """Authorization scope carried in the JWT; enough for role and permission checks"""
+    id: str
+    username: str
+    role: str
+    assigned_location: Optional[str] = None
+    assigned_locations: List[str] = []
+    has_all_locations: bool = False
+    page_permissions: List[str] = []
+    token_version: int = 0
+
 class UserCreate(BaseModel):
     username: str
     password: str
@@ -158,6 +426,28 @@ class DataSubmissionCreate(BaseModel):
     month_year: str
     form_data: Dict[str, Any]
 
+class SubmissionBulkFilter(BaseModel):
+    service_location: Optional[str] = None
+    month_year: Optional[str] = None
+    template_id: Optional[str] = None
+    status: Optional[str] = None
+
+class SubmissionBulkStatusUpdate(BaseModel):
+    status: str  # reviewed, approved, rejected, submitted
+    submission_ids: List[str] = []
+    filter: Optional[SubmissionBulkFilter] = None
+
+class ExportJobCreate(BaseModel):
+    format: str = "csv"  # csv, xlsx, ndjson, pdf
+    # Tabular export filters (same as /reports/csv)
+    location: Optional[str] = None
+    month_year: Optional[str] = None
+    template_id: Optional[str] = None
+    view: str = "full"
+    # PDF options (same as /reports/pdf)
+    report_type: str = "statistics"
+    query_params: Optional[str] = None
+
 class AdminSetting(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     setting_key: str
@@ -233,6 +523,7 @@ class StatisticsQuery(BaseModel):
     analyze_custom_fields: Optional[bool] = False
     custom_field_name: Optional[str] = None
     custom_field_analysis_type: Optional[str] = "frequency"  # frequency, numerical, trend
+    include_archived: Optional[bool] = False  # archived months are only read for a date range unless set
 
 # Helper function to get default page permissions based on role
 def get_default_permissions(role: str) -> List[str]:
@@ -245,30 +536,104 @@ def get_default_permissions(role: str) -> List[str]:
     return permissions_map.get(role, [])
 
 # Helper functions
-def hash_password(password: str) -> str:
+def _hash_password_sync(password: str) -> str:
     return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
-def verify_password(password: str, hashed: str) -> bool:
+def _verify_password_sync(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
-def create_jwt_token(user_id: str, username: str, role: str) -> str:
+async def run_password_job(func, *args):
+    """Run bcrypt work on the password pool, rejecting with 503 once the queue is full"""
+    global _password_jobs_in_flight
+    if _password_jobs_in_flight >= PASSWORD_POOL_WORKERS + PASSWORD_POOL_MAX_QUEUE:
+        _password_pool_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": str(PASSWORD_POOL_RETRY_AFTER)}
+        )
+    _password_jobs_in_flight += 1
+    _password_pool_stats["peak_in_flight"] = max(_password_pool_stats["peak_in_flight"], _password_jobs_in_flight)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_password_executor, func, *args)
+    finally:
+        _password_jobs_in_flight -= 1
+        _password_pool_stats["completed"] += 1
+
+async def hash_password(password: str) -> str:
+    return await run_password_job(_hash_password_sync, password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await run_password_job(_verify_password_sync, password, hashed)
+
+def get_password_pool_stats() -> Dict[str, Any]:
+    return {
+        **_password_pool_stats,
+        "in_flight": _password_jobs_in_flight,
+        "workers": PASSWORD_POOL_WORKERS,
+        "max_queue": PASSWORD_POOL_MAX_QUEUE
+    }
+
+def create_jwt_token(user: Dict[str, Any]) -> str:
     payload = {
-        "user_id": user_id,
-        "username": username,
-        "role": role,
+        "user_id": user["id"],
+        "username": user["username"],
+        "role": user["role"],
+        # Authorization scope so role/permission checks don't need the users collection
+        "scope": {
+            "page_permissions": user.get("page_permissions", []),
+            "assigned_location": user.get("assigned_location"),
+            "assigned_locations": user.get("assigned_locations", []),
+            "has_all_locations": user.get("has_all_locations", False)
+        },
+        "tv": user.get("token_version", 0),
         "exp": datetime.utcnow() + timedelta(hours=24)
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
+async def get_token_version(user_id: str) -> Optional[int]:
+    """Get the user's current token_version, or None if the account is inactive"""
+    entry = _token_version_cache.get(user_id)
+    if entry and time.time() - entry[1] < TOKEN_VERSION_CACHE_TTL:
+        return entry[0]
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "token_version": 1, "is_active": 1})
+    version = user.get("token_version", 0) if user and user.get("is_active", True) else None
+    _token_version_cache[user_id] = (version, time.time())
+    return version
+
+async def revoke_user_tokens(user_id: str):
+    """Invalidate all tokens issued to a user by bumping token_version"""
+    await db.users.update_one({"id": user_id}, {"$inc": {"token_version": 1}})
+    invalidate_principal(user_id)
+
+async def verify_token_claims(payload: Dict[str, Any]):
+    """Reject tokens whose version no longer matches the user document"""
+    if "tv" not in payload:
+        return
+    current_version = await get_token_version(payload["user_id"])
+    if current_version is None or current_version != payload["tv"]:
+        raise HTTPException(status_code=401, detail="Token revoked")
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        await verify_token_claims(payload)
+        cached_user = get_cached_principal(payload["user_id"])
+        if cached_user:
+            return cached_user
+        
+        version = _principal_versions.get(payload["user_id"], 0)
         user = await db.users.find_one({"id": payload["user_id"]})
         if user:
             # Log user data for debugging
             logger.info(f"Found user in get_current_user: {user['username']} with ID: {user['id']}")
-            return User(**user)
+            principal = User(**user)
+            set_cached_principal(payload["user_id"], principal, version)
+            return principal
         raise HTTPException(status_code=401, detail="Invalid token")
+    except HTTPException:
+        raise
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
@@ -277,13 +642,768 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         logger.error(f"Authentication error: {str(e)}")
         raise HTTPException(status_code=401, detail="Authentication error")
 
+async def get_token_principal(credentials: HTTPAuthorizationCredentials = Depends(security)) -> TokenPrincipal:
+    """Resolve the caller from JWT claims alone; tokens issued before claims existed fall back to a user lookup"""
+    try:
+        payload = jwt.decode(credentials.credentials, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expired")
+    except jwt.InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    
+    if "tv" not in payload or "scope" not in payload:
+        user = await get_current_user(credentials)
+        return TokenPrincipal(**user.dict())
+    
+    await verify_token_claims(payload)
+    return TokenPrincipal(
+        id=payload["user_id"],
+        username=payload["username"],
+        role=payload["role"],
+        token_version=payload["tv"],
+        **payload["scope"]
+    )
+
 def require_role(allowed_roles: List[str]):
-    def role_checker(current_user: User = Depends(get_current_user)):
+    def role_checker(current_user: TokenPrincipal = Depends(get_token_principal)):
         if current_user.role not in allowed_roles:
             raise HTTPException(status_code=403, detail="Insufficient permissions")
         return current_user
     return role_checker
 
+# Keyset pagination over data_submissions, newest first by (submitted_at, id)
+def encode_submission_cursor(submission: Dict[str, Any]) -> str:
+    position = {"t": submission["submitted_at"].isoformat(), "id": submission["id"]}
+    return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+def decode_submission_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        submitted_at = datetime.fromisoformat(position["t"])
+        submission_id = str(position["id"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Everything strictly after the cursor position in (submitted_at desc, id desc) order
+    return {"$or": [
+        {"submitted_at": {"$lt": submitted_at}},
+        {"submitted_at": submitted_at, "id": {"$lt": submission_id}}
+    ]}
+
+def build_submission_projection(view: str = "full", fields: Optional[str] = None) -> Dict[str, Any]:
+    """Translate view=summary|full or a comma separated fields= list into a Mongo projection"""
+    if fields:
+        projection = {"_id": 0, "id": 1, "submitted_at": 1}  # always kept for cursors
+        for field in (f.strip() for f in fields.split(",")):
+            if not field:
+                continue
+            if field not in SUBMISSION_FIELDS and not (field.startswith("form_data.") and len(field) > len("form_data.")):
+                raise HTTPException(status_code=400, detail=f"Unknown field: {field}")
+            projection[field] = 1
+        return projection
+    if view == "summary":
+        return {"_id": 0, **{field: 1 for field in SUBMISSION_SUMMARY_FIELDS}}
+    if view != "full":
+        raise HTTPException(status_code=400, detail="view must be 'summary' or 'full'")
+    return {"_id": 0, "search_text": 0, "form_values": 0}
+
+async def fetch_submission_page(query: Dict[str, Any], limit: Optional[int], cursor: Optional[str],
+                                projection: Optional[Dict[str, Any]] = None):
+    """Fetch one page of submissions; returns (submissions, next_cursor)"""
+    page_size = max(1, min(limit or SUBMISSIONS_PAGE_SIZE, SUBMISSIONS_MAX_PAGE_SIZE))
+    if cursor:
+        query = {"$and": [query, decode_submission_cursor(cursor)]}
+    
+    # Read one extra document to learn whether another page exists
+    submissions = await db.data_submissions.find(query, projection or {"_id": 0}).sort(SUBMISSIONS_SORT) \
+        .limit(page_size + 1).batch_size(page_size + 1).to_list(page_size + 1)
+    next_cursor = None
+    if len(submissions) > page_size:
+        submissions = submissions[:page_size]
+        next_cursor = encode_submission_cursor(submissions[-1])
+    return submissions, next_cursor
+
+async def resolve_usernames(user_ids) -> Dict[str, str]:
+    """Map user ids to usernames with at most one batched query for uncached ids"""
+    now = time.time()
+    usernames = {}
+    missing = set()
+    for user_id in set(user_ids):
+        entry = _username_directory.get(user_id)
+        if entry and now - entry[1] < CACHE_TTL:
+            usernames[user_id] = entry[0]
+        else:
+            missing.add(user_id)
+    
+    if missing:
+        users = await db.users.find(
+            {"id": {"$in": list(missing)}}, {"_id": 0, "id": 1, "username": 1}
+        ).batch_size(len(missing)).to_list(len(missing))
+        for user in users:
+            usernames[user["id"]] = user["username"]
+            _username_directory[user["id"]] = (user["username"], now)
+    return usernames
+
+async def get_template_fields(template_id: str) -> Optional[List[Dict[str, Any]]]:
+    """Template field definitions, cached for CACHE_TTL and dropped on template updates"""
+    key = f"template_fields:{template_id}"
+    fields = get_cached_data(key)
+    if fields is None:
+        template = await db.form_templates.find_one({"id": template_id}, {"_id": 0, "fields": 1})
+        if not template:
+            return None
+        fields = template.get("fields", [])
+        set_cached_data(key, fields)
+    return fields
+
+def invalidate_template_fields(template_id: str):
+    _cache.pop(f"template_fields:{template_id}", None)
+
+def coerce_form_values(form_data: Dict[str, Any], template_fields: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Typed copy of form_data; values that don't fit their field type (e.g. "n/a" in a number) are left out"""
+    form_values = {}
+    for field in template_fields:
+        name = field.get("name")
+        value = form_data.get(name) if name else None
+        if value is None or (isinstance(value, str) and value.strip() == ""):
+            continue
+        try:
+            form_values[name] = coerce_field_value(field.get("type", "text"), value)
+        except (TypeError, ValueError):
+            continue
+    return form_values
+
+def derive_submission_fields(form_data: Dict[str, Any], template_fields: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Fields computed from form_data at write time and stored alongside it"""
+    if template_fields is None:
+        # Template is gone; index every string value rather than nothing
+        values = [value for value in form_data.values() if isinstance(value, str)]
+        form_values = {}
+    else:
+        searchable = [field["name"] for field in template_fields if field.get("name") and field.get("type", "text") in SEARCHABLE_FIELD_TYPES]
+        values = [form_data[name] for name in searchable if isinstance(form_data.get(name), str)]
+        form_values = coerce_form_values(form_data, template_fields)
+    return {
+        "search_text": " ".join(value.strip() for value in values if value.strip()),
+        "form_values": form_values
+    }
+
+async def reindex_submissions():
+    """Recompute derived fields for every submission in _id order, one bulk_write per batch"""
+    _reindex_status.update({"running": True, "processed": 0, "started_at": datetime.utcnow(), "finished_at": None, "error": None})
+    try:
+        last_id = None
+        while True:
+            query = {"_id": {"$gt": last_id}} if last_id else {}
+            batch = await db.data_submissions.find(query, {"_id": 1, "template_id": 1, "form_data": 1}) \
+                .sort("_id", 1).limit(REINDEX_BATCH_SIZE).to_list(REINDEX_BATCH_SIZE)
+            if not batch:
+                break
+            operations = []
+            for submission in batch:
+                template_fields = await get_template_fields(submission.get("template_id"))
+                derived = derive_submission_fields(submission.get("form_data") or {}, template_fields)
+                operations.append(UpdateOne({"_id": submission["_id"]}, {"$set": derived}))
+            await db.data_submissions.bulk_write(operations, ordered=False)
+            last_id = batch[-1]["_id"]
+            _reindex_status["processed"] += len(batch)
+    except Exception as e:
+        logger.error(f"Submission reindex failed: {str(e)}")
+        _reindex_status["error"] = str(e)
+    finally:
+        _reindex_status.update({"running": False, "finished_at": datetime.utcnow()})
+
+def open_journal_segment():
+    _ingest_state["sequence"] += 1
+    path = INGEST_JOURNAL_DIR / f"segment-{int(time.time() * 1000):015d}-{_ingest_state['sequence']:06d}.ndjson"
+    _ingest_state.update({"segment": open(path, "a", encoding="utf-8"), "segment_path": path, "segment_docs": []})
+
+def write_journal_records(segment, lines: List[str]):
+    segment.write("".join(lines))
+    segment.flush()
+    os.fsync(segment.fileno())
+
+async def insert_journaled_documents(documents: List[Dict[str, Any]]):
+    """Store journaled documents; safe to repeat for documents that were already inserted"""
+    for start in range(0, len(documents), INGEST_BATCH_SIZE):
+        chunk = documents[start:start + INGEST_BATCH_SIZE]
+        try:
+            await db.data_submissions.insert_many(chunk, ordered=False)
+        except BulkWriteError as e:
+            # A retried batch keeps the _id values assigned on the first attempt; duplicates mean already stored
+            if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+        _ingest_stats["flushed"] += len(chunk)
+        _ingest_stats["batches"] += 1
+    bump_collection_version("data_submissions")
+    notify_dashboard_change(list({document["service_location"] for document in documents}))
+
+async def enqueue_submission(document: Dict[str, Any]):
+    """Durably journal a submission; returns once it is fsynced, raises 503 when the backlog is full"""
+    if _ingest_state["pending"] >= INGEST_MAX_PENDING:
+        _ingest_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Submission queue is full, please retry shortly",
+            headers={"Retry-After": str(INGEST_RETRY_AFTER)}
+        )
+    future = asyncio.get_running_loop().create_future()
+    _ingest_state["pending"] += 1
+    await _ingest_queue.put((document, future))
+    try:
+        await future
+    except Exception:
+        _ingest_state["pending"] -= 1
+        raise
+
+async def journal_writer():
+    loop = asyncio.get_running_loop()
+    while True:
+        items = [await _ingest_queue.get()]
+        # Group commit: take whatever else arrives within the commit window, then fsync once for all of it
+        deadline = loop.time() + INGEST_COMMIT_WINDOW
+        while len(items) < INGEST_BATCH_SIZE:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(_ingest_queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        
+        lines = [json_util.dumps(document) + "\n" for document, _ in items]
+        async with _ingest_lock:
+            try:
+                await loop.run_in_executor(None, write_journal_records, _ingest_state["segment"], lines)
+            except Exception as e:
+                logger.error(f"Journal write failed: {str(e)}")
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(HTTPException(status_code=503, detail="Submission could not be stored, please retry"))
+                continue
+            _ingest_state["segment_docs"].extend(document for document, _ in items)
+            if len(_ingest_state["segment_docs"]) >= INGEST_BATCH_SIZE:
+                _ingest_flush_requested.set()
+        _ingest_stats["journaled"] += len(items)
+        for _, future in items:
+            if not future.done():
+                future.set_result(None)
+
+async def flush_ingest_journal():
+    """Seal the active segment and store every sealed segment, oldest first"""
+    async with _ingest_lock:
+        if _ingest_state["segment_docs"]:
+            _ingest_state["segment"].close()
+            _ingest_sealed.append((_ingest_state["segment_path"], _ingest_state["segment_docs"]))
+            open_journal_segment()
+    while _ingest_sealed:
+        path, documents = _ingest_sealed[0]
+        try:
+            await insert_journaled_documents(documents)
+        except Exception as e:
+            # Leave the segment in place; it is retried on the next tick or replayed on startup
+            logger.error(f"Flushing journal segment {path.name} failed: {str(e)}")
+            return
+        _ingest_sealed.popleft()
+        path.unlink(missing_ok=True)
+        _ingest_state["pending"] -= len(documents)
+
+async def ingest_flusher():
+    while True:
+        try:
+            await asyncio.wait_for(_ingest_flush_requested.wait(), INGEST_FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _ingest_flush_requested.clear()
+        await flush_ingest_journal()
+
+async def recover_ingest_journal():
+    """Replay journal segments left behind by a crash before accepting new submissions"""
+    if not INGEST_JOURNAL_DIR.exists():
+        return
+    for path in sorted(INGEST_JOURNAL_DIR.glob("segment-*.ndjson")):
+        documents = []
+        with open(path, encoding="utf-8") as segment:
+            for line in segment:
+                try:
+                    documents.append(json_util.loads(line))
+                except ValueError:
+                    # A torn final record was never acknowledged to the client
+                    logger.warning(f"Skipping unreadable record in journal segment {path.name}")
+        if documents:
+            # Journal records carry no _id, so skip the ones a previous flush already stored
+            stored = await db.data_submissions.find(
+                {"id": {"$in": [document["id"] for document in documents]}}, {"_id": 0, "id": 1}
+            ).to_list(len(documents))
+            stored_ids = {document["id"] for document in stored}
+            missing = [document for document in documents if document["id"] not in stored_ids]
+            if missing:
+                await insert_journaled_documents(missing)
+            _ingest_stats["recovered"] += len(missing)
+            logger.info(f"Recovered {len(missing)} submissions from journal segment {path.name}")
+        path.unlink()
+
+async def start_ingest_pipeline():
+    await recover_ingest_journal()
+    if SUBMISSION_INGEST_MODE != "journal":
+        return
+    INGEST_JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+    open_journal_segment()
+    _ingest_tasks.extend([asyncio.create_task(journal_writer()), asyncio.create_task(ingest_flusher())])
+    logger.info(f"Submission ingestion in journal mode ({INGEST_JOURNAL_DIR})")
+
+async def stop_ingest_pipeline():
+    if not _ingest_tasks:
+        return
+    for task in _ingest_tasks:
+        task.cancel()
+    await asyncio.gather(*_ingest_tasks, return_exceptions=True)
+    _ingest_tasks.clear()
+    await flush_ingest_journal()
+    _ingest_state["segment"].close()
+    if not _ingest_sealed:
+        _ingest_state["segment_path"].unlink(missing_ok=True)
+
+def get_ingest_stats() -> Dict[str, Any]:
+    return {
+        **_ingest_stats,
+        "mode": SUBMISSION_INGEST_MODE,
+        "pending": _ingest_state["pending"],
+        "max_pending": INGEST_MAX_PENDING
+    }
+
+def archive_cutoff_month(horizon_months: int) -> str:
+    """First month_year that stays hot for the given horizon"""
+    today = datetime.utcnow()
+    index = today.year * 12 + today.month - 1 - horizon_months
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def open_archive_file(path: Path):
+    """Start a gzipped archive at path's temp name: a version line, then one column-oriented block per line"""
+    archive_file = gzip.open(path.with_suffix(".tmp"), "wb")
+    archive_file.write(json_util.dumps({"version": 2}).encode() + b"\n")
+    return archive_file
+
+def write_archive_block(archive_file, rows: List[Dict[str, Any]]):
+    columns = {column: [row.get(column) for row in rows] for column in ARCHIVE_COLUMNS}
+    archive_file.write(json_util.dumps({"count": len(rows), "columns": columns}).encode() + b"\n")
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def close_archive_file(archive_file, path: Path) -> Dict[str, Any]:
+    archive_file.close()
+    temp_path = path.with_suffix(".tmp")
+    with open(temp_path, "rb") as written:
+        os.fsync(written.fileno())
+    temp_path.rename(path)
+    return {"bytes": path.stat().st_size, "sha256": file_sha256(path)}
+
+def read_archive_blocks(path: Path, sha256: str, skip_ids=()):
+    """Yield the rows of an archive file one block at a time, after checking its checksum.
+
+    Version 1 files are a single block with the version on the same line, so both read alike.
+    skip_ids drops rows whose hot copy changed while the month was being archived.
+    """
+    if file_sha256(path) != sha256:
+        raise ValueError(f"Checksum mismatch for archive file {path.name}")
+    skip_ids = set(skip_ids)
+    with gzip.open(path, "rb") as archive_file:
+        for line in archive_file:
+            block = json_util.loads(line)
+            if "columns" not in block:
+                continue
+            columns = block["columns"]
+            # None marks a field the original document didn't have
+            rows = [
+                {column: values[i] for column, values in columns.items() if values[i] is not None}
+                for i in range(block["count"])
+            ]
+            yield [row for row in rows if row.get("id") not in skip_ids] if skip_ids else rows
+
+def next_archive_block(blocks) -> Optional[List[Dict[str, Any]]]:
+    return next(blocks, None)
+
+async def iter_archive_blocks(entry: Dict[str, Any]):
+    """Rows of one catalog entry, a block at a time, read in the default executor"""
+    loop = asyncio.get_running_loop()
+    blocks = read_archive_blocks(ARCHIVE_DIR / entry["file"], entry["sha256"], entry.get("superseded_ids") or ())
+    while True:
+        try:
+            rows = await loop.run_in_executor(None, next_archive_block, blocks)
+        except (OSError, ValueError) as e:
+            logger.error(f"Reading archive {entry['file']} failed: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Archived data for {entry['month_year']} is unavailable")
+        if rows is None:
+            return
+        yield rows
+
+async def archive_month(month_year: str) -> int:
+    """Move one month's submissions to a new archive file; returns the number of rows moved.
+
+    Rows are streamed from the cursor into the file a batch at a time. A row is only removed from
+    data_submissions if it is unchanged since it was written (same id and updated_at); rows edited in
+    the meantime stay hot and are listed as superseded, so readers skip their archived copy.
+    """
+    loop = asyncio.get_running_loop()
+    entry_id = str(uuid.uuid4())
+    filename = f"submissions-{month_year}-{entry_id[:8]}.json.gz"
+    path = ARCHIVE_DIR / filename
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    
+    archived = []  # (id, updated_at) of every row written
+    date_from = date_to = None
+    locations, templates = set(), set()
+    archive_file = await loop.run_in_executor(None, open_archive_file, path)
+    try:
+        cursor = db.data_submissions.find(
+            {"month_year": month_year}, {"_id": 0, "search_text": 0}
+        ).sort(SUBMISSIONS_SORT).batch_size(IMPORT_BATCH_SIZE)
+        async for rows in iter_batches(cursor, IMPORT_BATCH_SIZE):
+            await loop.run_in_executor(None, write_archive_block, archive_file, rows)
+            for row in rows:
+                archived.append((row["id"], row.get("updated_at")))
+                locations.add(row["service_location"])
+                templates.add(row["template_id"])
+                if row.get("submitted_at"):
+                    date_from = min(date_from or row["submitted_at"], row["submitted_at"])
+                    date_to = max(date_to or row["submitted_at"], row["submitted_at"])
+        written = await loop.run_in_executor(None, close_archive_file, archive_file, path)
+    except Exception:
+        archive_file.close()
+        path.with_suffix(".tmp").unlink(missing_ok=True)
+        raise
+    if not archived:
+        path.unlink(missing_ok=True)
+        return 0
+    
+    await db.submission_archive.insert_one({
+        "id": entry_id,
+        "month_year": month_year,
+        "file": filename,
+        "count": len(archived),
+        "date_from": date_from,
+        "date_to": date_to,
+        "locations": sorted(locations),
+        "templates": sorted(templates),
+        "archived_at": datetime.utcnow(),
+        "staged_until": None,
+        "stage_id": None,
+        "superseded_ids": [],
+        **written
+    })
+    # Only delete what was written, and only if unchanged; rows that arrived meanwhile are picked up by the next run
+    superseded = []
+    for start in range(0, len(archived), IMPORT_BATCH_SIZE):
+        chunk = archived[start:start + IMPORT_BATCH_SIZE]
+        result = await db.data_submissions.bulk_write(
+            [DeleteOne({"id": submission_id, "updated_at": updated_at}) for submission_id, updated_at in chunk],
+            ordered=False
+        )
+        if result.deleted_count < len(chunk):
+            superseded.extend(await db.data_submissions.distinct(
+                "id", {"id": {"$in": [submission_id for submission_id, _ in chunk]}}
+            ))
+    if superseded:
+        await db.submission_archive.update_one(
+            {"id": entry_id},
+            {"$set": {"superseded_ids": superseded, "count": len(archived) - len(superseded)}}
+        )
+    return len(archived) - len(superseded)
+
+async def archive_submissions(before_month: str):
+    """Archive every hot month older than before_month (YYYY-MM)"""
+    _archive_status.update({
+        "running": True, "archived_months": [], "archived_rows": 0,
+        "started_at": datetime.utcnow(), "finished_at": None, "error": None
+    })
+    try:
+        months = sorted(await db.data_submissions.distinct("month_year", {"month_year": {"$lt": before_month}}))
+        for month_year in months:
+            moved = await archive_month(month_year)
+            _archive_status["archived_months"].append(month_year)
+            _archive_status["archived_rows"] += moved
+            logger.info(f"Archived {moved} submissions for {month_year}")
+        if months:
+            bump_collection_version("data_submissions")
+            notify_dashboard_change()
+    except Exception as e:
+        logger.error(f"Submission archival failed: {str(e)}")
+        _archive_status["error"] = str(e)
+    finally:
+        _archive_status.update({"running": False, "finished_at": datetime.utcnow()})
+
+async def archive_scheduler():
+    while True:
+        if not _archive_status["running"]:
+            await archive_submissions(archive_cutoff_month(ARCHIVE_HORIZON_MONTHS))
+        await asyncio.sleep(ARCHIVE_CHECK_INTERVAL)
+
+async def find_archive_entries(
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    month_year: Optional[str] = None,
+    locations: Optional[List[str]] = None,
+    templates: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """Catalog entries whose rows can match the given filters"""
+    query = {}
+    if date_from:
+        query["date_to"] = {"$gte": date_from}
+    if date_to:
+        query["date_from"] = {"$lte": date_to}
+    if month_year:
+        query["month_year"] = month_year
+    if locations:
+        query["locations"] = {"$in": locations}
+    if templates:
+        query["templates"] = {"$in": templates}
+    return await db.submission_archive.find(query, {"_id": 0}).sort("month_year", 1).to_list(None)
+
+async def stage_archive_entries(entries: List[Dict[str, Any]]) -> List[str]:
+    """Load archived rows into archived_submissions so aggregations can $unionWith them.
+
+    Returns the stage ids to read. Each staging gets a fresh stage id and the catalog switches to it
+    only once every row is in, so a concurrent reader sees either the previous complete stage (kept
+    for ARCHIVE_STAGE_GRACE by the TTL index) or the new one, never a partial one.
+    """
+    stage_ids = []
+    refresh_after = timedelta(seconds=ARCHIVE_STAGE_TTL / 2)
+    for entry in entries:
+        if entry.get("stage_id") and entry.get("staged_until") and entry["staged_until"] - datetime.utcnow() > refresh_after:
+            stage_ids.append(entry["stage_id"])
+            continue
+        # Per entry, so staging one month never holds up requests that need other (or no) months
+        async with _archive_stage_locks.setdefault(entry["id"], asyncio.Lock()):
+            now = datetime.utcnow()
+            # Another request may have staged or extended this entry while we waited for the lock
+            current = await db.submission_archive.find_one({"id": entry["id"]}, {"_id": 0, "stage_id": 1, "staged_until": 1}) or {}
+            if current.get("stage_id") and current.get("staged_until") and current["staged_until"] > now:
+                if current["staged_until"] - now <= refresh_after:
+                    # Still staged: push its expiry out rather than decompressing the archive again
+                    staged_until = now + timedelta(seconds=ARCHIVE_STAGE_TTL)
+                    await db.archived_submissions.update_many(
+                        {"stage_id": current["stage_id"]},
+                        {"$set": {"expires_at": staged_until + timedelta(seconds=ARCHIVE_STAGE_GRACE)}}
+                    )
+                    await db.submission_archive.update_one({"id": entry["id"]}, {"$set": {"staged_until": staged_until}})
+                stage_ids.append(current["stage_id"])
+                continue
+            stage_id = str(uuid.uuid4())
+            staged_until = now + timedelta(seconds=ARCHIVE_STAGE_TTL)
+            async for rows in iter_archive_blocks(entry):
+                for row in rows:
+                    row.update({"archive_id": entry["id"], "stage_id": stage_id,
+                                "expires_at": staged_until + timedelta(seconds=ARCHIVE_STAGE_GRACE)})
+                if rows:
+                    await db.archived_submissions.insert_many(rows, ordered=False)
+            await db.submission_archive.update_one(
+                {"id": entry["id"]}, {"$set": {"stage_id": stage_id, "staged_until": staged_until}}
+            )
+            stage_ids.append(stage_id)
+    return stage_ids
+
+def apply_projection(row: Dict[str, Any], projection: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply a top-level inclusion or exclusion projection to a row read outside Mongo"""
+    included = {key for key, value in projection.items() if value and key != "_id"}
+    if included:
+        return {key: value for key, value in row.items() if key in included}
+    return {key: value for key, value in row.items() if projection.get(key, 1)}
+
+async def iter_archived_submissions(entries: List[Dict[str, Any]], query: Dict[str, Any]):
+    """Yield archived rows matching a simple equality query, straight from the archive files"""
+    for entry in entries:
+        async for rows in iter_archive_blocks(entry):
+            for row in rows:
+                if all(row.get(key) == value for key, value in query.items()):
+                    yield row
+
+async def claim_idempotency_key(user_id: str, scope: str, key: str, pending: Dict[str, Any], fingerprint: Optional[str] = None):
+    """Atomically claim a key for the request that will answer with `pending`.
+
+    Returns None when this request owns a fresh claim, {"response": ...} when the key was already
+    completed, or {"pending": ...} when this request took over a stale claim and must finish the
+    work the dead request started (same ids, which it may already have written).
+    """
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+    key_id = f"{user_id}:{scope}:{key}"
+    now = datetime.utcnow()
+    # Upsert with $setOnInsert in one round trip: no document back means this request owns the key
+    existing = await db.idempotency_keys.find_one_and_update(
+        {"_id": key_id},
+        {"$setOnInsert": {"created_at": now, "claimed_at": now, "fingerprint": fingerprint, "pending": pending}},
+        projection={"response": 1, "fingerprint": 1, "pending": 1, "claimed_at": 1, "created_at": 1},
+        upsert=True
+    )
+    if existing is None:
+        return None
+    if existing.get("fingerprint") != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if existing.get("response") is not None:
+        return {"response": existing["response"]}
+    claimed_at = existing.get("claimed_at", existing["created_at"])
+    if claimed_at > now - timedelta(seconds=IDEMPOTENCY_CLAIM_TIMEOUT):
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": str(IDEMPOTENCY_CLAIM_TIMEOUT)}
+        )
+    # Renew the lease only if nobody completed or took over the claim since it was read
+    taken = await db.idempotency_keys.find_one_and_update(
+        {"_id": key_id, "response": None, "claimed_at": existing.get("claimed_at")},
+        {"$set": {"claimed_at": now}}
+    )
+    if taken is None:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+    return {"pending": existing.get("pending") or pending}
+
+async def complete_idempotency_key(user_id: str, scope: str, key: str, response: Dict[str, Any]):
+    """Record the response once the claimed request has succeeded, so retries replay it"""
+    await db.idempotency_keys.update_one({"_id": f"{user_id}:{scope}:{key}"}, {"$set": {"response": response}})
+
+async def release_idempotency_key(user_id: str, scope: str, key: str):
+    """Forget a claimed key when the request failed, so a retry can run again"""
+    await db.idempotency_keys.delete_one({"_id": f"{user_id}:{scope}:{key}"})
+
+def idempotent_replay(response: Dict[str, Any]) -> JSONResponse:
+    return JSONResponse(content=response, headers={"Idempotent-Replayed": "true"})
+
+async def ensure_indexes():
+    """Create indexes the API's query patterns rely on (idempotent)"""
+    # Keyset pagination: role-scoped and unscoped listings sorted by (submitted_at, id)
+    await db.data_submissions.create_index([("service_location", 1), ("submitted_at", -1), ("id", -1)])
+    await db.data_submissions.create_index([("submitted_at", -1), ("id", -1)])
+    await db.data_submissions.create_index("id")
+    # Full-text search over derived search_text
+    await db.data_submissions.create_index([("search_text", "text")], default_language="english")
+    # Idempotency keys expire on their own
+    await db.idempotency_keys.create_index("created_at", expireAfterSeconds=IDEMPOTENCY_KEY_TTL)
+    # Archival: month lookups, catalog pruning and expiry of staged archive rows
+    await db.data_submissions.create_index("month_year")
+    await db.submission_archive.create_index("month_year")
+    await db.archived_submissions.create_index("stage_id")
+    await db.archived_submissions.create_index("expires_at", expireAfterSeconds=0)
+    # Report packs: one catalog entry per month and location, downloads by id
+    await db.report_packs.create_index([("month_year", 1), ("location", 1)], unique=True)
+    await db.report_packs.create_index("id")
+
+def coerce_field_value(field_type: str, value: Any) -> Any:
+    """Convert a raw form value to the template field's type; raises ValueError if it doesn't fit"""
+    if field_type == "number":
+        if isinstance(value, bool):
+            raise ValueError("not a number")
+        if isinstance(value, (int, float)):
+            number = float(value)
+        else:
+            text = str(value).strip()
+            if "," in text:
+                if not THOUSANDS_GROUPED_NUMBER.fullmatch(text):
+                    raise ValueError("ambiguous comma in number")
+                text = text.replace(",", "")
+            number = float(text)
+        if math.isnan(number) or math.isinf(number):
+            raise ValueError("not a number")
+        return number
+    if field_type == "date":
+        if isinstance(value, datetime):
+            return value
+        return datetime.fromisoformat(str(value).strip())
+    if field_type in ("text", "textarea", "select"):
+        return str(value).strip()
+    raise ValueError(f"{field_type} fields are not coerced")
+
+def validate_form_data(template_fields: List[Dict[str, Any]], values: Dict[str, Any]):
+    """Check values against FormTemplate.fields; returns (form_data, errors)"""
+    form_data = {}
+    errors = []
+    for field in template_fields:
+        name = field.get("name")
+        if not name:
+            continue
+        value = values.get(name)
+        if value is None or (isinstance(value, str) and value.strip() == ""):
+            if field.get("required"):
+                errors.append(f"{name}: required")
+            continue
+        
+        field_type = field.get("type", "text")
+        if field_type == "number":
+            try:
+                coerce_field_value(field_type, value)
+            except (TypeError, ValueError):
+                errors.append(f"{name}: not a number")
+                continue
+        elif field_type == "date":
+            try:
+                coerce_field_value(field_type, value)
+            except ValueError:
+                errors.append(f"{name}: not a date (YYYY-MM-DD)")
+                continue
+        elif field_type == "select" and field.get("options") and value not in field["options"]:
+            errors.append(f"{name}: not one of the allowed options")
+            continue
+        form_data[name] = value
+    return form_data, errors
+
+def iter_import_rows(upload_file, file_format: str):
+    """Lazily yield (row_number, row_dict or error) from an uploaded CSV/NDJSON file.
+
+    Blocking: iterate it from an executor. Raises UnicodeDecodeError or csv.Error for files that
+    can't be read at all.
+    """
+    text = io.TextIOWrapper(upload_file, encoding='utf-8-sig', newline='')
+    try:
+        if file_format == "csv":
+            for row_number, row in enumerate(csv.DictReader(text), start=1):
+                yield row_number, row
+        else:
+            row_number = 0
+            for line in text:
+                if not line.strip():
+                    continue
+                row_number += 1
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield row_number, "invalid JSON"
+                    continue
+                yield row_number, row if isinstance(row, dict) else "expected a JSON object"
+    finally:
+        # Leave the upload open (and rewindable) when the wrapper goes away
+        text.detach()
+
+def check_import_file(upload_file, file_format: str) -> Optional[str]:
+    """Read the whole upload once so an undecodable or malformed file is rejected before any insert"""
+    row_number = 0
+    try:
+        for row_number, _ in iter_import_rows(upload_file, file_format):
+            pass
+    except UnicodeDecodeError:
+        return "File is not valid UTF-8"
+    except csv.Error as e:
+        return f"Malformed CSV after row {row_number}: {str(e)}"
+    finally:
+        upload_file.seek(0)
+    return None
+
+def next_import_chunk(rows) -> List[Any]:
+    return list(itertools.islice(rows, IMPORT_BATCH_SIZE))
+
+async def iter_import_chunks(upload_file, file_format: str):
+    """iter_import_rows, parsed IMPORT_BATCH_SIZE rows at a time in the default executor"""
+    rows = iter_import_rows(upload_file, file_format)
+    loop = asyncio.get_running_loop()
+    while True:
+        chunk = await loop.run_in_executor(None, next_import_chunk, rows)
+        if not chunk:
+            return
+        for item in chunk:
+            yield item
+
 # Initialize default data
 async def initialize_default_data():
     # Create default roles if not exist
@@ -312,7 +1432,7 @@ async def initialize_default_data():
     if not admin_exists:
         admin_user = User(
             username="admin",
-            password_hash=hash_password("admin123"),
+            password_hash=await hash_password("admin123"),
             role="admin",
             page_permissions=get_default_permissions("admin"),
             status="approved"  # Admin is pre-approved
@@ -342,7 +1462,7 @@ async def initialize_default_data():
 @api_router.post("/auth/login")
 async def login(credentials: UserLogin):
     user = await db.users.find_one({"username": credentials.username})
-    if not user or not verify_password(credentials.password, user["password_hash"]):
+    if not user or not await verify_password(credentials.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     if not user["is_active"]:
@@ -354,7 +1474,7 @@ async def login(credentials: UserLogin):
     if user.get("status", "approved") == "rejected":
         raise HTTPException(status_code=401, detail="Account has been rejected")
     
-    token = create_jwt_token(user["id"], user["username"], user["role"])
+    token = create_jwt_token(user)
     return {
         "access_token": token,
         "token_type": "bearer",
@@ -377,7 +1497,7 @@ async def register(user_data: UserRegister):
     # Create new user with pending status
     user = User(
         username=user_data.username,
-        password_hash=hash_password(user_data.password),
+        password_hash=await hash_password(user_data.password),
         role="data_entry",  # Default role for registered users
         page_permissions=get_default_permissions("data_entry"),
         status="pending",  # Requires admin approval
@@ -455,7 +1575,7 @@ async def reset_password(reset_data: PasswordResetComplete):
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters long")
     
     # Update password
-    hashed_password = hash_password(reset_data.new_password)
+    hashed_password = await hash_password(reset_data.new_password)
     await db.users.update_one(
         {"id": user["id"]},
         {"$set": {
@@ -463,6 +1583,7 @@ async def reset_password(reset_data: PasswordResetComplete):
             "updated_at": datetime.utcnow()
         }}
     )
+    await revoke_user_tokens(user["id"])
     
     # Mark reset request as used
     await db.password_reset_requests.update_one(
@@ -487,7 +1608,7 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 
 # User Management Routes (Admin only)
 @api_router.post("/users", response_model=User)
-async def create_user(user_data: UserCreate, current_user: User = Depends(require_role(["admin"]))):
+async def create_user(user_data: UserCreate, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     # Check if username already exists
     existing_user = await db.users.find_one({"username": user_data.username})
     if existing_user:
@@ -498,7 +1619,7 @@ async def create_user(user_data: UserCreate, current_user: User = Depends(requir
     
     user = User(
         username=user_data.username,
-        password_hash=hash_password(user_data.password),
+        password_hash=await hash_password(user_data.password),
         role=user_data.role,
         assigned_location=user_data.assigned_location,
         page_permissions=permissions
@@ -507,12 +1628,12 @@ async def create_user(user_data: UserCreate, current_user: User = Depends(requir
     return user
 
 @api_router.get("/users", response_model=List[User])
-async def get_users(current_user: User = Depends(require_role(["admin"]))):
+async def get_users(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     users = await db.users.find({"is_active": True}).to_list(1000)
     return [User(**user) for user in users]
 
 @api_router.get("/admin/pending-users")
-async def get_pending_users(current_user: User = Depends(require_role(["admin"]))):
+async def get_pending_users(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Get all pending user registrations"""
     pending_users = await db.users.find({"status": "pending"}).to_list(1000)
     
@@ -526,7 +1647,7 @@ async def get_pending_users(current_user: User = Depends(require_role(["admin"])
     return pending_users
 
 @api_router.post("/admin/approve-user")
-async def approve_user(approval_data: UserApproval, current_user: User = Depends(require_role(["admin"]))):
+async def approve_user(approval_data: UserApproval, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Approve or reject a pending user"""
     # Find the pending user
     pending_user = await db.users.find_one({"id": approval_data.user_id, "status": "pending"})
@@ -551,6 +1672,7 @@ async def approve_user(approval_data: UserApproval, current_user: User = Depends
         update_data["is_active"] = False
     
     await db.users.update_one({"id": approval_data.user_id}, {"$set": update_data})
+    await revoke_user_tokens(approval_data.user_id)
     
     return {
         "message": f"User {approval_data.status} successfully",
@@ -560,7 +1682,7 @@ async def approve_user(approval_data: UserApproval, current_user: User = Depends
     }
 
 @api_router.get("/admin/password-reset-requests")
-async def get_password_reset_requests(current_user: User = Depends(require_role(["admin"]))):
+async def get_password_reset_requests(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Get all pending password reset requests"""
     requests = await db.password_reset_requests.find({
         "status": "pending",
@@ -575,7 +1697,7 @@ async def get_password_reset_requests(current_user: User = Depends(require_role(
     return requests
 
 @api_router.get("/admin/deleted-users")
-async def get_deleted_users(current_user: User = Depends(require_role(["admin"]))):
+async def get_deleted_users(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Get all deleted/inactive users"""
     deleted_users = await db.users.find({"is_active": False}).to_list(1000)
     
@@ -589,7 +1711,7 @@ async def get_deleted_users(current_user: User = Depends(require_role(["admin"])
     return deleted_users
 
 @api_router.post("/admin/restore-user/{user_id}")
-async def restore_user(user_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def restore_user(user_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Restore a deleted user"""
     # Check if user exists and is deleted
     user = await db.users.find_one({"id": user_id, "is_active": False})
@@ -607,6 +1729,7 @@ async def restore_user(user_id: str, current_user: User = Depends(require_role([
             "updated_by": current_user.id
         }}
     )
+    invalidate_principal(user_id)
     
     return {
         "message": "User restored successfully",
@@ -652,6 +1775,7 @@ async def update_user_profile(profile_data: UserProfileUpdate, current_user: Use
     if update_data:
         update_data["updated_at"] = datetime.utcnow()
         await db.users.update_one({"id": current_user.id}, {"$set": update_data})
+        invalidate_principal(current_user.id)
     
     return {
         "message": "Profile updated successfully",
@@ -659,7 +1783,7 @@ async def update_user_profile(profile_data: UserProfileUpdate, current_user: Use
     }
 
 @api_router.get("/users/{user_id}")
-async def get_user(user_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def get_user(user_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     user = await db.users.find_one({"id": user_id})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -672,8 +1796,17 @@ async def get_user(user_id: str, current_user: User = Depends(require_role(["adm
     
     return user
 
+# Fields an admin may change through PUT /users/{id}; token_version, password_hash and ids are
+# maintained by the server and silently dropped from the payload
+USER_UPDATE_FIELDS = {
+    "username", "password", "full_name", "email", "role", "assigned_location", "assigned_locations",
+    "has_all_locations", "page_permissions", "is_active", "status"
+}
+
 @api_router.put("/users/{user_id}")
-async def update_user(user_id: str, user_data: dict, current_user: User = Depends(require_role(["admin"]))):
+async def update_user(user_id: str, user_data: dict, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
+    user_data = {key: value for key, value in user_data.items() if key in USER_UPDATE_FIELDS}
+    
     # Check if user exists
     existing_user = await db.users.find_one({"id": user_id})
     if not existing_user:
@@ -687,7 +1820,7 @@ async def update_user(user_id: str, user_data: dict, current_user: User = Depend
     
     # Hash password if provided
     if "password" in user_data:
-        user_data["password_hash"] = hash_password(user_data["password"])
+        user_data["password_hash"] = await hash_password(user_data["password"])
         del user_data["password"]
     
     # Add update metadata
@@ -695,10 +1828,11 @@ async def update_user(user_id: str, user_data: dict, current_user: User = Depend
     user_data["updated_by"] = current_user.id
     
     await db.users.update_one({"id": user_id}, {"$set": user_data})
+    await revoke_user_tokens(user_id)
     return {"message": "User updated successfully"}
 
 @api_router.post("/users/{user_id}/reset-password")
-async def reset_user_password(user_id: str, password_data: dict, current_user: User = Depends(require_role(["admin"]))):
+async def reset_user_password(user_id: str, password_data: dict, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Reset a user's password (Admin only)"""
     # Check if user exists
     existing_user = await db.users.find_one({"id": user_id})
@@ -714,7 +1848,7 @@ async def reset_user_password(user_id: str, password_data: dict, current_user: U
         raise HTTPException(status_code=400, detail="Password must be at least 6 characters long")
     
     # Hash and update password
-    hashed_password = hash_password(new_password)
+    hashed_password = await hash_password(new_password)
     
     update_data = {
         "password_hash": hashed_password,
@@ -725,6 +1859,7 @@ async def reset_user_password(user_id: str, password_data: dict, current_user: U
     }
     
     await db.users.update_one({"id": user_id}, {"$set": update_data})
+    await revoke_user_tokens(user_id)
     
     return {
         "message": "Password reset successfully",
@@ -744,7 +1879,7 @@ async def change_own_password(password_data: dict, current_user: User = Depends(
     
     # Verify current password
     user = await db.users.find_one({"id": current_user.id})
-    if not user or not verify_password(current_password, user["password_hash"]):
+    if not user or not await verify_password(current_password, user["password_hash"]):
         raise HTTPException(status_code=400, detail="Current password is incorrect")
     
     # Validate new password
@@ -755,7 +1890,7 @@ async def change_own_password(password_data: dict, current_user: User = Depends(
         raise HTTPException(status_code=400, detail="New password must be different from current password")
     
     # Hash and update password
-    hashed_password = hash_password(new_password)
+    hashed_password = await hash_password(new_password)
     
     update_data = {
         "password_hash": hashed_password,
@@ -764,13 +1899,18 @@ async def change_own_password(password_data: dict, current_user: User = Depends(
     }
     
     await db.users.update_one({"id": current_user.id}, {"$set": update_data})
+    # Sign out every other session, as an admin reset does; this one carries on with a fresh token
+    await revoke_user_tokens(current_user.id)
+    user = await db.users.find_one({"id": current_user.id})
     
     return {
         "message": "Password changed successfully",
-        "changed_at": datetime.utcnow().isoformat()
+        "changed_at": datetime.utcnow().isoformat(),
+        "access_token": create_jwt_token(user),
+        "token_type": "bearer"
     }
 @api_router.delete("/users/{user_id}")
-async def delete_user(user_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def delete_user(user_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Soft delete a user (mark as inactive)"""
     # Check if user exists
     user = await db.users.find_one({"id": user_id})
@@ -792,6 +1932,7 @@ async def delete_user(user_id: str, current_user: User = Depends(require_role(["
             "updated_by": current_user.id
         }}
     )
+    await revoke_user_tokens(user_id)
     
     return {
         "message": "User deleted successfully",
@@ -802,35 +1943,52 @@ async def delete_user(user_id: str, current_user: User = Depends(require_role(["
 
 # Service Location Routes
 @api_router.post("/locations", response_model=ServiceLocation)
-async def create_location(location_data: ServiceLocationCreate, current_user: User = Depends(require_role(["admin"]))):
+async def create_location(location_data: ServiceLocationCreate, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     location = ServiceLocation(**location_data.dict())
     await db.service_locations.insert_one(location.dict())
+    bump_collection_version("service_locations")
+    notify_dashboard_change()
     return location
 
 @api_router.get("/locations", response_model=List[ServiceLocation])
-async def get_locations(current_user: User = Depends(get_current_user)):
+async def get_locations(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    etag = collection_etag("service_locations")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     locations = await db.service_locations.find({"is_active": True}).to_list(1000)
     return [ServiceLocation(**location) for location in locations]
 
 @api_router.put("/locations/{location_id}")
-async def update_location(location_id: str, location_data: dict, current_user: User = Depends(require_role(["admin"]))):
+async def update_location(location_id: str, location_data: dict, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     await db.service_locations.update_one({"id": location_id}, {"$set": location_data})
+    bump_collection_version("service_locations")
+    notify_dashboard_change()
     return {"message": "Location updated successfully"}
 
 @api_router.delete("/locations/{location_id}")
-async def delete_location(location_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def delete_location(location_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     await db.service_locations.update_one({"id": location_id}, {"$set": {"is_active": False}})
+    bump_collection_version("service_locations")
+    notify_dashboard_change()
     return {"message": "Location deleted successfully"}
 
 # Form Template Routes
 @api_router.post("/templates", response_model=FormTemplate)
-async def create_template(template_data: FormTemplateCreate, current_user: User = Depends(require_role(["admin"]))):
+async def create_template(template_data: FormTemplateCreate, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     template = FormTemplate(**template_data.dict(), created_by=current_user.id)
     await db.form_templates.insert_one(template.dict())
+    bump_collection_version("form_templates")
     return template
 
 @api_router.get("/templates", response_model=List[FormTemplate])
-async def get_templates(current_user: User = Depends(get_current_user)):
+async def get_templates(request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    etag = collection_etag("form_templates", "admin" if current_user.role == "admin" else f"location:{current_user.assigned_location}")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     if current_user.role == "admin":
         templates = await db.form_templates.find({"is_active": True}).to_list(1000)
     else:
@@ -842,13 +2000,13 @@ async def get_templates(current_user: User = Depends(get_current_user)):
     return [FormTemplate(**template) for template in templates]
 
 @api_router.get("/templates/deleted", response_model=List[FormTemplate])
-async def get_deleted_templates(current_user: User = Depends(require_role(["admin"]))):
+async def get_deleted_templates(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Get all soft-deleted templates"""
     templates = await db.form_templates.find({"is_active": False}).to_list(1000)
     return [FormTemplate(**template) for template in templates]
 
 @api_router.get("/templates/{template_id}")
-async def get_template(template_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def get_template(template_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     template = await db.form_templates.find_one({"id": template_id})
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
@@ -860,7 +2018,7 @@ async def get_template(template_id: str, current_user: User = Depends(require_ro
     return template
 
 @api_router.put("/templates/{template_id}")
-async def update_template(template_id: str, template_data: FormTemplateCreate, current_user: User = Depends(require_role(["admin"]))):
+async def update_template(template_id: str, template_data: FormTemplateCreate, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     # Check if template exists
     existing_template = await db.form_templates.find_one({"id": template_id})
     if not existing_template:
@@ -872,42 +2030,182 @@ async def update_template(template_id: str, template_data: FormTemplateCreate, c
     update_data["updated_by"] = current_user.id
     
     await db.form_templates.update_one({"id": template_id}, {"$set": update_data})
+    bump_collection_version("form_templates")
+    invalidate_template_fields(template_id)
     return {"message": "Template updated successfully"}
 
 @api_router.delete("/templates/{template_id}")
-async def delete_template(template_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def delete_template(template_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     await db.form_templates.update_one({"id": template_id}, {"$set": {"is_active": False}})
+    bump_collection_version("form_templates")
     return {"message": "Template deleted successfully"}
 
 @api_router.post("/templates/{template_id}/restore")
-async def restore_template(template_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def restore_template(template_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Restore a soft-deleted template"""
     result = await db.form_templates.update_one(
         {"id": template_id, "is_active": False}, 
         {"$set": {"is_active": True}}
     )
+    bump_collection_version("form_templates")
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Template not found or already active")
     return {"message": "Template restored successfully"}
 
 # Data Submission Routes
 @api_router.post("/submissions")
-async def create_submission(submission_data: DataSubmissionCreate, current_user: User = Depends(get_current_user)):
+async def create_submission(
+    submission_data: DataSubmissionCreate,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
     # Validate user can submit to this location
     if current_user.role in ["manager", "data_entry"] and current_user.assigned_location != submission_data.service_location:
         raise HTTPException(status_code=403, detail="Cannot submit data for this location")
     
     submission = DataSubmission(**submission_data.dict(), submitted_by=current_user.id)
-    await db.data_submissions.insert_one(submission.dict())
-    return {"message": "Data submitted successfully", "id": submission.id}
+    document = submission.dict()
+    document.update(derive_submission_fields(submission.form_data, await get_template_fields(submission.template_id)))
+    response = {"message": "Data submitted successfully", "id": submission.id}
+    
+    if idempotency_key:
+        fingerprint = hashlib.sha256(json.dumps(jsonable_encoder(submission_data), sort_keys=True).encode('utf-8')).hexdigest()
+        claim = await claim_idempotency_key(current_user.id, "submissions", idempotency_key, response, fingerprint)
+        if claim and "response" in claim:
+            return idempotent_replay(claim["response"])
+        if claim:
+            # The request that claimed the key died; reuse its id so its write, if it got that far, counts
+            response = dict(claim["pending"])
+            submission.id = document["id"] = response["id"]
+            if await db.data_submissions.find_one({"id": submission.id}, {"_id": 1}):
+                await complete_idempotency_key(current_user.id, "submissions", idempotency_key, response)
+                return response
+    
+    try:
+        if SUBMISSION_INGEST_MODE == "journal":
+            # Durably queued; the flusher stores it and notifies dashboards
+            await enqueue_submission(document)
+            response["queued"] = True
+        else:
+            await db.data_submissions.insert_one(document)
+    except Exception:
+        if idempotency_key:
+            await release_idempotency_key(current_user.id, "submissions", idempotency_key)
+        raise
+    if idempotency_key:
+        await complete_idempotency_key(current_user.id, "submissions", idempotency_key, response)
+    if SUBMISSION_INGEST_MODE != "journal":
+        bump_collection_version("data_submissions")
+        notify_dashboard_change([submission.service_location])
+    return response
+
+@api_router.post("/submissions/import")
+async def import_submissions(
+    template_id: str = Form(...),
+    file: UploadFile = File(...),
+    service_location: Optional[str] = Form(None),
+    month_year: Optional[str] = Form(None),
+    file_format: Optional[str] = Form(None),
+    current_user: User = Depends(get_current_user)
+):
+    """Bulk import submissions from a CSV or NDJSON file keyed to a template"""
+    template = await db.form_templates.find_one({"id": template_id, "is_active": True}, {"_id": 0, "fields": 1})
+    if not template:
+        raise HTTPException(status_code=404, detail="Template not found")
+    template_fields = template.get("fields", [])
+    
+    if not file_format:
+        file_format = "csv" if (file.filename or "").lower().endswith(".csv") or file.content_type == "text/csv" else "ndjson"
+    if file_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="file_format must be 'csv' or 'ndjson'")
+    
+    # Parsing is blocking file I/O and CPU work, so it runs in the default executor
+    loop = asyncio.get_running_loop()
+    file_error = await loop.run_in_executor(None, check_import_file, file.file, file_format)
+    if file_error:
+        raise HTTPException(status_code=400, detail=file_error)
+    
+    report = {"template_id": template_id, "total_rows": 0, "inserted": 0, "failed": 0, "errors": [], "errors_truncated": False}
+    
+    def record_error(row_number, error):
+        report["failed"] += 1
+        if len(report["errors"]) < IMPORT_MAX_ERRORS:
+            report["errors"].append({"row": row_number, "error": error})
+        else:
+            report["errors_truncated"] = True
+    
+    async def flush(batch, row_numbers):
+        try:
+            result = await db.data_submissions.insert_many(batch, ordered=False)
+            report["inserted"] += len(result.inserted_ids)
+        except BulkWriteError as e:
+            report["inserted"] += e.details.get("nInserted", 0)
+            for write_error in e.details.get("writeErrors", []):
+                record_error(row_numbers[write_error["index"]], write_error.get("errmsg", "write failed"))
+        bump_collection_version("data_submissions")
+        notify_dashboard_change(list({doc["service_location"] for doc in batch}))
+    
+    batch, row_numbers = [], []
+    async for row_number, row in iter_import_chunks(file.file, file_format):
+        report["total_rows"] += 1
+        if isinstance(row, str):
+            record_error(row_number, row)
+            continue
+        
+        location = row.get("service_location") or service_location
+        period = row.get("month_year") or month_year
+        if not location or not period:
+            record_error(row_number, "service_location and month_year are required")
+            continue
+        # Same location rule as create_submission
+        if current_user.role in ["manager", "data_entry"] and current_user.assigned_location != location:
+            record_error(row_number, "Cannot submit data for this location")
+            continue
+        try:
+            datetime.strptime(period, MONTH_YEAR_FORMAT)
+        except (TypeError, ValueError):
+            record_error(row_number, "month_year must be YYYY-MM")
+            continue
+        
+        form_data, errors = validate_form_data(template_fields, row)
+        if errors:
+            record_error(row_number, "; ".join(errors))
+            continue
+        
+        submission = DataSubmission(
+            template_id=template_id,
+            service_location=location,
+            month_year=period,
+            form_data=form_data,
+            submitted_by=current_user.id
+        )
+        document = submission.dict()
+        document.update(derive_submission_fields(form_data, template_fields))
+        batch.append(document)
+        row_numbers.append(row_number)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await flush(batch, row_numbers)
+            batch, row_numbers = [], []
+    
+    if batch:
+        await flush(batch, row_numbers)
+    
+    logger.info(f"Imported {report['inserted']}/{report['total_rows']} submissions for template {template_id} by {current_user.username}")
+    return report
 
 @api_router.get("/submissions")
 async def get_submissions(
     location: Optional[str] = None,
     month_year: Optional[str] = None,
     template_id: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    legacy: bool = False,
+    view: str = "full",
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
+    projection = build_submission_projection(view, fields)
     query = {}
     
     # Role-based filtering
@@ -921,7 +2219,12 @@ async def get_submissions(
     if template_id:
         query["template_id"] = template_id
     
-    submissions = await db.data_submissions.find(query).to_list(1000)
+    if not legacy:
+        submissions, next_cursor = await fetch_submission_page(query, limit, cursor, projection)
+        return {"items": submissions, "next_cursor": next_cursor}
+    
+    # Compatibility mode: plain list, capped at 1000 documents
+    submissions = await db.data_submissions.find(query, projection).to_list(1000)
     
     # Convert ObjectIds to strings for JSON serialization
     for submission in submissions:
@@ -930,10 +2233,57 @@ async def get_submissions(
     
     return submissions
 
+@api_router.get("/submissions/search")
+async def search_submissions(
+    q: str,
+    location: Optional[str] = None,
+    month_year: Optional[str] = None,
+    template_id: Optional[str] = None,
+    page: int = 1,
+    limit: Optional[int] = None,
+    view: str = "summary",
+    current_user: User = Depends(get_current_user)
+):
+    """Full-text search over submission form values, ranked by relevance"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Search query is required")
+    page_size = max(1, min(limit or SUBMISSIONS_PAGE_SIZE, SUBMISSIONS_MAX_PAGE_SIZE))
+    skip = (max(page, 1) - 1) * page_size
+    if skip + page_size > SEARCH_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"Only the first {SEARCH_MAX_RESULTS} results can be paged through; refine the query")
+    
+    query = {"$text": {"$search": q}}
+    
+    # Role-based filtering
+    if current_user.role in ["manager", "data_entry"]:
+        query["service_location"] = current_user.assigned_location
+    elif location:
+        query["service_location"] = location
+    
+    if month_year:
+        query["month_year"] = month_year
+    if template_id:
+        query["template_id"] = template_id
+    
+    projection = build_submission_projection(view)
+    projection.pop("search_text", None)
+    projection["score"] = {"$meta": "textScore"}
+    
+    submissions = await db.data_submissions.find(query, projection) \
+        .sort([("score", {"$meta": "textScore"}), ("submitted_at", -1)]) \
+        .skip(skip).limit(page_size + 1).batch_size(page_size + 1).to_list(page_size + 1)
+    
+    return {
+        "items": submissions[:page_size],
+        "page": max(page, 1),
+        "limit": page_size,
+        "has_more": len(submissions) > page_size
+    }
+
 @api_router.get("/submissions/{submission_id}")
-async def get_submission(submission_id: str, current_user: User = Depends(get_current_user)):
+async def get_submission(submission_id: str, request: Request, response: Response, current_user: User = Depends(get_current_user)):
     try:
-        submission = await db.data_submissions.find_one({"id": submission_id})
+        submission = await db.data_submissions.find_one({"id": submission_id}, {"search_text": 0, "form_values": 0})
         if not submission:
             raise HTTPException(status_code=404, detail="Submission not found")
         
@@ -941,10 +2291,17 @@ async def get_submission(submission_id: str, current_user: User = Depends(get_cu
         if current_user.role in ["manager", "data_entry"] and submission["service_location"] != current_user.assigned_location:
             raise HTTPException(status_code=403, detail="Cannot view this submission")
         
+        # Only after the existence and access checks: the tag is collection-wide, so matching it first
+        # would answer 304 for a deleted or out-of-scope id until an unrelated write bumped the version
+        etag = collection_etag("data_submissions", f"{submission_id}:{current_user.role}:{current_user.assigned_location}")
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
         # Remove ObjectId for JSON serialization
         if "_id" in submission:
             del submission["_id"]
         
+        set_etag(response, etag)
         return submission
     except HTTPException:
         raise
@@ -967,15 +2324,75 @@ async def update_submission(submission_id: str, submission_data: dict, current_u
     if current_user.role == "manager" and submission["service_location"] != current_user.assigned_location:
         raise HTTPException(status_code=403, detail="Cannot edit submissions from other locations")
     
+    # Keep derived fields in step with form_data
+    submission_data.pop("search_text", None)
+    submission_data.pop("form_values", None)
+    if "form_data" in submission_data:
+        template_fields = await get_template_fields(submission_data.get("template_id", submission["template_id"]))
+        submission_data.update(derive_submission_fields(submission_data["form_data"] or {}, template_fields))
+    
     # Add update metadata
     submission_data["updated_at"] = datetime.utcnow()
     submission_data["updated_by"] = current_user.id
     
     await db.data_submissions.update_one({"id": submission_id}, {"$set": submission_data})
+    bump_collection_version("data_submissions")
+    notify_dashboard_change([submission["service_location"], submission_data.get("service_location", submission["service_location"])])
     return {"message": "Submission updated successfully"}
 
+@api_router.post("/submissions/bulk-status")
+async def bulk_update_submission_status(update: SubmissionBulkStatusUpdate, current_user: TokenPrincipal = Depends(require_role(["admin", "manager"]))):
+    """Apply one status transition to many submissions in a single update"""
+    if update.status not in SUBMISSION_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Status must be one of: {', '.join(SUBMISSION_STATUSES)}")
+    
+    query = {}
+    if update.submission_ids:
+        if len(update.submission_ids) > BULK_STATUS_MAX_IDS:
+            raise HTTPException(status_code=400, detail=f"At most {BULK_STATUS_MAX_IDS} submission ids per request")
+        query["id"] = {"$in": list(set(update.submission_ids))}
+    if update.filter:
+        query.update({key: value for key, value in update.filter.dict().items() if value})
+    if not query:
+        raise HTTPException(status_code=400, detail="Provide submission_ids or a filter")
+    
+    # Managers can only transition submissions from their location; enforced in the filter itself
+    if current_user.role == "manager":
+        if update.filter and update.filter.service_location and update.filter.service_location != current_user.assigned_location:
+            raise HTTPException(status_code=403, detail="Cannot edit submissions from other locations")
+        query["service_location"] = current_user.assigned_location
+    
+    # Pipeline update so documents already in the target status are matched but left untouched,
+    # which keeps repeated requests idempotent and makes modified_count exact
+    now = datetime.utcnow()
+    unchanged = {"$eq": ["$status", update.status]}
+    result = await db.data_submissions.update_many(query, [{"$set": {
+        "updated_at": {"$cond": [unchanged, "$updated_at", now]},
+        "updated_by": {"$cond": [unchanged, "$updated_by", current_user.id]},
+        "status": update.status
+    }}])
+    bump_collection_version("data_submissions")
+    notify_dashboard_change([query["service_location"]] if isinstance(query.get("service_location"), str) else None)
+    
+    response = {
+        "status": update.status,
+        "matched": result.matched_count,
+        "modified": result.modified_count,
+        "skipped": result.matched_count - result.modified_count
+    }
+    if update.submission_ids:
+        # Counted from the ids alone: ids that exist but fail the filter were found, just not matched
+        id_query = {"id": query["id"]}
+        if current_user.role == "manager":
+            id_query["service_location"] = current_user.assigned_location
+        found_ids = await db.data_submissions.distinct("id", id_query)
+        response["not_found"] = len(query["id"]["$in"]) - len(found_ids)
+    
+    logger.info(f"Bulk status update to {update.status} by {current_user.username}: {response}")
+    return response
+
 @api_router.delete("/submissions/{submission_id}")
-async def delete_submission(submission_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def delete_submission(submission_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Delete a submission (Admin only)"""
     # Check if submission exists
     submission = await db.data_submissions.find_one({"id": submission_id})
@@ -994,6 +2411,8 @@ async def delete_submission(submission_id: str, current_user: User = Depends(req
     
     # Delete the submission
     result = await db.data_submissions.delete_one({"id": submission_id})
+    bump_collection_version("data_submissions")
+    notify_dashboard_change([submission["service_location"]])
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Submission not found")
@@ -1009,8 +2428,20 @@ async def delete_submission(submission_id: str, current_user: User = Depends(req
     }
 
 # File Upload Routes
+def upload_sha256(upload_file) -> str:
+    """Content hash of an uploaded file, leaving it rewound for saving"""
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: upload_file.read(1024 * 1024), b""):
+        digest.update(chunk)
+    upload_file.seek(0)
+    return digest.hexdigest()
+
 @api_router.post("/upload")
-async def upload_file(file: UploadFile = File(...), current_user: User = Depends(get_current_user)):
+async def upload_file(
+    file: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(None),
+    current_user: User = Depends(get_current_user)
+):
     # Validate file type
     allowed_types = {
         'image/jpeg', 'image/png', 'image/gif', 'image/webp',
@@ -1028,12 +2459,31 @@ async def upload_file(file: UploadFile = File(...), current_user: User = Depends
     file_extension = file.filename.split('.')[-1]
     unique_filename = f"{uuid.uuid4()}.{file_extension}"
     file_path = UPLOAD_DIR / unique_filename
+    response = {"filename": unique_filename, "original_name": file.filename}
+    
+    if idempotency_key:
+        # Same key with different bytes is a different request, even under the same filename
+        fingerprint = await asyncio.get_running_loop().run_in_executor(None, upload_sha256, file.file)
+        claim = await claim_idempotency_key(current_user.id, "upload", idempotency_key, response, fingerprint)
+        if claim and "response" in claim:
+            return idempotent_replay(claim["response"])
+        if claim:
+            # Took over from a request that died: write the same file name again (same content)
+            response = claim["pending"]
+            file_path = UPLOAD_DIR / response["filename"]
     
     # Save file
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    try:
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(file.file, buffer)
+    except Exception:
+        if idempotency_key:
+            await release_idempotency_key(current_user.id, "upload", idempotency_key)
+        raise
+    if idempotency_key:
+        await complete_idempotency_key(current_user.id, "upload", idempotency_key, response)
     
-    return {"filename": unique_filename, "original_name": file.filename}
+    return response
 
 @api_router.get("/files/{filename}")
 async def get_file(filename: str):
@@ -1043,14 +2493,189 @@ async def get_file(filename: str):
     return FileResponse(file_path)
 
 # Report Generation Routes
-@api_router.get("/reports/csv")
-async def export_csv(
-    location: Optional[str] = None,
-    month_year: Optional[str] = None,
-    template_id: Optional[str] = None,
-    current_user: User = Depends(require_role(["admin", "manager"]))
-):
-    # Get submissions based on filters
+async def iter_export_submissions(query: Dict[str, Any], projection: Dict[str, Any], sort: Optional[List] = None):
+    """Yield hot submissions from a batched cursor, then any archived months the filters reach"""
+    cursor = db.data_submissions.find(query, projection).batch_size(EXPORT_BATCH_SIZE)
+    if sort:
+        cursor = cursor.sort(sort)
+    async for submission in cursor:
+        yield submission
+    
+    archive_entries = await find_archive_entries(
+        month_year=query.get("month_year"),
+        locations=[query["service_location"]] if "service_location" in query else None,
+        templates=[query["template_id"]] if "template_id" in query else None
+    )
+    async for submission in iter_archived_submissions(archive_entries, query):
+        yield apply_projection(submission, projection)
+
+async def get_export_layout(template_id: Optional[str] = None, include_fields: bool = True) -> Dict[str, Any]:
+    """Export columns from template field definitions: one template's fields, or the union over all templates.
+
+    Cached until the next template write, which bumps the form_templates version.
+    """
+    version = _collection_versions.get("form_templates", 0)
+    key = (template_id or "*", version)
+    layout = _export_layout_cache.get(key)
+    if layout is None:
+        query = {"id": template_id} if template_id else {}
+        templates = await db.form_templates.find(
+            query, {"_id": 0, "id": 1, "name": 1, "fields": 1, "is_active": 1}
+        ).sort([("is_active", -1), ("name", 1)]).to_list(None)
+        if template_id and not templates:
+            raise HTTPException(status_code=404, detail="Template not found")
+        
+        # First definition of a field name wins; active templates come first
+        columns = OrderedDict()
+        for template in templates:
+            for field in template.get("fields", []):
+                name = field.get("name")
+                if name and name not in columns:
+                    columns[name] = field.get("label") or name
+        layout = {
+            "fields": list(columns.items()),
+            "template_names": {template["id"]: template["name"] for template in templates}
+        }
+        for stale in [cached for cached in _export_layout_cache if cached[1] != version]:
+            del _export_layout_cache[stale]
+        _export_layout_cache[key] = layout
+    if not include_fields:
+        return {**layout, "fields": []}
+    return layout
+
+def format_export_value(value: Any) -> Any:
+    if isinstance(value, list):
+        return "; ".join(str(item) for item in value)
+    return value
+
+async def iter_batches(items, size: int):
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def export_header(layout: Dict[str, Any]) -> List[str]:
+    return (
+        ["ID", "Template", "Location", "Month/Year", "Submitted By", "Submitted At"]
+        + [label for _, label in layout["fields"]]
+        + (["Other Fields"] if layout["fields"] else [])
+    )
+
+async def iter_export_batches(submissions, layout: Dict[str, Any]):
+    """Yield (submission, row) batches in the layout's column order, shared by the tabular writers"""
+    field_names = [name for name, _ in layout["fields"]]
+    known_fields = set(field_names)
+    template_names = layout["template_names"]
+    async for batch in iter_batches(submissions, EXPORT_BATCH_SIZE):
+        # One username lookup per cursor batch instead of one per row
+        usernames = await resolve_usernames(submission["submitted_by"] for submission in batch)
+        rows = []
+        for submission in batch:
+            row = [
+                submission["id"],
+                template_names.get(submission["template_id"], submission["template_id"]),
+                submission["service_location"],
+                submission["month_year"],
+                usernames.get(submission["submitted_by"], submission["submitted_by"]),
+                submission["submitted_at"]
+            ]
+            if field_names:
+                form_data = submission.get("form_data") or {}
+                row.extend(format_export_value(form_data.get(name, "")) for name in field_names)
+                # Keys no template defines (e.g. removed fields) are kept rather than dropped
+                extra = {key: value for key, value in form_data.items() if key not in known_fields}
+                row.append(json.dumps(extra, default=str) if extra else "")
+            rows.append((submission, row))
+        yield rows
+
+async def stream_submissions_csv(submissions, layout: Dict[str, Any]):
+    """Encode submissions as CSV in the layout's column order, yielding a chunk every EXPORT_CHUNK_BYTES"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(export_header(layout))
+    
+    async for batch in iter_export_batches(submissions, layout):
+        for _, row in batch:
+            writer.writerow(row)
+            if output.tell() >= EXPORT_CHUNK_BYTES:
+                yield output.getvalue().encode()
+                output.seek(0)
+                output.truncate()
+    
+    if output.tell():
+        yield output.getvalue().encode()
+
+def xlsx_cell(value: Any) -> Any:
+    if value is None or isinstance(value, (int, float, bool, datetime)):
+        return value
+    # Control characters in free text are not allowed in the sheet XML; openpyxl raises on them
+    return ILLEGAL_CHARACTERS_RE.sub("", str(value))
+
+def add_xlsx_sheet(state: Dict[str, Any]):
+    state["sheets"] += 1
+    title = "Submissions" if state["sheets"] == 1 else f"Submissions ({state['sheets']})"
+    state["worksheet"] = state["workbook"].create_sheet(title)
+    state["worksheet"].append([xlsx_cell(value) for value in state["header"]])
+    state["rows"] = 1
+
+def append_xlsx_rows(state: Dict[str, Any], rows: List[List[Any]]):
+    """Append rows, continuing on a new sheet (with the header repeated) at Excel's row limit"""
+    for row in rows:
+        if state["rows"] >= XLSX_MAX_ROWS:
+            add_xlsx_sheet(state)
+        state["worksheet"].append([xlsx_cell(value) for value in row])
+        state["rows"] += 1
+
+async def stream_submissions_xlsx(submissions, layout: Dict[str, Any]):
+    """Write an XLSX workbook in openpyxl's write-only mode, then stream the finished file.
+
+    Write-only worksheets spill rows to a temporary file, so memory stays flat; the zip
+    container can only be streamed once the last row is in.
+    """
+    loop = asyncio.get_running_loop()
+    workbook = Workbook(write_only=True)
+    state = {"workbook": workbook, "header": export_header(layout), "sheets": 0, "worksheet": None, "rows": 0}
+    add_xlsx_sheet(state)
+    async for batch in iter_export_batches(submissions, layout):
+        # Cell serialisation is CPU-bound; keep it off the event loop
+        await loop.run_in_executor(None, append_xlsx_rows, state, [row for _, row in batch])
+    
+    with tempfile.TemporaryFile() as artifact:
+        await loop.run_in_executor(None, workbook.save, artifact)
+        artifact.seek(0)
+        while True:
+            chunk = await loop.run_in_executor(None, artifact.read, EXPORT_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+
+def json_export_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+async def stream_submissions_ndjson(submissions, layout: Dict[str, Any]):
+    """One JSON object per line: the submission as stored plus resolved template and user names"""
+    output = io.StringIO()
+    async for batch in iter_export_batches(submissions, layout):
+        for submission, row in batch:
+            record = {**submission, "template_name": row[1], "submitted_by_username": row[4]}
+            output.write(json.dumps(record, default=json_export_default, separators=(",", ":")))
+            output.write("\n")
+            if output.tell() >= EXPORT_CHUNK_BYTES:
+                yield output.getvalue().encode()
+                output.seek(0)
+                output.truncate()
+    
+    if output.tell():
+        yield output.getvalue().encode()
+
+def build_export_query(current_user, location: Optional[str], month_year: Optional[str], template_id: Optional[str]) -> Dict[str, Any]:
+    """Submission filter for exports; managers are always limited to their own location"""
     query = {}
     if current_user.role == "manager":
         query["service_location"] = current_user.assigned_location
@@ -1061,50 +2686,71 @@ async def export_csv(
         query["month_year"] = month_year
     if template_id:
         query["template_id"] = template_id
-    
-    submissions = await db.data_submissions.find(query).to_list(1000)
-    
-    # Remove ObjectIds for CSV processing
-    for submission in submissions:
-        if "_id" in submission:
-            del submission["_id"]
-    
-    # Create CSV
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # Write header
-    if submissions:
-        headers = ["ID", "Template", "Location", "Month/Year", "Submitted By", "Submitted At"]
-        # Add dynamic form field headers
-        if submissions[0].get("form_data"):
-            headers.extend(submissions[0]["form_data"].keys())
-        writer.writerow(headers)
-        
-        # Write data
-        for submission in submissions:
-            row = [
-                submission["id"],
-                submission["template_id"],
-                submission["service_location"],
-                submission["month_year"],
-                submission["submitted_by"],
-                submission["submitted_at"]
-            ]
-            if submission.get("form_data"):
-                row.extend(submission["form_data"].values())
-            writer.writerow(row)
-    
-    output.seek(0)
+    return query
+
+async def stream_submissions_export(
+    export_format: str,
+    current_user,
+    location: Optional[str],
+    month_year: Optional[str],
+    template_id: Optional[str],
+    view: str
+):
+    """Encoded chunks of a tabular export; filters and role scoping are the same for every format"""
+    projection = build_submission_projection(view)
+    query = build_export_query(current_user, location, month_year, template_id)
+    layout = await get_export_layout(template_id, include_fields=view != "summary")
+    return EXPORT_WRITERS[export_format](iter_export_submissions(query, projection), layout)
+
+def export_response(export_format: str, chunks) -> StreamingResponse:
     return StreamingResponse(
-        io.BytesIO(output.getvalue().encode()),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=report.csv"}
+        chunks,
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f"attachment; filename=report.{export_format}"}
     )
 
+@api_router.get("/reports/csv")
+async def export_csv(
+    location: Optional[str] = None,
+    month_year: Optional[str] = None,
+    template_id: Optional[str] = None,
+    view: str = "full",
+    current_user: TokenPrincipal = Depends(require_role(["admin", "manager"]))
+):
+    chunks = await stream_submissions_export("csv", current_user, location, month_year, template_id, view)
+    return export_response("csv", chunks)
+
+@api_router.get("/reports/xlsx")
+async def export_xlsx(
+    location: Optional[str] = None,
+    month_year: Optional[str] = None,
+    template_id: Optional[str] = None,
+    view: str = "full",
+    current_user: TokenPrincipal = Depends(require_role(["admin", "manager"]))
+):
+    chunks = await stream_submissions_export("xlsx", current_user, location, month_year, template_id, view)
+    return export_response("xlsx", chunks)
+
+@api_router.get("/reports/ndjson")
+async def export_ndjson(
+    location: Optional[str] = None,
+    month_year: Optional[str] = None,
+    template_id: Optional[str] = None,
+    view: str = "full",
+    current_user: TokenPrincipal = Depends(require_role(["admin", "manager"]))
+):
+    chunks = await stream_submissions_export("ndjson", current_user, location, month_year, template_id, view)
+    return export_response("ndjson", chunks)
+
+EXPORT_WRITERS = {
+    "csv": stream_submissions_csv,
+    "xlsx": stream_submissions_xlsx,
+    "ndjson": stream_submissions_ndjson
+}
+
 # User Role Management Routes (Admin only)
 @api_router.post("/roles", response_model=UserRole)
-async def create_role(role_data: UserRoleCreate, current_user: User = Depends(require_role(["admin"]))):
+async def create_role(role_data: UserRoleCreate, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     # Check if role name already exists
     existing_role = await db.user_roles.find_one({"name": role_data.name})
     if existing_role:
@@ -1112,10 +2758,16 @@ async def create_role(role_data: UserRoleCreate, current_user: User = Depends(re
     
     role = UserRole(**role_data.dict(), created_by=current_user.id)
     await db.user_roles.insert_one(role.dict())
+    bump_collection_version("user_roles")
     return role
 
 @api_router.get("/roles")
-async def get_roles(current_user: User = Depends(require_role(["admin"]))):
+async def get_roles(request: Request, response: Response, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
+    etag = collection_etag("user_roles")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     roles = await db.user_roles.find({"is_active": True}).to_list(1000)
     
     # Remove ObjectIds for JSON serialization
@@ -1126,7 +2778,7 @@ async def get_roles(current_user: User = Depends(require_role(["admin"]))):
     return roles
 
 @api_router.get("/roles/{role_id}")
-async def get_role(role_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def get_role(role_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     role = await db.user_roles.find_one({"id": role_id})
     if not role:
         raise HTTPException(status_code=404, detail="Role not found")
@@ -1138,7 +2790,7 @@ async def get_role(role_id: str, current_user: User = Depends(require_role(["adm
     return role
 
 @api_router.put("/roles/{role_id}")
-async def update_role(role_id: str, role_data: UserRoleCreate, current_user: User = Depends(require_role(["admin"]))):
+async def update_role(role_id: str, role_data: UserRoleCreate, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     # Check if role exists
     existing_role = await db.user_roles.find_one({"id": role_id})
     if not existing_role:
@@ -1155,10 +2807,11 @@ async def update_role(role_id: str, role_data: UserRoleCreate, current_user: Use
     update_data["updated_by"] = current_user.id
     
     await db.user_roles.update_one({"id": role_id}, {"$set": update_data})
+    bump_collection_version("user_roles")
     return {"message": "Role updated successfully"}
 
 @api_router.delete("/roles/{role_id}")
-async def delete_role(role_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def delete_role(role_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     # Check if role exists
     role = await db.user_roles.find_one({"id": role_id})
     if not role:
@@ -1174,6 +2827,7 @@ async def delete_role(role_id: str, current_user: User = Depends(require_role(["
         raise HTTPException(status_code=400, detail=f"Cannot delete role: {len(users_with_role)} users are assigned to this role")
     
     await db.user_roles.update_one({"id": role_id}, {"$set": {"is_active": False}})
+    bump_collection_version("user_roles")
     return {"message": "Role deleted successfully"}
 
 # Enhanced function to get available roles
@@ -1184,7 +2838,7 @@ async def get_available_roles():
 
 # Admin Settings Routes
 @api_router.post("/admin/settings")
-async def create_or_update_setting(setting_data: AdminSettingCreate, current_user: User = Depends(require_role(["admin"]))):
+async def create_or_update_setting(setting_data: AdminSettingCreate, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     # Check if setting already exists
     existing_setting = await db.admin_settings.find_one({"setting_key": setting_data.setting_key})
     
@@ -1197,15 +2851,24 @@ async def create_or_update_setting(setting_data: AdminSettingCreate, current_use
             "updated_at": datetime.utcnow()
         }
         await db.admin_settings.update_one({"setting_key": setting_data.setting_key}, {"$set": update_data})
+        bump_collection_version("admin_settings")
+        notify_dashboard_change()
         return {"message": "Setting updated successfully"}
     else:
         # Create new setting
         setting = AdminSetting(**setting_data.dict(), updated_by=current_user.id)
         await db.admin_settings.insert_one(setting.dict())
+        bump_collection_version("admin_settings")
+        notify_dashboard_change()
         return {"message": "Setting created successfully"}
 
 @api_router.get("/admin/settings/{setting_key}")
-async def get_setting(setting_key: str, current_user: User = Depends(get_current_user)):
+async def get_setting(setting_key: str, request: Request, response: Response, current_user: User = Depends(get_current_user)):
+    etag = collection_etag("admin_settings", setting_key)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    set_etag(response, etag)
+    
     setting = await db.admin_settings.find_one({"setting_key": setting_key})
     if not setting:
         return {"setting_key": setting_key, "setting_value": None}
@@ -1217,7 +2880,7 @@ async def get_setting(setting_key: str, current_user: User = Depends(get_current
     return setting
 
 @api_router.get("/admin/settings")
-async def get_all_settings(current_user: User = Depends(require_role(["admin"]))):
+async def get_all_settings(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     settings = await db.admin_settings.find().to_list(1000)
     
     # Remove ObjectIds for JSON serialization
@@ -1227,13 +2890,64 @@ async def get_all_settings(current_user: User = Depends(require_role(["admin"]))
     
     return settings
 
+@api_router.post("/admin/submissions/reindex")
+async def start_submission_reindex(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
+    """Backfill derived submission fields (search text, typed form values) in the background"""
+    if _reindex_status["running"]:
+        raise HTTPException(status_code=409, detail="Reindex already running")
+    _reindex_status["running"] = True
+    asyncio.create_task(reindex_submissions())
+    return {"message": "Reindex started"}
+
+@api_router.get("/admin/submissions/reindex")
+async def get_submission_reindex_status(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
+    return _reindex_status
+
+@api_router.post("/admin/archive")
+async def start_archival(before_month: Optional[str] = None, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
+    """Archive every month older than before_month (default: the configured horizon) in the background"""
+    if before_month is None:
+        if ARCHIVE_HORIZON_MONTHS <= 0:
+            raise HTTPException(status_code=400, detail="before_month is required when no archive horizon is configured")
+        before_month = archive_cutoff_month(ARCHIVE_HORIZON_MONTHS)
+    try:
+        datetime.strptime(before_month, MONTH_YEAR_FORMAT)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="before_month must be in YYYY-MM format")
+    if _archive_status["running"]:
+        raise HTTPException(status_code=409, detail="Archival already running")
+    _archive_status["running"] = True
+    asyncio.create_task(archive_submissions(before_month))
+    return {"message": "Archival started", "before_month": before_month}
+
+@api_router.get("/admin/archive")
+async def get_archive_catalog(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
+    entries = await db.submission_archive.find({}, {"_id": 0}).sort("month_year", 1).to_list(None)
+    return {"status": _archive_status, "entries": entries}
+
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
+    """Get hit/miss counters for the in-process caches"""
+    return {
+        "principal_cache": get_principal_cache_stats(),
+        "password_pool": get_password_pool_stats(),
+        "pdf_render_pool": get_pdf_render_stats(),
+        "pdf_cache": get_pdf_cache_stats(),
+        "ingest": get_ingest_stats()
+    }
+
 # Dashboard Analytics Routes
-@api_router.get("/dashboard/submissions-by-location")
-async def get_submissions_by_location(
-    month_year: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
-):
-    """Get submission statistics by location"""
+def dashboard_location_scope(user) -> str:
+    """Locations whose submissions the user sees on the dashboard (ALL_LOCATIONS or one name)"""
+    if user.role in ["manager", "data_entry"]:
+        return user.assigned_location
+    return ALL_LOCATIONS
+
+def missing_reports_scope(user) -> str:
+    """Locations the user sees in the missing-reports list (ALL_LOCATIONS or one name)"""
+    return ALL_LOCATIONS if user.role == "admin" else user.assigned_location
+
+async def aggregate_submissions_by_location(month_year: Optional[str], location_scope: str):
     pipeline = []
     
     # Add month/year filter if provided
@@ -1242,8 +2956,8 @@ async def get_submissions_by_location(
         match_conditions["month_year"] = month_year
     
     # Role-based filtering
-    if current_user.role in ["manager", "data_entry"]:
-        match_conditions["service_location"] = current_user.assigned_location
+    if location_scope != ALL_LOCATIONS:
+        match_conditions["service_location"] = location_scope
     
     if match_conditions:
         pipeline.append({"$match": match_conditions})
@@ -1306,10 +3020,7 @@ async def get_submissions_by_location(
     results = await db.data_submissions.aggregate(pipeline).to_list(1000)
     return results
 
-@api_router.get("/dashboard/missing-reports")
-async def get_missing_reports(current_user: User = Depends(get_current_user)):
-    """Get locations that haven't submitted reports by the deadline"""
-    
+async def compute_missing_reports(location_scope: str):
     # Get deadline setting
     deadline_setting = await db.admin_settings.find_one({"setting_key": "report_deadline"})
     if not deadline_setting:
@@ -1334,7 +3045,7 @@ async def get_missing_reports(current_user: User = Depends(get_current_user)):
     for location in all_locations:
         if location["name"] not in submitted_locations:
             # Role-based filtering - only show if user has access
-            if current_user.role == "admin" or current_user.assigned_location == location["name"]:
+            if location_scope == ALL_LOCATIONS or location_scope == location["name"]:
                 missing_locations.append({
                     "id": location["id"],
                     "name": location["name"],
@@ -1347,9 +3058,153 @@ async def get_missing_reports(current_user: User = Depends(get_current_user)):
         "total_missing": len(missing_locations)
     }
 
+@api_router.get("/dashboard/submissions-by-location")
+async def get_submissions_by_location(
+    month_year: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get submission statistics by location"""
+    return await aggregate_submissions_by_location(month_year, dashboard_location_scope(current_user))
+
+@api_router.get("/dashboard/missing-reports")
+async def get_missing_reports(current_user: User = Depends(get_current_user)):
+    """Get locations that haven't submitted reports by the deadline"""
+    return await compute_missing_reports(missing_reports_scope(current_user))
+
+# Dashboard live updates (Server-Sent Events).
+# Viewers with the same scope share one subscription entry; a change event recomputes each
+# affected scope once and pushes the delta to every queue, instead of every viewer polling.
+async def compute_dashboard_snapshot(scope) -> Dict[str, Any]:
+    location_scope, missing_scope, month_year = scope
+    by_location = await aggregate_submissions_by_location(month_year, location_scope)
+    missing = await compute_missing_reports(missing_scope)
+    return jsonable_encoder({"submissions_by_location": by_location, "missing_reports": missing})
+
+def diff_dashboard_snapshots(old: Dict[str, Any], new: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    old_rows = {row["location"]: row for row in old["submissions_by_location"]}
+    new_rows = {row["location"]: row for row in new["submissions_by_location"]}
+    delta = {
+        "changed": [row for location, row in new_rows.items() if old_rows.get(location) != row],
+        "removed": [location for location in old_rows if location not in new_rows]
+    }
+    if new["missing_reports"] != old["missing_reports"]:
+        delta["missing_reports"] = new["missing_reports"]
+    if not delta["changed"] and not delta["removed"] and "missing_reports" not in delta:
+        return None
+    return delta
+
+def publish_dashboard_event(stream: Dict[str, Any], event: Dict[str, Any]):
+    for queue in list(stream["queues"]):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop its backlog and resynchronise it with a full snapshot
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({"type": "snapshot", "data": stream["snapshot"]})
+
+def notify_dashboard_change(locations: Optional[List[str]] = None):
+    """Schedule a recompute for every live scope that can see one of the changed locations"""
+    global _dashboard_refresh_task
+    for scope in _dashboard_streams:
+        location_scope, missing_scope, _ = scope
+        if locations is None or any(s == ALL_LOCATIONS or s in locations for s in (location_scope, missing_scope)):
+            _dashboard_pending_scopes.add(scope)
+    if _dashboard_pending_scopes and (_dashboard_refresh_task is None or _dashboard_refresh_task.done()):
+        _dashboard_refresh_task = asyncio.create_task(refresh_dashboard_streams())
+
+async def refresh_dashboard_streams():
+    while _dashboard_pending_scopes:
+        # Coalesce bursts of writes into one recompute per scope
+        await asyncio.sleep(DASHBOARD_STREAM_DEBOUNCE)
+        scopes = list(_dashboard_pending_scopes)
+        _dashboard_pending_scopes.clear()
+        for scope in scopes:
+            stream = _dashboard_streams.get(scope)
+            if not stream:
+                continue
+            try:
+                snapshot = await compute_dashboard_snapshot(scope)
+            except Exception as e:
+                logger.error(f"Error refreshing dashboard stream {scope}: {str(e)}")
+                continue
+            delta = diff_dashboard_snapshots(stream["snapshot"], snapshot) if stream["snapshot"] else None
+            stream["snapshot"] = snapshot
+            if delta:
+                publish_dashboard_event(stream, {"type": "delta", "data": delta})
+
+def format_sse(event: Dict[str, Any]) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], separators=(',', ':'))}\n\n"
+
+def issue_stream_ticket(token: str) -> str:
+    now = time.time()
+    for expired in [ticket for ticket, entry in _stream_tickets.items() if entry["expires_at"] <= now]:
+        del _stream_tickets[expired]
+    ticket = secrets.token_urlsafe(32)
+    _stream_tickets[ticket] = {"token": token, "expires_at": now + STREAM_TICKET_TTL}
+    return ticket
+
+def redeem_stream_ticket(ticket: str) -> Optional[str]:
+    """The JWT a ticket stands for; a ticket works once and only until it expires"""
+    entry = _stream_tickets.pop(ticket, None)
+    if not entry or entry["expires_at"] <= time.time():
+        return None
+    return entry["token"]
+
+@api_router.post("/auth/stream-ticket")
+async def create_stream_ticket(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Short-lived, single-use ticket for endpoints opened with EventSource (?ticket=)"""
+    await get_token_principal(credentials)
+    return {"ticket": issue_stream_ticket(credentials.credentials), "expires_in": STREAM_TICKET_TTL}
+
+async def get_stream_user(request: Request, ticket: Optional[str] = None) -> User:
+    """Bearer header, or a ?ticket= from /auth/stream-ticket, so the JWT never appears in a URL"""
+    authorization = request.headers.get("authorization", "")
+    token = authorization[7:] if authorization.lower().startswith("bearer ") else None
+    if not token and ticket:
+        token = redeem_stream_ticket(ticket)
+    if not token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    # Still a full token check, so logout and revocation apply to streams too
+    return await get_current_user(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token))
+
+@api_router.get("/dashboard/stream")
+async def dashboard_stream(request: Request, month_year: Optional[str] = None, current_user: User = Depends(get_stream_user)):
+    """Server-sent events: a snapshot on connect, then deltas as submissions change"""
+    scope = (dashboard_location_scope(current_user), missing_reports_scope(current_user), month_year)
+    snapshot = None if scope in _dashboard_streams else await compute_dashboard_snapshot(scope)
+    queue = asyncio.Queue(maxsize=DASHBOARD_STREAM_QUEUE_SIZE)
+    
+    async def event_generator():
+        # Registered here rather than in the handler: if the client goes away before the first
+        # iteration, the generator never runs and nothing is left behind in _dashboard_streams
+        stream = _dashboard_streams.setdefault(scope, {"queues": set(), "snapshot": snapshot})
+        stream["queues"].add(queue)
+        try:
+            if stream["snapshot"] is None:
+                stream["snapshot"] = await compute_dashboard_snapshot(scope)
+            yield format_sse({"type": "snapshot", "data": stream["snapshot"]})
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=DASHBOARD_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            stream["queues"].discard(queue)
+            if not stream["queues"] and _dashboard_streams.get(scope) is stream:
+                del _dashboard_streams[scope]
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # Statistics Routes
 @api_router.post("/statistics/generate")
-async def generate_statistics(query: StatisticsQuery, current_user: User = Depends(get_current_user)):
+async def generate_statistics(query: StatisticsQuery, current_user: TokenPrincipal = Depends(get_token_principal)):
     """Generate custom statistics based on query parameters"""
     
     # Check if user has access to statistics
@@ -1390,6 +3245,23 @@ async def generate_statistics(query: StatisticsQuery, current_user: User = Depen
     if match_conditions:
         pipeline.append({"$match": match_conditions})
     
+    # Pull in archived months only when a date range reaches into them: an unbounded query (the
+    # dashboard, the PDF summary) would otherwise stage every archive, so it must opt in
+    archive_entries = []
+    if "submitted_at" in match_conditions or query.include_archived:
+        archive_entries = await find_archive_entries(
+            date_from=match_conditions.get("submitted_at", {}).get("$gte"),
+            date_to=match_conditions.get("submitted_at", {}).get("$lte"),
+            locations=[match_conditions["service_location"]] if isinstance(match_conditions.get("service_location"), str) else query.locations,
+            templates=query.templates
+        )
+    if archive_entries:
+        stage_ids = await stage_archive_entries(archive_entries)
+        # Same dict as the hot $match, so conditions added below apply to both
+        pipeline.append({"$unionWith": {"coll": "archived_submissions", "pipeline": [
+            {"$match": {"$and": [match_conditions, {"stage_id": {"$in": stage_ids}}]}}
+        ]}})
+    
     # Lookup user information for user role filtering
     pipeline.append({
         "$lookup": {
@@ -1493,7 +3365,7 @@ async def generate_statistics(query: StatisticsQuery, current_user: User = Depen
     }
 
 @api_router.get("/statistics/options")
-async def get_statistics_options(current_user: User = Depends(get_current_user)):
+async def get_statistics_options(current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get available options for statistics filtering"""
     
     if "statistics" not in current_user.page_permissions and current_user.role != "admin":
@@ -1530,7 +3402,7 @@ async def get_statistics_options(current_user: User = Depends(get_current_user))
     }
 
 @api_router.get("/statistics/custom-fields")
-async def get_custom_fields_for_statistics(current_user: User = Depends(get_current_user)):
+async def get_custom_fields_for_statistics(current_user: TokenPrincipal = Depends(get_token_principal)):
     """Get available custom fields from templates for statistical analysis"""
     
     if "statistics" not in current_user.page_permissions and current_user.role != "admin":
@@ -1560,7 +3432,7 @@ async def get_custom_fields_for_statistics(current_user: User = Depends(get_curr
     return {"custom_fields": custom_fields}
 
 @api_router.post("/statistics/generate-custom-field")
-async def generate_custom_field_statistics(query: StatisticsQuery, current_user: User = Depends(get_current_user)):
+async def generate_custom_field_statistics(query: StatisticsQuery, current_user: TokenPrincipal = Depends(get_token_principal)):
     """Generate statistics for custom form fields"""
     
     if "statistics" not in current_user.page_permissions and current_user.role != "admin":
@@ -1602,26 +3474,33 @@ async def generate_custom_field_statistics(query: StatisticsQuery, current_user:
     
     # Get field values and analyze based on type
     if query.custom_field_analysis_type == "numerical":
-        # Numerical analysis - convert to numbers and calculate stats
+        # The typed value stored at write time for number fields; anything else (text-typed fields
+        # holding numbers, submissions not reindexed yet) is converted from form_data, and values that
+        # don't convert ("n/a") are left out
+        field_value = "$value"
+        stored_value = f"$form_values.{query.custom_field_name}"
         pipeline.extend([
             {
-                "$addFields": {
-                    "field_value_num": {
-                        "$toDouble": {
-                            "$ifNull": [f"$form_data.{query.custom_field_name}", 0]
-                        }
+                "$project": {
+                    "value": {
+                        "$cond": [
+                            {"$isNumber": stored_value},
+                            stored_value,
+                            {"$convert": {"input": f"$form_data.{query.custom_field_name}", "to": "double", "onError": None, "onNull": None}}
+                        ]
                     }
                 }
             },
+            {"$match": {"value": {"$type": "number"}}},
             {
                 "$group": {
                     "_id": None,
                     "total_count": {"$sum": 1},
-                    "average": {"$avg": "$field_value_num"},
-                    "sum": {"$sum": "$field_value_num"},
-                    "min": {"$min": "$field_value_num"},
-                    "max": {"$max": "$field_value_num"},
-                    "values": {"$push": "$field_value_num"}
+                    "average": {"$avg": field_value},
+                    "sum": {"$sum": field_value},
+                    "min": {"$min": field_value},
+                    "max": {"$max": field_value},
+                    "std_dev": {"$stdDevSamp": field_value}
                 }
             },
             {
@@ -1632,9 +3511,7 @@ async def generate_custom_field_statistics(query: StatisticsQuery, current_user:
                     "sum": {"$round": ["$sum", 2]},
                     "min": 1,
                     "max": 1,
-                    "std_dev": {
-                        "$round": [{"$stdDevSamp": "$values"}, 2]
-                    }
+                    "std_dev": {"$round": ["$std_dev", 2]}
                 }
             }
         ])
@@ -1714,157 +3591,679 @@ async def generate_custom_field_statistics(query: StatisticsQuery, current_user:
         "results": results
     }
 
+def check_pdf_report_access(report_type: str, current_user):
+    if report_type == "statistics" and "statistics" not in current_user.page_permissions and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Access to statistics reports denied")
+    if report_type == "detailed" and current_user.role not in ["admin", "manager"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+async def write_detailed_report_rows(query: Dict[str, Any], path: Path) -> int:
+    """Spool detailed report rows to NDJSON for the renderer to read lazily; returns the row count"""
+    layout = await get_export_layout()
+    labels = [label for _, label in layout["fields"]]
+    loop = asyncio.get_running_loop()
+    count = 0
+    with open(path, "w", encoding="utf-8") as rows_file:
+        submissions = iter_export_submissions(query, build_submission_projection("full"), sort=DETAILED_REPORT_SORT)
+        async for batch in iter_export_batches(submissions, layout):
+            lines = []
+            for submission, row in batch:
+                form_data = [f"{label}: {value}" for label, value in zip(labels, row[6:]) if value not in ("", None)]
+                if row[-1]:
+                    form_data.append(f"Other: {row[-1]}")
+                lines.append(json.dumps([
+                    row[5].strftime("%Y-%m-%d %H:%M") if isinstance(row[5], datetime) else str(row[5]),
+                    row[2], row[1], row[4], submission.get("status", ""), "; ".join(form_data)
+                ], default=str) + "\n")
+            count += len(lines)
+            await loop.run_in_executor(None, rows_file.write, "".join(lines))
+    return count
+
+def report_chart_data(by_location: List[Dict[str, Any]], by_month: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Chart series as [category, total, approved] rows in a fixed order, so equal aggregates give
+    an identical dataset and the renderer's drawing cache is shared across report variants"""
+    def series(items):
+        return [[str(item.get("category") or "Unknown"), item["total_submissions"], item["approved_count"]] for item in items]
+    return {
+        "by_location": sorted(series(by_location), key=lambda row: (-row[1], row[0])),
+        # Trailing window only: every month since the first submission would crowd the axis
+        "by_month": sorted(series(item for item in by_month if item.get("category")))[-REPORT_TREND_MONTHS:]
+    }
+
+async def collect_pdf_report_data(report_type: str, query_params: Optional[str], current_user: TokenPrincipal) -> Dict[str, Any]:
+    """Everything the renderer needs, as plain data it can receive in a worker process"""
+    parameters = []
+    params = {}
+    if query_params:
+        try:
+            params = json.loads(query_params)
+            for key, value in params.items():
+                if value:
+                    parameters.append([key.replace("_", " ").title() + ":", str(value)])
+        except:
+            pass
+    
+    report = {
+        "report_type": report_type,
+        # Rendered reports are shared by everyone with the same scope, so no per-user details
+        "scope": "All locations" if dashboard_location_scope(current_user) == ALL_LOCATIONS else dashboard_location_scope(current_user),
+        "generated_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC"),
+        "parameters": parameters,
+        "statistics": None,
+        "charts": None
+    }
+    # Get recent statistics data for the report
+    if report_type == "statistics":
+        stats_data = await generate_statistics(StatisticsQuery(), current_user)
+        report["statistics"] = {"summary": stats_data["summary"], "data": stats_data["data"]}
+        trend_data = await generate_statistics(StatisticsQuery(group_by="month"), current_user)
+        report["charts"] = report_chart_data(stats_data["data"], trend_data["data"])
+    elif report_type == "detailed":
+        if not isinstance(params, dict) or not params.get("month_year"):
+            raise HTTPException(status_code=400, detail="Detailed reports require month_year in query_params")
+        query = build_export_query(current_user, params.get("location"), params["month_year"], params.get("template_id"))
+        # Rows go through a temp file rather than the pickled payload, so neither process holds them all
+        fd, rows_path = tempfile.mkstemp(prefix="detailed-report-", suffix=".ndjson")
+        os.close(fd)
+        try:
+            report["row_count"] = await write_detailed_report_rows(query, Path(rows_path))
+        except Exception:
+            Path(rows_path).unlink(missing_ok=True)
+            raise
+        report["rows_path"] = rows_path
+    
+    return report
+
+async def run_pdf_render(render, payload: Dict[str, Any], user_id: Optional[str] = None) -> bytes:
+    """Render on the PDF process pool; 429 past the per-user limit, 503 once the pool's queue is full"""
+    global _pdf_executor, _pdf_jobs_in_flight
+    if user_id and _pdf_user_jobs.get(user_id, 0) >= PDF_RENDER_PER_USER:
+        _pdf_render_stats["rejected_user_limit"] += 1
+        raise HTTPException(
+            status_code=429,
+            detail="You already have reports rendering, please wait for them to finish",
+            headers={"Retry-After": str(PDF_RENDER_RETRY_AFTER)}
+        )
+    if _pdf_jobs_in_flight >= PDF_RENDER_WORKERS + PDF_RENDER_MAX_QUEUE:
+        _pdf_render_stats["rejected_queue_full"] += 1
+        raise HTTPException(
+            status_code=503,
+            detail="Report rendering is busy, please retry shortly",
+            headers={"Retry-After": str(PDF_RENDER_RETRY_AFTER)}
+        )
+    
+    _pdf_jobs_in_flight += 1
+    _pdf_render_stats["peak_in_flight"] = max(_pdf_render_stats["peak_in_flight"], _pdf_jobs_in_flight)
+    if user_id:
+        _pdf_user_jobs[user_id] = _pdf_user_jobs.get(user_id, 0) + 1
+    submitted_at = time.time()
+    try:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(_pdf_executor, timed_render, render, payload)
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM); replace the pool so later reports can still render
+        _pdf_render_stats["failed"] += 1
+        _pdf_executor = ProcessPoolExecutor(max_workers=PDF_RENDER_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        raise
+    except Exception:
+        _pdf_render_stats["failed"] += 1
+        raise
+    finally:
+        _pdf_jobs_in_flight -= 1
+        if user_id:
+            _pdf_user_jobs[user_id] -= 1
+            if not _pdf_user_jobs[user_id]:
+                del _pdf_user_jobs[user_id]
+    
+    wait_ms = max(0.0, result["started_at"] - submitted_at) * 1000
+    render_ms = result["render_seconds"] * 1000
+    _pdf_render_stats["completed"] += 1
+    _pdf_render_stats["total_wait_ms"] += wait_ms
+    _pdf_render_stats["max_wait_ms"] = max(_pdf_render_stats["max_wait_ms"], wait_ms)
+    _pdf_render_stats["total_render_ms"] += render_ms
+    _pdf_render_stats["max_render_ms"] = max(_pdf_render_stats["max_render_ms"], render_ms)
+    return result["content"]
+
+def get_pdf_render_stats() -> Dict[str, Any]:
+    completed = _pdf_render_stats["completed"]
+    return {
+        **_pdf_render_stats,
+        "avg_wait_ms": round(_pdf_render_stats["total_wait_ms"] / completed, 1) if completed else 0.0,
+        "avg_render_ms": round(_pdf_render_stats["total_render_ms"] / completed, 1) if completed else 0.0,
+        "in_flight": _pdf_jobs_in_flight,
+        "users_rendering": len(_pdf_user_jobs),
+        "workers": PDF_RENDER_WORKERS,
+        "max_queue": PDF_RENDER_MAX_QUEUE,
+        "per_user_limit": PDF_RENDER_PER_USER
+    }
+
+async def build_pdf_report(report_type: str, query_params: Optional[str], current_user: TokenPrincipal,
+                           enforce_user_limit: bool = True) -> bytes:
+    """Aggregate on the event loop, render in the PDF process pool, return the PDF bytes"""
+    report = await collect_pdf_report_data(report_type, query_params, current_user)
+    render = render_detailed_report if report_type == "detailed" else render_pdf_report
+    try:
+        return await run_pdf_render(render, report, current_user.id if enforce_user_limit else None)
+    finally:
+        if report.get("rows_path"):
+            Path(report["rows_path"]).unlink(missing_ok=True)
+
+def normalize_query_params(query_params: Optional[str]) -> Any:
+    """Parsed query_params without empty values, so equivalent requests share a cache key"""
+    if not query_params:
+        return None
+    try:
+        params = json.loads(query_params)
+    except ValueError:
+        return query_params
+    if not isinstance(params, dict):
+        return params
+    return {key: value for key, value in params.items() if value} or None
+
+def pdf_cache_key(report_type: str, query_params: Optional[str], current_user) -> str:
+    raw = json.dumps({
+        "report_type": report_type,
+        "query_params": normalize_query_params(query_params),
+        "scope": dashboard_location_scope(current_user),
+        "version": f"{_BOOT_ID}-{_collection_versions.get('data_submissions', 0)}"
+    }, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def get_cached_pdf(key: str) -> Optional[Path]:
+    entry = _pdf_cache.get(key)
+    if entry is None or not entry["path"].exists():
+        _pdf_cache_stats["misses"] += 1
+        return None
+    _pdf_cache.move_to_end(key)
+    _pdf_cache_stats["hits"] += 1
+    return entry["path"]
+
+def write_cached_pdf(key: str, content: bytes) -> Path:
+    """Write a rendered PDF into the cache directory (blocking; the index is updated separately)"""
+    PDF_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PDF_CACHE_DIR / f"{key}.pdf"
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_bytes(content)
+    temp_path.rename(path)
+    return path
+
+def store_cached_pdf(key: str, path: Path, size: int) -> Path:
+    """Index a written PDF and evict least recently used entries beyond PDF_CACHE_MAX_BYTES.
+
+    Runs on the event loop only, so the index and byte count have a single writer. Evicted files
+    are unlinked after PDF_CACHE_EVICT_GRACE, since a request may already be about to serve one.
+    """
+    global _pdf_cache_bytes
+    previous = _pdf_cache.pop(key, None)
+    if previous:
+        _pdf_cache_bytes -= previous["size"]
+    _pdf_cache[key] = {"path": path, "size": size}
+    _pdf_cache_bytes += size
+    now = time.time()
+    # Never evict the entry that was just stored; it is about to be served
+    while _pdf_cache_bytes > PDF_CACHE_MAX_BYTES and len(_pdf_cache) > 1:
+        _, evicted = _pdf_cache.popitem(last=False)
+        _pdf_cache_evicted.append((now, evicted["path"]))
+        _pdf_cache_bytes -= evicted["size"]
+        _pdf_cache_stats["evictions"] += 1
+    
+    live_paths = {entry["path"] for entry in _pdf_cache.values()}
+    while _pdf_cache_evicted and _pdf_cache_evicted[0][0] <= now - PDF_CACHE_EVICT_GRACE:
+        _, evicted_path = _pdf_cache_evicted.popleft()
+        # The key may have been rendered again since, reusing the same file name
+        if evicted_path not in live_paths:
+            evicted_path.unlink(missing_ok=True)
+    return path
+
+async def render_cached_pdf_report(report_type: str, query_params: Optional[str], current_user,
+                                   enforce_user_limit: bool = True) -> Path:
+    """Path of the rendered report, rendering at most once per key even under concurrent requests"""
+    key = pdf_cache_key(report_type, query_params, current_user)
+    path = get_cached_pdf(key)
+    if path:
+        return path
+    pending = _pdf_cache_pending.get(key)
+    if pending:
+        return await asyncio.shield(pending)
+    
+    future = asyncio.get_running_loop().create_future()
+    _pdf_cache_pending[key] = future
+    try:
+        content = await build_pdf_report(report_type, query_params, current_user, enforce_user_limit)
+        path = await asyncio.get_running_loop().run_in_executor(None, write_cached_pdf, key, content)
+        store_cached_pdf(key, path, len(content))
+        future.set_result(path)
+        return path
+    except Exception as e:
+        future.set_exception(e)
+        # Waiters get the exception; mark it retrieved so an unwaited future doesn't log it
+        future.exception()
+        raise
+    finally:
+        if not future.done():
+            future.cancel()
+        del _pdf_cache_pending[key]
+
+def get_pdf_cache_stats() -> Dict[str, Any]:
+    return {
+        **_pdf_cache_stats,
+        "entries": len(_pdf_cache),
+        "bytes": _pdf_cache_bytes,
+        "max_bytes": PDF_CACHE_MAX_BYTES
+    }
+
 @api_router.get("/reports/pdf")
 async def generate_pdf_report(
     report_type: str = "statistics",
     query_params: Optional[str] = None,
-    current_user: User = Depends(get_current_user)
+    current_user: TokenPrincipal = Depends(get_token_principal)
 ):
     """Generate comprehensive PDF report"""
     
-    if report_type == "statistics" and "statistics" not in current_user.page_permissions and current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Access to statistics reports denied")
+    check_pdf_report_access(report_type, current_user)
     
     try:
-        from io import BytesIO
-        
-        # Create PDF buffer
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        styles = getSampleStyleSheet()
-        story = []
-        
-        # Title
-        title = Paragraph(f"CLIENT SERVICES Platform - {report_type.title()} Report", styles['Title'])
-        story.append(title)
-        story.append(Spacer(1, 12))
+        path = await render_cached_pdf_report(report_type, query_params, current_user)
+        return FileResponse(path, media_type="application/pdf", filename=f"{report_type}_report.pdf")
         
-        # Report metadata
-        report_info = [
-            ["Generated By:", current_user.username],
-            ["Generated At:", datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")],
-            ["Report Type:", report_type.title()]
-        ]
-        
-        if query_params:
-            import json
-            try:
-                params = json.loads(query_params)
-                for key, value in params.items():
-                    if value:
-                        report_info.append([key.replace("_", " ").title() + ":", str(value)])
-            except:
-                pass
-        
-        info_table = Table(report_info, colWidths=[2*72, 4*72])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating PDF report: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error generating PDF report: {str(e)}")
+
+# Export Jobs
+def export_data_version() -> str:
+    return f"{_BOOT_ID}-{_collection_versions.get('data_submissions', 0)}-{_collection_versions.get('form_templates', 0)}"
+
+def export_cache_key(request: ExportJobCreate, current_user: TokenPrincipal) -> str:
+    """Identical filters and visibility against the same data version share one artifact"""
+    if request.format == "pdf":
+        scope = {
+            "locations": dashboard_location_scope(current_user),
+            "report_type": request.report_type,
+            "query_params": normalize_query_params(request.query_params)
+        }
+    else:
+        scope = {
+            "query": build_export_query(current_user, request.location, request.month_year, request.template_id),
+            "view": request.view
+        }
+    raw = json.dumps({"format": request.format, "scope": scope, "version": export_data_version()}, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+def export_job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    view = {key: value for key, value in job.items() if key not in ("key", "path", "owners")}
+    if job["status"] == "completed":
+        view["download_url"] = f"/api/exports/{job['id']}/download"
+    return view
+
+def get_export_job(job_id: str, current_user) -> Dict[str, Any]:
+    job = _export_jobs.get(job_id)
+    if not job or (current_user.id not in job["owners"] and current_user.role != "admin"):
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+def purge_expired_export_jobs():
+    cutoff = datetime.utcnow() - timedelta(seconds=EXPORT_JOB_TTL)
+    for job_id, job in list(_export_jobs.items()):
+        if job["finished_at"] and job["finished_at"] < cutoff:
+            if job.get("path"):
+                job["path"].unlink(missing_ok=True)
+            if _export_job_keys.get(job["key"]) == job_id:
+                del _export_job_keys[job["key"]]
+            del _export_jobs[job_id]
+
+async def run_export_job(job: Dict[str, Any], request: ExportJobCreate, current_user: TokenPrincipal):
+    loop = asyncio.get_running_loop()
+    path = EXPORT_JOB_DIR / f"{job['id']}.{request.format}"
+    try:
+        async with _export_job_slots:
+            job.update({"status": "running", "started_at": datetime.utcnow()})
+            EXPORT_JOB_DIR.mkdir(parents=True, exist_ok=True)
+            if request.format in EXPORT_WRITERS:
+                query = build_export_query(current_user, request.location, request.month_year, request.template_id)
+                projection = build_submission_projection(request.view)
+                layout = await get_export_layout(request.template_id, include_fields=request.view != "summary")
+                archive_entries = await find_archive_entries(
+                    month_year=query.get("month_year"),
+                    locations=[query["service_location"]] if "service_location" in query else None,
+                    templates=[query["template_id"]] if "template_id" in query else None
+                )
+                # Archived counts are per catalog entry, so the total is an upper bound when they are involved
+                job["progress"]["total"] = await db.data_submissions.count_documents(query) \
+                    + sum(entry["count"] for entry in archive_entries)
+                
+                async def counted(submissions):
+                    async for submission in submissions:
+                        job["progress"]["processed"] += 1
+                        yield submission
+                
+                with open(path, "wb") as artifact:
+                    writer = EXPORT_WRITERS[request.format]
+                    async for chunk in writer(counted(iter_export_submissions(query, projection)), layout):
+                        await loop.run_in_executor(None, artifact.write, chunk)
+            else:
+                job["progress"]["total"] = 1
+                # Jobs are already bounded by EXPORT_JOB_MAX_CONCURRENT, so skip the per-user limit
+                rendered = await render_cached_pdf_report(request.report_type, request.query_params, current_user, enforce_user_limit=False)
+                # Copy out of the LRU cache so eviction can't pull the artifact from under the job
+                await loop.run_in_executor(None, shutil.copyfile, rendered, path)
+                job["progress"]["processed"] = 1
+        job.update({"status": "completed", "path": path, "size": path.stat().st_size, "finished_at": datetime.utcnow()})
+    except Exception as e:
+        logger.error(f"Export job {job['id']} failed: {str(e)}")
+        path.unlink(missing_ok=True)
+        if _export_job_keys.get(job["key"]) == job["id"]:
+            del _export_job_keys[job["key"]]
+        job.update({"status": "failed", "error": getattr(e, "detail", None) or str(e), "finished_at": datetime.utcnow()})
+
+@api_router.post("/exports")
+async def create_export_job(request: ExportJobCreate, current_user: TokenPrincipal = Depends(get_token_principal)):
+    """Start a CSV or PDF export in the background, or reuse an identical one"""
+    if request.format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if request.format in EXPORT_WRITERS:
+        if current_user.role not in ["admin", "manager"]:
+            raise HTTPException(status_code=403, detail="Insufficient permissions")
+        build_submission_projection(request.view)
+        if request.template_id:
+            await get_export_layout(request.template_id)
+    else:
+        check_pdf_report_access(request.report_type, current_user)
+    
+    purge_expired_export_jobs()
+    key = export_cache_key(request, current_user)
+    existing = _export_jobs.get(_export_job_keys.get(key))
+    if existing and existing["status"] != "failed":
+        existing["owners"].add(current_user.id)
+        return {**export_job_view(existing), "cached": True}
+    
+    job = {
+        "id": str(uuid.uuid4()),
+        "key": key,
+        "format": request.format,
+        "status": "queued",
+        "progress": {"processed": 0, "total": None},
+        "owners": {current_user.id},
+        "created_by": current_user.id,
+        "created_at": datetime.utcnow(),
+        "started_at": None,
+        "finished_at": None,
+        "size": None,
+        "error": None
+    }
+    _export_jobs[job["id"]] = job
+    _export_job_keys[key] = job["id"]
+    asyncio.create_task(run_export_job(job, request, current_user))
+    return {**export_job_view(job), "cached": False}
+
+@api_router.get("/exports/{job_id}")
+async def get_export_job_status(job_id: str, current_user: TokenPrincipal = Depends(get_token_principal)):
+    return export_job_view(get_export_job(job_id, current_user))
+
+@api_router.get("/exports/{job_id}/events")
+async def export_job_events(job_id: str, request: Request, current_user: User = Depends(get_stream_user)):
+    """Server-sent progress events until the job completes or fails"""
+    job = get_export_job(job_id, current_user)
+    
+    async def event_generator():
+        last = None
+        while not await request.is_disconnected():
+            view = jsonable_encoder(export_job_view(job))
+            if view != last:
+                yield format_sse({"type": "progress", "data": view})
+                last = view
+            if job["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(EXPORT_JOB_EVENT_INTERVAL)
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/exports/{job_id}/download")
+async def download_export(job_id: str, current_user: User = Depends(get_stream_user)):
+    """Download a finished artifact; Range requests let interrupted downloads resume"""
+    job = get_export_job(job_id, current_user)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}")
+    if not job["path"].exists():
+        raise HTTPException(status_code=410, detail="Export artifact has expired")
+    return FileResponse(
+        job["path"],
+        media_type=EXPORT_FORMATS[job["format"]],
+        filename="statistics_report.pdf" if job["format"] == "pdf" else f"report.{job['format']}"
+    )
+
+# Month-close report packs
+def parse_report_deadline(value: Optional[str]) -> Optional[datetime]:
+    """The report_deadline setting as naive UTC, or None when unset or unparseable"""
+    if not value:
+        return None
+    try:
+        deadline = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if deadline.tzinfo:
+        deadline = deadline.astimezone(timezone.utc).replace(tzinfo=None)
+    return deadline
+
+def report_pack_month(deadline: datetime) -> str:
+    """The month a deadline closes: reports for a month are due in the following one"""
+    index = deadline.year * 12 + deadline.month - 2
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+def report_pack_principal(location: str) -> TokenPrincipal:
+    # Packs are rendered with exactly the visibility a manager of the location has
+    return TokenPrincipal(id="report-packs", username="report-packs", role="manager", assigned_location=location)
+
+async def report_pack_fingerprints(month_year: str) -> Dict[str, str]:
+    """Per-location digest of a month's submissions; a pack is stale once its location's digest changes.
+
+    Counts catch inserts and deletes, and every edit (PUT or a status change) moves updated_at forward.
+    """
+    groups = await db.data_submissions.aggregate([
+        {"$match": {"month_year": month_year}},
+        {"$group": {
+            "_id": {"location": "$service_location", "status": "$status"},
+            "count": {"$sum": 1},
+            "latest": {"$max": "$submitted_at"},
+            "updated": {"$max": "$updated_at"}
+        }}
+    ]).to_list(None)
+    by_location = {}
+    for group in groups:
+        by_location.setdefault(group["_id"]["location"], []).append(
+            [group["_id"]["status"], group["count"], str(group["latest"]), str(group.get("updated"))]
+        )
+    return {
+        location: hashlib.sha256(json.dumps(sorted(parts)).encode()).hexdigest()
+        for location, parts in by_location.items()
+    }
+
+def write_report_pack_file(path: Path, content: bytes):
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_bytes(content)
+    temp_path.rename(path)
+
+async def render_report_pack(month_year: str, location: str, fingerprint: Optional[str]):
+    """Render one location's PDF and CSV, then swap them into the catalog"""
+    loop = asyncio.get_running_loop()
+    principal = report_pack_principal(location)
+    directory = REPORT_PACK_DIR / month_year
+    directory.mkdir(parents=True, exist_ok=True)
+    # A fresh name per render, so a download of the previous version isn't cut off mid-file
+    stem = f"{hashlib.sha256(location.encode()).hexdigest()[:16]}-{uuid.uuid4().hex[:8]}"
+    
+    files = {}
+    try:
+        content = await build_pdf_report("detailed", json.dumps({"month_year": month_year}), principal, enforce_user_limit=False)
+        await loop.run_in_executor(None, write_report_pack_file, directory / f"{stem}.pdf", content)
+        files["pdf"] = {"file": f"{month_year}/{stem}.pdf", "size": len(content)}
         
-        story.append(info_table)
-        story.append(Spacer(1, 20))
+        query = build_export_query(principal, None, month_year, None)
+        layout = await get_export_layout()
+        csv_path = directory / f"{stem}.csv"
+        with open(csv_path, "wb") as csv_file:
+            async for chunk in stream_submissions_csv(iter_export_submissions(query, build_submission_projection("full")), layout):
+                await loop.run_in_executor(None, csv_file.write, chunk)
+        files["csv"] = {"file": f"{month_year}/{stem}.csv", "size": csv_path.stat().st_size}
+    except Exception:
+        for entry in files.values():
+            (REPORT_PACK_DIR / entry["file"]).unlink(missing_ok=True)
+        (directory / f"{stem}.csv").unlink(missing_ok=True)
+        raise
+    
+    previous = await db.report_packs.find_one_and_update(
+        {"month_year": month_year, "location": location},
+        {
+            "$set": {"fingerprint": fingerprint, "files": files, "generated_at": datetime.utcnow()},
+            "$setOnInsert": {"id": str(uuid.uuid4())}
+        },
+        upsert=True
+    )
+    if previous:
+        for entry in previous.get("files", {}).values():
+            (REPORT_PACK_DIR / entry["file"]).unlink(missing_ok=True)
+
+async def refresh_report_packs(month_year: Optional[str] = None):
+    """Render packs that are missing or stale for month_year (default: the month the passed deadline closes)"""
+    _report_pack_status.update({
+        "running": True, "month_year": month_year, "rendered": [], "failed": [],
+        "started_at": datetime.utcnow(), "finished_at": None, "error": None
+    })
+    try:
+        if month_year is None:
+            setting = await db.admin_settings.find_one({"setting_key": "report_deadline"})
+            deadline = parse_report_deadline(setting and setting.get("setting_value"))
+            if not deadline or deadline > datetime.utcnow():
+                return
+            month_year = report_pack_month(deadline)
+            _report_pack_status["month_year"] = month_year
         
-        # Get recent statistics data for the report
-        if report_type == "statistics":
-            query = StatisticsQuery()
-            stats_data = await generate_statistics(query, current_user)
-            
-            # Summary section
-            summary_title = Paragraph("Summary Statistics", styles['Heading2'])
-            story.append(summary_title)
-            story.append(Spacer(1, 12))
-            
-            summary_data = [
-                ["Metric", "Value"],
-                ["Total Submissions", str(stats_data["summary"]["total_submissions"])],
-                ["Approved", str(stats_data["summary"]["total_approved"])],
-                ["Reviewed", str(stats_data["summary"]["total_reviewed"])],
-                ["Pending", str(stats_data["summary"]["total_submitted"])],
-                ["Rejected", str(stats_data["summary"]["total_rejected"])],
-                ["Approval Rate", f"{stats_data['summary']['approval_rate']}%"]
-            ]
-            
-            summary_table = Table(summary_data, colWidths=[3*72, 2*72])
-            summary_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            story.append(summary_table)
-            story.append(Spacer(1, 20))
-            
-            # Detailed breakdown
-            details_title = Paragraph("Detailed Breakdown", styles['Heading2'])
-            story.append(details_title)
-            story.append(Spacer(1, 12))
-            
-            details_data = [["Category", "Total", "Approved", "Reviewed", "Pending", "Rejected", "Users"]]
-            for item in stats_data["data"]:
-                details_data.append([
-                    str(item.get("category", "Unknown")),
-                    str(item["total_submissions"]),
-                    str(item["approved_count"]),
-                    str(item["reviewed_count"]),
-                    str(item["submitted_count"]),
-                    str(item["rejected_count"]),
-                    str(item["unique_user_count"])
-                ])
-            
-            details_table = Table(details_data, colWidths=[1.5*72, 0.7*72, 0.7*72, 0.7*72, 0.7*72, 0.7*72, 0.7*72])
-            details_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            
-            story.append(details_table)
+        # Captured before reading, so writes made while rendering trigger another check
+        data_version = export_data_version()
+        locations = await db.service_locations.distinct("name", {"is_active": True})
+        current = {
+            pack["location"]: pack.get("fingerprint")
+            async for pack in db.report_packs.find({"month_year": month_year}, {"_id": 0, "location": 1, "fingerprint": 1})
+        }
+        # Nothing written since the last complete check: skip the per-location aggregation
+        if _report_pack_checked.get(month_year) == data_version and all(location in current for location in locations):
+            return
+        fingerprints = await report_pack_fingerprints(month_year)
+        stale = [location for location in locations if location not in current or current[location] != fingerprints.get(location)]
         
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
+        # Bounded by REPORT_PACK_CONCURRENCY so packs never take every PDF worker (with more than one)
+        slots = asyncio.Semaphore(REPORT_PACK_CONCURRENCY)
         
-        return StreamingResponse(
-            BytesIO(buffer.getvalue()),
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={report_type}_report.pdf"}
-        )
+        async def render(location):
+            async with slots:
+                try:
+                    await render_report_pack(month_year, location, fingerprints.get(location))
+                    _report_pack_status["rendered"].append(location)
+                except Exception as e:
+                    logger.error(f"Report pack for {location} {month_year} failed: {str(e)}")
+                    _report_pack_status["failed"].append(location)
         
+        await asyncio.gather(*[render(location) for location in stale])
+        if stale:
+            logger.info(f"Rendered {len(_report_pack_status['rendered'])} report packs for {month_year}")
+        if not _report_pack_status["failed"]:
+            _report_pack_checked[month_year] = data_version
     except Exception as e:
-        logger.error(f"Error generating PDF report: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error generating PDF report: {str(e)}")
+        logger.error(f"Report pack refresh failed: {str(e)}")
+        _report_pack_status["error"] = str(e)
+    finally:
+        _report_pack_status.update({"running": False, "finished_at": datetime.utcnow()})
+
+async def report_pack_scheduler():
+    while True:
+        if not _report_pack_status["running"]:
+            await refresh_report_packs()
+        await asyncio.sleep(REPORT_PACK_CHECK_INTERVAL)
+
+def report_pack_view(pack: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": pack["id"],
+        "month_year": pack["month_year"],
+        "location": pack["location"],
+        "generated_at": pack["generated_at"],
+        "files": {
+            export_format: {"size": entry["size"], "download_url": f"/api/report-packs/{pack['id']}/{export_format}"}
+            for export_format, entry in pack["files"].items()
+        }
+    }
+
+@api_router.get("/report-packs")
+async def get_report_pack_manifest(
+    month_year: Optional[str] = None,
+    current_user: TokenPrincipal = Depends(require_role(["admin", "manager"]))
+):
+    """Pre-rendered packs for a month (default: the latest one rendered), limited to the caller's locations"""
+    if month_year is None:
+        latest = await db.report_packs.find({}, {"_id": 0, "month_year": 1}).sort("month_year", -1).limit(1).to_list(1)
+        month_year = latest[0]["month_year"] if latest else None
+    query = {"month_year": month_year}
+    scope = dashboard_location_scope(current_user)
+    if scope != ALL_LOCATIONS:
+        query["location"] = scope
+    packs = await db.report_packs.find(query, {"_id": 0}).sort("location", 1).to_list(None) if month_year else []
+    return {
+        "month_year": month_year,
+        "packs": [report_pack_view(pack) for pack in packs],
+        "status": _report_pack_status if current_user.role == "admin" else None
+    }
+
+@api_router.post("/admin/report-packs")
+async def start_report_pack_refresh(month_year: Optional[str] = None, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
+    """Render missing or stale packs now, for month_year or the month the passed deadline closes"""
+    if month_year is not None:
+        try:
+            datetime.strptime(month_year, MONTH_YEAR_FORMAT)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="month_year must be in YYYY-MM format")
+    if _report_pack_status["running"]:
+        raise HTTPException(status_code=409, detail="Report packs are already rendering")
+    _report_pack_status["running"] = True
+    asyncio.create_task(refresh_report_packs(month_year))
+    return {"message": "Report pack rendering started", "month_year": month_year}
+
+@api_router.get("/report-packs/{pack_id}/{export_format}")
+async def download_report_pack(pack_id: str, export_format: str, current_user: User = Depends(get_stream_user)):
+    pack = await db.report_packs.find_one({"id": pack_id}, {"_id": 0})
+    if not pack or current_user.role not in ["admin", "manager"] or \
+            dashboard_location_scope(current_user) not in (ALL_LOCATIONS, pack["location"]):
+        raise HTTPException(status_code=404, detail="Report pack not found")
+    entry = pack["files"].get(export_format)
+    path = REPORT_PACK_DIR / entry["file"] if entry else None
+    if not path or not path.exists():
+        raise HTTPException(status_code=404, detail="Report pack file not found")
+    return FileResponse(
+        path,
+        media_type=EXPORT_FORMATS[export_format],
+        filename=f"{pack['location']}_{pack['month_year']}.{export_format}"
+    )
 
 # Location and Template Restore Endpoints
 @api_router.get("/locations/deleted", response_model=List[ServiceLocation])
-async def get_deleted_locations(current_user: User = Depends(require_role(["admin"]))):
+async def get_deleted_locations(current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Get all soft-deleted locations"""
     locations = await db.service_locations.find({"is_active": False}).to_list(1000)
     return [ServiceLocation(**location) for location in locations]
 
 @api_router.post("/locations/{location_id}/restore")
-async def restore_location(location_id: str, current_user: User = Depends(require_role(["admin"]))):
+async def restore_location(location_id: str, current_user: TokenPrincipal = Depends(require_role(["admin"]))):
     """Restore a soft-deleted location"""
     result = await db.service_locations.update_one(
         {"id": location_id, "is_active": False}, 
         {"$set": {"is_active": True}}
     )
+    bump_collection_version("service_locations")
+    notify_dashboard_change()
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Location not found or already active")
     return {"message": "Location restored successfully"}
@@ -1877,10 +4276,18 @@ async def get_detailed_submissions(
     template_id: Optional[str] = None,
     submitted_by: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    legacy: bool = False,
+    view: str = "full",
+    fields: Optional[str] = None,
     current_user: User = Depends(get_current_user)
 ):
     """Get submissions with user details"""
     try:
+        projection = build_submission_projection(view, fields)
+        if "submitted_by" not in projection and len(projection) > 1:
+            projection["submitted_by"] = 1  # needed for the username lookup
         logger.info(f"Detailed submissions request - User: {current_user.username}, Role: {current_user.role}")
         query = {}
         
@@ -1901,8 +4308,12 @@ async def get_detailed_submissions(
         
         logger.info(f"Query parameters: {query}")
         
-        # Get submissions first
-        submissions = await db.data_submissions.find(query).to_list(1000)
+        next_cursor = None
+        if legacy:
+            # Compatibility mode: plain list, capped at 1000 documents
+            submissions = await db.data_submissions.find(query, projection).sort(SUBMISSIONS_SORT).to_list(1000)
+        else:
+            submissions, next_cursor = await fetch_submission_page(query, limit, cursor, projection)
         logger.info(f"Found {len(submissions)} submissions")
         
         # Remove ObjectIds for JSON serialization
@@ -1911,18 +4322,20 @@ async def get_detailed_submissions(
                 del submission["_id"]
         
         # Enrich with user information
+        usernames = await resolve_usernames(submission["submitted_by"] for submission in submissions)
         for submission in submissions:
-            user = await db.users.find_one({"id": submission["submitted_by"]})
-            submission["submitted_by_username"] = user["username"] if user else "Unknown User"
+            submission["submitted_by_username"] = usernames.get(submission["submitted_by"], "Unknown User")
         
-        # Sort by submission date
-        submissions.sort(key=lambda x: x["submitted_at"], reverse=True)
+        if not legacy:
+            return {"items": submissions, "next_cursor": next_cursor}
         
         return submissions
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in detailed submissions: {str(e)}")
-        # Return empty list instead of error
-        return []
+        # Return an empty result instead of error, in the shape the caller asked for
+        return [] if legacy else {"items": [], "next_cursor": None}
 
 @api_router.get("/")
 async def root():
@@ -1931,11 +4344,141 @@ async def root():
 # Initialize data on startup
 @app.on_event("startup")
 async def startup_event():
+    # Export jobs and the PDF cache index live in memory, so files from a previous process can't be served again
+    shutil.rmtree(EXPORT_JOB_DIR, ignore_errors=True)
+    shutil.rmtree(PDF_CACHE_DIR, ignore_errors=True)
+    await ensure_indexes()
     await initialize_default_data()
+    await start_ingest_pipeline()
+    for _ in range(PDF_RENDER_WORKERS):
+        _pdf_executor.submit(warm_up)
+    global _archive_task, _report_pack_task
+    if ARCHIVE_HORIZON_MONTHS > 0:
+        _archive_task = asyncio.create_task(archive_scheduler())
+    if REPORT_PACK_CHECK_INTERVAL > 0:
+        _report_pack_task = asyncio.create_task(report_pack_scheduler())
+
+# Response compression
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick zstd or gzip from an Accept-Encoding header, honouring q=0"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip()] = quality
+    for encoding in ("zstd", "gzip"):
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+class StreamCompressor:
+    """Compresses one response body chunk by chunk, flushing after each chunk so nothing piles up"""
+    def __init__(self, encoding: str):
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+            self._flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        else:
+            self._compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._flush_mode = zlib.Z_SYNC_FLUSH
+    
+    def compress(self, data: bytes, final: bool = False) -> bytes:
+        compressed = self._compressor.compress(data)
+        return compressed + (self._compressor.flush() if final else self._compressor.flush(self._flush_mode))
+
+def compressible_response(start_message: Dict[str, Any]) -> bool:
+    """Whether a response (by its http.response.start message) is one the middleware would compress"""
+    headers = Headers(raw=start_message["headers"])
+    media_type = headers.get("content-type", "").split(";")[0].strip()
+    return (
+        media_type in COMPRESSIBLE_MEDIA_TYPES
+        and "content-encoding" not in headers
+        and "accept-ranges" not in headers
+        and start_message["status"] == 200
+    )
+
+class CompressionMiddleware:
+    """Compress CSV/JSON/NDJSON responses on the fly.
+
+    Bodies are held back only until COMPRESSION_MIN_SIZE bytes have been produced, so streaming
+    exports stay streaming. Event streams, range-capable file downloads and already encoded
+    responses pass through untouched.
+    """
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            async def send_identity(message):
+                if message["type"] == "http.response.start" and compressible_response(message):
+                    # The representation depends on Accept-Encoding even when this one is sent as-is
+                    MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                await send(message)
+            
+            await self.app(scope, receive, send_identity)
+            return
+        
+        state = {"start": None, "buffer": b"", "mode": None, "compressor": None}
+        
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                state["start"] = message
+                return
+            if message["type"] != "http.response.body" or state["mode"] == "plain":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if state["mode"] is None:
+                headers = MutableHeaders(raw=state["start"]["headers"])
+                if not compressible_response(state["start"]):
+                    state["mode"] = "plain"
+                    await send(state["start"])
+                    await send(message)
+                    return
+                
+                headers.add_vary_header("Accept-Encoding")
+                state["buffer"] += body
+                if len(state["buffer"]) < COMPRESSION_MIN_SIZE:
+                    if more_body:
+                        return
+                    state["mode"] = "plain"
+                    await send(state["start"])
+                    await send({"type": "http.response.body", "body": state["buffer"], "more_body": False})
+                    return
+                
+                state["mode"] = "compress"
+                state["compressor"] = StreamCompressor(encoding)
+                headers["Content-Encoding"] = encoding
+                del headers["content-length"]
+                # The encoded bytes differ from the identity representation, so they can't share a strong validator
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    headers["ETag"] = f"W/{etag}"
+                await send(state["start"])
+                body, state["buffer"] = state["buffer"], b""
+            
+            data = state["compressor"].compress(body, final=not more_body)
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+        
+        await self.app(scope, receive, send_compressed)
 
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -1946,4 +4489,11 @@ app.add_middleware(
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    if _archive_task:
+        _archive_task.cancel()
+    if _report_pack_task:
+        _report_pack_task.cancel()
+    await stop_ingest_pipeline()
     client.close()
+    _password_executor.shutdown(wait=False)
+    _pdf_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,361 @@
+import requests
+import json
+import os
+import sys
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+class ClientServicesBenchmark:
+    """Latency benchmarks against a running backend.
+
+    Run once against the old build and once against the new one to compare:
+        BACKEND_URL=http://localhost:8001 python backend_benchmark.py login_storm
+    """
+    def __init__(self, base_url=None):
+        self.base_url = base_url or os.environ.get("BACKEND_URL", "http://localhost:8001")
+        self.api_url = f"{self.base_url}/api"
+        self.token = None
+
+    def login(self, username="admin", password="admin123"):
+        response = requests.post(f"{self.api_url}/auth/login", json={"username": username, "password": password})
+        response.raise_for_status()
+        self.token = response.json()["access_token"]
+        return self.token
+
+    def headers(self):
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    @staticmethod
+    def percentile(samples, pct):
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def report(self, name, samples_ms, extra=None):
+        print(f"\n📊 {name}")
+        print(f"  requests: {len(samples_ms)}")
+        print(f"  p50: {self.percentile(samples_ms, 50):.1f} ms")
+        print(f"  p95: {self.percentile(samples_ms, 95):.1f} ms")
+        print(f"  p99: {self.percentile(samples_ms, 99):.1f} ms")
+        print(f"  max: {max(samples_ms) if samples_ms else 0:.1f} ms")
+        for key, value in (extra or {}).items():
+            print(f"  {key}: {value}")
+
+    def sample_latency(self, method, endpoint, stop_event, samples, **kwargs):
+        """Hit an endpoint in a loop until stop_event is set, recording latency in ms"""
+        while not stop_event.is_set():
+            start = time.perf_counter()
+            requests.request(method, f"{self.api_url}/{endpoint}", headers=self.headers(), **kwargs)
+            samples.append((time.perf_counter() - start) * 1000)
+
+    def bench_login_storm(self, storm_size=30, rounds=3):
+        """p99 latency of an unrelated endpoint while a burst of logins is in flight"""
+        self.login()
+
+        baseline = []
+        stop = threading.Event()
+        sampler = threading.Thread(target=self.sample_latency, args=("GET", "auth/me", stop, baseline))
+        sampler.start()
+        time.sleep(3)
+        stop.set()
+        sampler.join()
+        self.report("GET /auth/me (idle)", baseline)
+
+        during_storm = []
+        statuses = {}
+        stop = threading.Event()
+        sampler = threading.Thread(target=self.sample_latency, args=("GET", "auth/me", stop, during_storm))
+        sampler.start()
+
+        def do_login(_):
+            response = requests.post(f"{self.api_url}/auth/login", json={"username": "admin", "password": "admin123"})
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=storm_size) as pool:
+            for _ in range(rounds):
+                for status in pool.map(do_login, range(storm_size)):
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        stop.set()
+        sampler.join()
+        self.report(f"GET /auth/me during login storm ({storm_size} x {rounds})", during_storm,
+                    {"login statuses": statuses})
+
+    def seed_wide_submissions(self, field_count=200, submission_count=2000):
+        """Create a template with many text fields and fill it with submissions"""
+        fields = [{"name": f"field_{i}", "label": f"Field {i}", "type": "text"} for i in range(field_count)]
+        location = requests.get(f"{self.api_url}/locations", headers=self.headers()).json()[0]["name"]
+        template = requests.post(f"{self.api_url}/templates", headers=self.headers(), json={
+            "name": f"Benchmark wide template {int(time.time())}",
+            "fields": fields,
+            "assigned_locations": [location]
+        }).json()
+
+        def submit(i):
+            form_data = {field["name"]: f"value {i} for {field['name']} " * 3 for field in fields}
+            requests.post(f"{self.api_url}/submissions", headers=self.headers(), json={
+                "template_id": template["id"],
+                "service_location": location,
+                "month_year": "2025-01",
+                "form_data": form_data
+            })
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            list(pool.map(submit, range(submission_count)))
+        return template["id"]
+
+    def bench_projection(self, page_size=500, repeats=10):
+        """Payload size and latency of view=summary vs view=full on a wide template"""
+        self.login()
+        template_id = self.seed_wide_submissions()
+
+        for endpoint in ("submissions", "submissions-detailed"):
+            for view in ("full", "summary"):
+                samples, sizes = [], []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    response = requests.get(f"{self.api_url}/{endpoint}", headers=self.headers(),
+                                            params={"template_id": template_id, "limit": page_size, "view": view})
+                    samples.append((time.perf_counter() - start) * 1000)
+                    sizes.append(len(response.content))
+                self.report(f"GET /{endpoint}?view={view} (limit={page_size})", samples,
+                            {"payload bytes": max(sizes)})
+
+        # BSON decode cost measured directly in the driver, if the database is reachable
+        mongo_url = os.environ.get("MONGO_URL")
+        if mongo_url:
+            from pymongo import MongoClient
+            collection = MongoClient(mongo_url)[os.environ.get("DB_NAME", "test_database")].data_submissions
+            summary = {"_id": 0, "id": 1, "template_id": 1, "service_location": 1, "month_year": 1,
+                       "submitted_by": 1, "submitted_at": 1, "status": 1}
+            for label, projection in (("full", {"_id": 0}), ("summary", summary)):
+                samples = []
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    list(collection.find({"template_id": template_id}, projection).limit(page_size))
+                    samples.append((time.perf_counter() - start) * 1000)
+                self.report(f"driver find+decode view={label} (limit={page_size})", samples)
+
+    def bench_conditional_get(self, repeats=200):
+        """Response time of a full 200 response vs a 304 revalidation"""
+        self.login()
+        for endpoint in ("locations", "templates", "roles", "admin/settings/report_deadline"):
+            full, revalidated = [], []
+            etag = None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                response = requests.get(f"{self.api_url}/{endpoint}", headers=self.headers())
+                full.append((time.perf_counter() - start) * 1000)
+                etag = response.headers.get("ETag")
+            if not etag:
+                print(f"\n⚠️  /{endpoint} returned no ETag, skipping")
+                continue
+            statuses = {}
+            for _ in range(repeats):
+                start = time.perf_counter()
+                response = requests.get(f"{self.api_url}/{endpoint}", headers={**self.headers(), "If-None-Match": etag})
+                revalidated.append((time.perf_counter() - start) * 1000)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            self.report(f"GET /{endpoint} full response", full)
+            self.report(f"GET /{endpoint} with If-None-Match", revalidated, {"statuses": statuses})
+
+    def bench_ingest(self, clients=32, duration=20):
+        """Sustained submissions/sec with concurrent clients.
+
+        Run against a backend started with SUBMISSION_INGEST_MODE=direct and again with
+        SUBMISSION_INGEST_MODE=journal to compare.
+        """
+        self.login()
+        location = requests.get(f"{self.api_url}/locations", headers=self.headers()).json()[0]["name"]
+        template = requests.get(f"{self.api_url}/templates", headers=self.headers()).json()[0]
+        stop = threading.Event()
+        samples, statuses, lock = [], {}, threading.Lock()
+
+        def submit_loop(worker):
+            session = requests.Session()
+            sent = 0
+            while not stop.is_set():
+                start = time.perf_counter()
+                response = session.post(f"{self.api_url}/submissions", headers=self.headers(), json={
+                    "template_id": template["id"],
+                    "service_location": location,
+                    "month_year": "2025-01",
+                    "form_data": {"benchmark_worker": worker, "benchmark_sequence": sent}
+                })
+                elapsed = (time.perf_counter() - start) * 1000
+                with lock:
+                    samples.append(elapsed)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                sent += 1
+
+        threads = [threading.Thread(target=submit_loop, args=(i,)) for i in range(clients)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        stats = requests.get(f"{self.api_url}/admin/cache-stats", headers=self.headers()).json().get("ingest", {})
+        self.report(f"POST /submissions ({clients} clients, {duration}s)", samples, {
+            "submissions/sec": f"{statuses.get(200, 0) / elapsed:.1f}",
+            "statuses": statuses,
+            "ingest": stats
+        })
+
+    def seed_month(self, submission_count, month_year="1999-01"):
+        """Insert submissions for one otherwise empty month straight into MongoDB (MONGO_URL / DB_NAME),
+        since posting them through the API would dominate the run. Returns (collection, template) or None.
+        """
+        mongo_url = os.environ.get("MONGO_URL")
+        if not mongo_url:
+            print("\n⚠️  MONGO_URL is not set, cannot seed submissions")
+            return None
+        from datetime import datetime, timedelta
+        import uuid
+        from pymongo import MongoClient
+
+        template = requests.get(f"{self.api_url}/templates", headers=self.headers()).json()[0]
+        location = requests.get(f"{self.api_url}/locations", headers=self.headers()).json()[0]["name"]
+        collection = MongoClient(mongo_url)[os.environ.get("DB_NAME", "test_database")].data_submissions
+        collection.delete_many({"month_year": month_year})
+        start = datetime.utcnow()
+        for offset in range(0, submission_count, 10_000):
+            collection.insert_many([
+                {
+                    "id": str(uuid.uuid4()),
+                    "template_id": template["id"],
+                    "submitted_by": "benchmark",
+                    "service_location": location,
+                    "month_year": month_year,
+                    "form_data": {field["name"]: f"value {i}" for field in template.get("fields", [])},
+                    "attachments": [],
+                    "submitted_at": start - timedelta(seconds=i),
+                    "status": "submitted"
+                }
+                for i in range(offset, min(offset + 10_000, submission_count))
+            ])
+        return collection, template
+
+    def bench_exports(self, submission_count=200_000):
+        """Time to first byte, total time and size of each export format over a large dataset"""
+        self.login()
+        month_year = "1999-01"  # an otherwise empty month keeps the export scoped to the seeded rows
+        seeded = self.seed_month(submission_count, month_year)
+        if not seeded:
+            return
+        collection, template = seeded
+
+        try:
+            for export_format in ("csv", "xlsx", "ndjson"):
+                start_time = time.perf_counter()
+                first_byte = None
+                size = 0
+                with requests.get(f"{self.api_url}/reports/{export_format}", headers=self.headers(),
+                                  params={"month_year": month_year, "template_id": template["id"]}, stream=True) as response:
+                    for chunk in response.iter_content(chunk_size=64 * 1024):
+                        if first_byte is None:
+                            first_byte = (time.perf_counter() - start_time) * 1000
+                        size += len(chunk)
+                total = time.perf_counter() - start_time
+                self.report(f"GET /reports/{export_format} ({submission_count} submissions)", [total * 1000], {
+                    "time to first byte": f"{first_byte or 0:.1f} ms",
+                    "bytes": size,
+                    "rows/sec": f"{submission_count / total:.0f}"
+                })
+        finally:
+            collection.delete_many({"month_year": month_year})
+
+    def bench_detailed_pdf(self, submission_count=50_000):
+        """Time and size of the multi-page detailed submission PDF for one large month.
+
+        Watch the backend's worker processes (e.g. ps -o rss) during the run for render memory.
+        """
+        self.login()
+        month_year = "1999-01"
+        seeded = self.seed_month(submission_count, month_year)
+        if not seeded:
+            return
+        collection, _ = seeded
+
+        try:
+            start_time = time.perf_counter()
+            response = requests.get(f"{self.api_url}/reports/pdf", headers=self.headers(), params={
+                "report_type": "detailed", "query_params": json.dumps({"month_year": month_year})
+            })
+            total = time.perf_counter() - start_time
+            pool_stats = requests.get(f"{self.api_url}/admin/cache-stats", headers=self.headers()).json().get("pdf_render_pool")
+            self.report(f"GET /reports/pdf?report_type=detailed ({submission_count} submissions)", [total * 1000], {
+                "status": response.status_code,
+                "bytes": len(response.content),
+                "pages": response.content.count(b"/Type /Page\n"),
+                "pdf_render_pool": pool_stats
+            })
+        finally:
+            collection.delete_many({"month_year": month_year})
+
+    def bench_pdf_event_loop_lag(self, concurrency=2, rounds=10):
+        """Latency of a trivial endpoint (a proxy for event-loop lag) while PDF reports render.
+
+        Keep concurrency at or below PDF_RENDER_PER_USER, since every request comes from the admin account.
+        """
+        self.login()
+
+        idle = []
+        stop = threading.Event()
+        sampler = threading.Thread(target=self.sample_latency, args=("GET", "", stop, idle))
+        sampler.start()
+        time.sleep(3)
+        stop.set()
+        sampler.join()
+        self.report("GET /api/ (idle)", idle)
+
+        during = []
+        statuses = {}
+        stop = threading.Event()
+        sampler = threading.Thread(target=self.sample_latency, args=("GET", "", stop, during))
+        sampler.start()
+
+        def render(_):
+            response = requests.get(f"{self.api_url}/reports/pdf", headers=self.headers(),
+                                    params={"report_type": "statistics"})
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(rounds):
+                for status in pool.map(render, range(concurrency)):
+                    statuses[status] = statuses.get(status, 0) + 1
+
+        stop.set()
+        sampler.join()
+        pool_stats = requests.get(f"{self.api_url}/admin/cache-stats", headers=self.headers()).json().get("pdf_render_pool")
+        self.report(f"GET /api/ during PDF rendering ({concurrency} x {rounds})", during,
+                    {"pdf statuses": statuses, "pdf_render_pool": pool_stats})
+
+def main():
+    benchmark = ClientServicesBenchmark()
+    scenarios = {
+        "login_storm": benchmark.bench_login_storm,
+        "projection": benchmark.bench_projection,
+        "conditional_get": benchmark.bench_conditional_get,
+        "ingest": benchmark.bench_ingest,
+        "exports": benchmark.bench_exports,
+        "pdf_event_loop_lag": benchmark.bench_pdf_event_loop_lag,
+        "detailed_pdf": benchmark.bench_detailed_pdf,
+    }
+    selected = sys.argv[1:] or list(scenarios)
+    for name in selected:
+        if name not in scenarios:
+            print(f"Unknown scenario: {name}. Available: {', '.join(scenarios)}")
+            return 1
+        print(f"\n🚀 Running benchmark: {name}")
+        scenarios[name]()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
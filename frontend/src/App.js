@@ -36,6 +36,34 @@ const getAuthHeader = () => {
   return token ? { Authorization: `Bearer ${token}` } : {};
 };
 
+// Run a background export job and download the artifact once it is ready
+const EXPORT_POLL_INTERVAL = 1000;
+
+const runExportJob = async (payload, filename, onProgress) => {
+  let { data: job } = await axios.post(`${API}/exports`, payload, { headers: getAuthHeader() });
+  while (job.status === 'queued' || job.status === 'running') {
+    if (onProgress) onProgress(job.progress);
+    await new Promise(resolve => setTimeout(resolve, EXPORT_POLL_INTERVAL));
+    ({ data: job } = await axios.get(`${API}/exports/${job.id}`, { headers: getAuthHeader() }));
+  }
+  if (job.status === 'failed') {
+    throw new Error(job.error || 'Export failed');
+  }
+
+  const response = await axios.get(`${BACKEND_URL}${job.download_url}`, {
+    headers: getAuthHeader(),
+    responseType: 'blob'
+  });
+  const url = window.URL.createObjectURL(new Blob([response.data]));
+  const link = document.createElement('a');
+  link.href = url;
+  link.setAttribute('download', filename);
+  document.body.appendChild(link);
+  link.click();
+  link.remove();
+  window.URL.revokeObjectURL(url);
+};
+
 // Login Component
 const Login = ({ onLogin }) => {
   const [credentials, setCredentials] = useState({ username: '', password: '' });
@@ -517,16 +545,72 @@ const Dashboard = ({ user }) => {
 
   useEffect(() => {
     fetchStats();
-    fetchSubmissionsByLocation();
-    fetchMissingReports();
     fetchDeadline();
   }, [user.role, selectedMonth]);
 
+  useEffect(() => {
+    // Live dashboard data: the server sends a snapshot on connect, then deltas as submissions change
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const connect = async () => {
+      // EventSource cannot send headers, so trade the JWT for a single-use ticket for the URL
+      let ticket;
+      try {
+        const response = await axios.post(`${API}/auth/stream-ticket`, null, { headers: getAuthHeader() });
+        ticket = response.data.ticket;
+      } catch (error) {
+        fetchSubmissionsByLocation();
+        fetchMissingReports();
+        return;
+      }
+      if (closed) return;
+
+      const params = new URLSearchParams({ ticket });
+      if (selectedMonth) params.append('month_year', selectedMonth);
+      source = new EventSource(`${API}/dashboard/stream?${params}`);
+
+      source.addEventListener('snapshot', (event) => {
+        const data = JSON.parse(event.data);
+        setSubmissionsByLocation(data.submissions_by_location);
+        setMissingReports(data.missing_reports);
+      });
+      source.addEventListener('delta', (event) => {
+        const delta = JSON.parse(event.data);
+        setSubmissionsByLocation(previous => {
+          const rows = new Map(previous.map(row => [row.location, row]));
+          delta.removed.forEach(location => rows.delete(location));
+          delta.changed.forEach(row => rows.set(row.location, row));
+          return [...rows.values()].sort((a, b) => b.submission_count - a.submission_count);
+        });
+        if (delta.missing_reports) setMissingReports(delta.missing_reports);
+      });
+      source.onerror = () => {
+        // The ticket is spent, so the browser's own reconnect would fail: fetch once, then
+        // reconnect with a fresh ticket
+        source.close();
+        fetchSubmissionsByLocation();
+        fetchMissingReports();
+        if (!closed) retryTimer = setTimeout(connect, 5000);
+      };
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      if (source) source.close();
+    };
+  }, [user.role, selectedMonth]);
+
   const fetchStats = async () => {
     try {
       const headers = getAuthHeader();
-      const [submissionsRes, templatesRes] = await Promise.all([
-        axios.get(`${API}/submissions`, { headers }),
+      // Counted server-side rather than by downloading every submission
+      const [byLocationRes, templatesRes] = await Promise.all([
+        axios.get(`${API}/dashboard/submissions-by-location`, { headers }),
         axios.get(`${API}/templates`, { headers })
       ]);
       
@@ -537,7 +621,7 @@ const Dashboard = ({ user }) => {
       }
       
       setStats({
-        submissions: submissionsRes.data.length,
+        submissions: byLocationRes.data.reduce((total, row) => total + row.submission_count, 0),
         templates: templatesRes.data.length,
         users: usersCount
       });
@@ -1184,10 +1268,12 @@ const ChangePassword = ({ user }) => {
 
     setIsChanging(true);
     try {
-      await axios.post(`${API}/users/change-password`, {
+      const response = await axios.post(`${API}/users/change-password`, {
         current_password: passwordData.current_password,
         new_password: passwordData.new_password
       }, { headers: getAuthHeader() });
+      // Changing the password revokes every existing token, including the one just used
+      localStorage.setItem('auth_token', response.data.access_token);
 
       alert('Password changed successfully!');
       setPasswordData({ current_password: '', new_password: '', confirm_password: '' });
@@ -2674,6 +2760,8 @@ const DataSubmission = ({ user }) => {
   const [formData, setFormData] = useState({});
   const [monthYear, setMonthYear] = useState('');
   const [uploading, setUploading] = useState(false);
+  // Reused across retries of the same submit so a lost response doesn't create duplicates
+  const [idempotencyKey, setIdempotencyKey] = useState(null);
 
   useEffect(() => {
     fetchTemplates();
@@ -2725,11 +2813,19 @@ const DataSubmission = ({ user }) => {
         form_data: formData
       };
 
-      await axios.post(`${API}/submissions`, submissionData, { headers: getAuthHeader() });
+      const key = idempotencyKey || crypto.randomUUID();
+      setIdempotencyKey(key);
+      await axios.post(`${API}/submissions`, submissionData, {
+        headers: { ...getAuthHeader(), 'Idempotency-Key': key }
+      });
+      setIdempotencyKey(null);
       alert('Data submitted successfully!');
       setFormData({});
       setSelectedTemplate(null);
     } catch (error) {
+      // Keep the key when no response arrived (network failure) or the first attempt is still
+      // running (409), so the retry is deduplicated
+      if (error.response && error.response.status !== 409) setIdempotencyKey(null);
       alert('Error submitting data: ' + (error.response?.data?.detail || error.message));
     }
   };
@@ -2886,6 +2982,8 @@ const DataSubmission = ({ user }) => {
 // Reports Component
 const Reports = ({ user }) => {
   const [submissions, setSubmissions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [locations, setLocations] = useState([]);
   const [templates, setTemplates] = useState([]);
   const [users, setUsers] = useState([]);
@@ -2923,37 +3021,50 @@ const Reports = ({ user }) => {
     generateSummaryData();
   }, [submissions]);
 
-  const fetchSubmissions = async () => {
-    try {
-      const params = new URLSearchParams();
-      Object.entries(filters).forEach(([key, value]) => {
-        if (value) params.append(key, value);
-      });
+  // Keyset pagination: without a cursor this loads the first page, with one it appends the next
+  const fetchSubmissions = async (cursor = null) => {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value) params.append(key, value);
+    });
+    if (cursor) params.append('cursor', cursor);
+    const showPage = (page) => {
+      setSubmissions(previous => cursor ? [...previous, ...page.items] : page.items);
+      setNextCursor(page.next_cursor);
+    };
 
+    try {
       const response = await axios.get(`${API}/submissions-detailed?${params}`, { headers: getAuthHeader() });
-      setSubmissions(response.data || []);
+      showPage(response.data);
     } catch (error) {
       console.error('Error fetching submissions:', error);
       // Fallback to regular submissions if detailed endpoint fails
       try {
-        const params = new URLSearchParams();
-        Object.entries(filters).forEach(([key, value]) => {
-          if (value) params.append(key, value);
-        });
         const response = await axios.get(`${API}/submissions?${params}`, { headers: getAuthHeader() });
-        const regularSubmissions = response.data || [];
         // Add username lookup for fallback
-        for (let submission of regularSubmissions) {
+        for (let submission of response.data.items) {
           submission.submitted_by_username = 'Loading...';
         }
-        setSubmissions(regularSubmissions);
+        showPage(response.data);
       } catch (fallbackError) {
         console.error('Error fetching regular submissions:', fallbackError);
-        setSubmissions([]);
+        if (!cursor) {
+          setSubmissions([]);
+          setNextCursor(null);
+        }
       }
     }
   };
 
+  const loadMoreSubmissions = async () => {
+    setLoadingMore(true);
+    try {
+      await fetchSubmissions(nextCursor);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchLocations = async () => {
     try {
       const response = await axios.get(`${API}/locations`, { headers: getAuthHeader() });
@@ -3083,23 +3194,11 @@ const Reports = ({ user }) => {
 
   const exportCSV = async () => {
     try {
-      const params = new URLSearchParams();
+      const payload = { format: 'csv' };
       Object.entries(filters).forEach(([key, value]) => {
-        if (value) params.append(key, value);
+        if (value) payload[key] = value;
       });
-
-      const response = await axios.get(`${API}/reports/csv?${params}`, {
-        headers: getAuthHeader(),
-        responseType: 'blob'
-      });
-
-      const url = window.URL.createObjectURL(new Blob([response.data]));
-      const link = document.createElement('a');
-      link.href = url;
-      link.setAttribute('download', 'report.csv');
-      document.body.appendChild(link);
-      link.click();
-      document.body.removeChild(link);
+      await runExportJob(payload, 'report.csv');
     } catch (error) {
       console.error('Error exporting CSV:', error);
     }
@@ -3310,6 +3409,11 @@ const Reports = ({ user }) => {
       {/* Summary View */}
       {activeView === 'summary' && (
         <div>
+          {nextCursor && (
+            <p className="mb-4 text-sm text-gray-500">
+              Summary of the {submissions.length} submissions loaded so far; load more from the detailed view.
+            </p>
+          )}
           {/* Overall Stats */}
           <div className="grid grid-cols-1 md:grid-cols-4 gap-4 mb-6">
             <div className="bg-white p-4 rounded-lg shadow text-center">
@@ -3664,7 +3768,9 @@ const Reports = ({ user }) => {
       {activeView === 'detailed' && (
         <div className="bg-white rounded-lg shadow">
           <div className="p-6">
-            <h3 className="text-lg font-semibold mb-4">All Submissions ({submissions.length})</h3>
+            <h3 className="text-lg font-semibold mb-4">
+              {nextCursor ? `Submissions (first ${submissions.length})` : `All Submissions (${submissions.length})`}
+            </h3>
             {submissions.length === 0 ? (
               <p className="text-gray-500">No submissions found.</p>
             ) : (
@@ -3726,6 +3832,17 @@ const Reports = ({ user }) => {
                 </table>
               </div>
             )}
+            {nextCursor && (
+              <div className="mt-4 text-center">
+                <button
+                  onClick={loadMoreSubmissions}
+                  disabled={loadingMore}
+                  className="px-4 py-2 bg-blue-600 text-white rounded-md hover:bg-blue-700 disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              </div>
+            )}
           </div>
         </div>
       )}
@@ -3808,19 +3925,10 @@ const Statistics = ({ user }) => {
 
   const generatePDFReport = async () => {
     try {
-      const queryString = encodeURIComponent(JSON.stringify(query));
-      const response = await axios.get(`${API}/reports/pdf?report_type=statistics&query_params=${queryString}`, { 
-        headers: getAuthHeader(),
-        responseType: 'blob'
-      });
-      
-      const url = window.URL.createObjectURL(new Blob([response.data]));
-      const link = document.createElement('a');
-      link.href = url;
-      link.setAttribute('download', 'statistics_report.pdf');
-      document.body.appendChild(link);
-      link.click();
-      link.remove();
+      await runExportJob(
+        { format: 'pdf', report_type: 'statistics', query_params: JSON.stringify(query) },
+        'statistics_report.pdf'
+      );
     } catch (error) {
       alert('Error generating PDF report: ' + (error.response?.data?.detail || error.message));
     }
@@ -4372,10 +4480,12 @@ const Profile = ({ user }) => {
     }
 
     try {
-      await axios.post(`${API}/users/change-password`, {
+      const response = await axios.post(`${API}/users/change-password`, {
         current_password: passwordData.current_password,
         new_password: passwordData.new_password
       }, { headers: getAuthHeader() });
+      // Changing the password revokes every existing token, including the one just used
+      localStorage.setItem('auth_token', response.data.access_token);
       
       setSuccess('Password changed successfully!');
       setIsChangingPassword(false);
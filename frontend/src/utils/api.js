@@ -91,7 +91,8 @@ export const rolesAPI = {
 };
 
 export const submissionsAPI = {
-  getSubmissions: () => apiClient.get('/submissions'),
+  // One page of { items, next_cursor }; pass next_cursor back as params.cursor for the following page
+  getSubmissions: (params) => apiClient.get('/submissions', { params }),
   createSubmission: (data) => apiClient.post('/submissions', data),
   updateSubmission: (id, data) => apiClient.put(`/submissions/${id}`, data),
   deleteSubmission: (id) => apiClient.delete(`/submissions/${id}`),
@@ -111,4 +112,16 @@ export const reportsAPI = {
   }),
 };
 
+export const exportsAPI = {
+  createJob: (data) => apiClient.post('/exports', data),
+  getJob: (id) => apiClient.get(`/exports/${id}`),
+  // Large artifacts can take longer than the default timeout to download
+  download: (id) => apiClient.get(`/exports/${id}/download`, { responseType: 'blob', timeout: 0 }),
+};
+
+export const reportPacksAPI = {
+  getManifest: (params) => apiClient.get('/report-packs', { params }),
+  download: (id, format) => apiClient.get(`/report-packs/${id}/${format}`, { responseType: 'blob', timeout: 0 }),
+};
+
 export default apiClient;
\ No newline at end of file
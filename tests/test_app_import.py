@@ -0,0 +1,23 @@
+"""
+The backend is launched both as a package (uvicorn backend.server:app from the repo root) and as a
+top-level module (uvicorn server:app from backend/); both must import.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+
+def import_in_subprocess(module, cwd):
+    return subprocess.run([sys.executable, "-c", f"import {module}"], cwd=cwd, capture_output=True, text=True)
+
+
+def test_server_imports_as_package():
+    result = import_in_subprocess("backend.server", REPO_DIR)
+    assert result.returncode == 0, result.stderr
+
+
+def test_server_imports_as_top_level_module():
+    result = import_in_subprocess("server", REPO_DIR / "backend")
+    assert result.returncode == 0, result.stderr
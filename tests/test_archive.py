@@ -0,0 +1,45 @@
+"""
+Tests for the archive file format. No database is needed: files are written and read directly.
+"""
+import gzip
+import hashlib
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from bson import json_util
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+
+
+def make_row(i):
+    return {
+        "id": f"sub-{i}", "template_id": "template-1", "submitted_by": "user-1", "service_location": "Central Hub",
+        "month_year": "2024-01", "form_data": {"clients_served": i}, "submitted_at": datetime(2024, 1, 1 + i % 28)
+    }
+
+
+def test_archive_blocks_round_trip_and_skip_superseded_rows(tmp_path):
+    path = tmp_path / "submissions-2024-01.json.gz"
+    archive_file = server.open_archive_file(path)
+    for start in range(0, 2500, 1000):
+        server.write_archive_block(archive_file, [make_row(i) for i in range(start, min(start + 1000, 2500))])
+    written = server.close_archive_file(archive_file, path)
+    assert not path.with_suffix(".tmp").exists()
+
+    blocks = list(server.read_archive_blocks(path, written["sha256"], skip_ids={"sub-5"}))
+    assert [len(block) for block in blocks] == [999, 1000, 500]
+    assert blocks[0][0] == make_row(0)  # absent columns don't come back as None
+
+
+def test_version_1_archives_still_read(tmp_path):
+    rows = [make_row(i) for i in range(3)]
+    columns = {column: [row.get(column) for row in rows] for column in server.ARCHIVE_COLUMNS}
+    payload = gzip.compress(json_util.dumps({"version": 1, "count": 3, "columns": columns}).encode())
+    path = tmp_path / "legacy.json.gz"
+    path.write_bytes(payload)
+
+    assert list(server.read_archive_blocks(path, hashlib.sha256(payload).hexdigest())) == [rows]
@@ -0,0 +1,118 @@
+"""
+Tests for Accept-Encoding negotiated response compression.
+
+These use a throwaway app wrapped in the server's middleware, so no database is needed.
+"""
+import gzip
+import sys
+from pathlib import Path
+
+import zstandard
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+
+CSV_ROWS = [f"{i},row {i},Central Hub\n".encode() for i in range(20000)]
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.get("/csv")
+    async def csv_export():
+        async def chunks():
+            for start in range(0, len(CSV_ROWS), 1000):
+                yield b"".join(CSV_ROWS[start:start + 1000])
+        return StreamingResponse(chunks(), media_type="text/csv")
+
+    @app.get("/tagged")
+    async def tagged():
+        response = JSONResponse([{"row": i} for i in range(500)])
+        server.set_etag(response, '"submissions-abc-1"')
+        return response
+
+    @app.get("/small")
+    async def small():
+        return {"status": "ok"}
+
+    @app.get("/events")
+    async def events():
+        async def stream():
+            yield "event: progress\ndata: {}\n\n" * 200
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    app.add_middleware(server.CompressionMiddleware)
+    return TestClient(app)
+
+
+def raw_get(client, path, accept_encoding):
+    # Ask for the raw bytes so the test client doesn't decode them
+    with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_negotiate_encoding_prefers_zstd_and_honours_q_zero():
+    assert server.negotiate_encoding("gzip, deflate, br, zstd") == "zstd"
+    assert server.negotiate_encoding("gzip, zstd;q=0") == "gzip"
+    assert server.negotiate_encoding("gzip;q=0, identity") is None
+    assert server.negotiate_encoding("*") == "zstd"
+    assert server.negotiate_encoding("") is None
+
+
+def test_streaming_csv_is_gzip_compressed():
+    response, body = raw_get(build_app(), "/csv", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "accept-encoding" in response.headers["vary"].lower()
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body) == b"".join(CSV_ROWS)
+    assert len(body) < len(b"".join(CSV_ROWS)) / 3
+
+
+def test_streaming_csv_is_zstd_compressed():
+    response, body = raw_get(build_app(), "/csv", "gzip, zstd")
+    assert response.headers["content-encoding"] == "zstd"
+    decompressed = zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    assert decompressed == b"".join(CSV_ROWS)
+
+
+def test_small_and_event_stream_responses_are_not_compressed():
+    client = build_app()
+    response, body = raw_get(client, "/small", "gzip, zstd")
+    assert "content-encoding" not in response.headers
+    assert body == b'{"status":"ok"}'
+
+    response, body = raw_get(client, "/events", "gzip, zstd")
+    assert "content-encoding" not in response.headers
+    assert body.startswith(b"event: progress")
+
+
+def test_identity_when_client_does_not_accept_compression():
+    response, body = raw_get(build_app(), "/csv", "identity")
+    assert "content-encoding" not in response.headers
+    assert body == b"".join(CSV_ROWS)
+
+
+def test_compressed_responses_weaken_strong_etags():
+    client = build_app()
+    response, _ = raw_get(client, "/tagged", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == 'W/"submissions-abc-1"'
+
+    response, _ = raw_get(client, "/tagged", "identity")
+    assert response.headers["etag"] == '"submissions-abc-1"'
+
+
+def test_vary_is_sent_when_a_compressible_response_goes_out_uncompressed():
+    client = build_app()
+    for path, accept_encoding in (("/tagged", "identity"), ("/small", "gzip")):
+        response, _ = raw_get(client, path, accept_encoding)
+        assert "content-encoding" not in response.headers
+        assert "accept-encoding" in response.headers["vary"].lower()
+
+    response, _ = raw_get(client, "/events", "gzip")
+    assert "vary" not in response.headers
@@ -0,0 +1,233 @@
+"""
+Regression tests for the streaming submission exports (CSV, XLSX, NDJSON).
+
+The end-to-end export runs against the MongoDB configured in backend/.env (a
+throwaway database is created and dropped) and is skipped when no server is
+reachable.
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import resource
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from openpyxl import load_workbook
+from pymongo import MongoClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+import httpx  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+MONGO_URL = os.environ["MONGO_URL"]
+TEST_DB_NAME = f"{os.environ['DB_NAME']}_csv_export_test"
+EXPORT_ROWS = 500_000
+# Holding 500k rows (or the CSV text) in memory costs hundreds of MB; streaming should stay far below this
+MAX_RSS_GROWTH_MB = 64
+
+
+def mongo_available():
+    try:
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+def peak_rss_mb():
+    # ru_maxrss is reported in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_submission(i, start):
+    return {
+        "id": str(uuid.uuid4()),
+        "template_id": "template-1",
+        "submitted_by": "user-1",
+        "service_location": "Central Hub",
+        "month_year": "2025-01",
+        "form_data": {"clients_served": i, "notes": f"row {i} " * 4},
+        "attachments": [],
+        "submitted_at": start - timedelta(seconds=i),
+        "status": "submitted"
+    }
+
+
+async def generate_submissions(count):
+    start = datetime.utcnow()
+    for i in range(count):
+        yield make_submission(i, start)
+
+
+async def stream_asgi_get(app, path, headers):
+    """GET path through the ASGI app, counting body lines without keeping the body"""
+    state = {"status": None, "lines": 0}
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            state["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            state["lines"] += message.get("body", b"").count(b"\n")
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [(key.lower().encode(), value.encode()) for key, value in headers.items()],
+        "client": ("test", 0), "server": ("test", 80)
+    }
+    await app(scope, receive, send)
+    return state["status"], state["lines"]
+
+
+async def collect_csv(submissions, layout):
+    chunks = []
+    async for chunk in server.stream_submissions_csv(submissions, layout):
+        chunks.append(chunk)
+    return chunks
+
+
+async def iterate(items):
+    for item in items:
+        yield item
+
+
+def seed_usernames(usernames):
+    # Pre-resolved ids keep resolve_usernames from querying the database
+    server._username_directory.update({user_id: (username, time.time()) for user_id, username in usernames.items()})
+
+
+def test_csv_stream_yields_bounded_chunks():
+    seed_usernames({"user-1": "clerk"})
+    layout = {"fields": [("clients_served", "Clients Served"), ("notes", "Notes")], "template_names": {}}
+    chunks = asyncio.run(collect_csv(generate_submissions(5000), layout))
+    assert len(chunks) > 1
+    # Each chunk is flushed right after crossing the threshold, so it only overshoots by one row
+    assert all(len(chunk) < server.EXPORT_CHUNK_BYTES * 2 for chunk in chunks)
+    lines = b"".join(chunks).decode().splitlines()
+    assert lines[0] == "ID,Template,Location,Month/Year,Submitted By,Submitted At,Clients Served,Notes,Other Fields"
+    assert len(lines) == 5001
+
+
+def test_csv_columns_follow_template_layout():
+    seed_usernames({"user-1": "clerk", "user-2": "manager"})
+    layout = {
+        "fields": [("clients_served", "Clients Served"), ("notes", "Notes"), ("vehicles", "Vehicles")],
+        "template_names": {"template-1": "Monthly Intake", "template-2": "Fleet"}
+    }
+    start = datetime.utcnow()
+    first = make_submission(1, start)
+    second = make_submission(2, start)
+    # Different key order, a field from another template and a key no template defines
+    second.update({
+        "template_id": "template-2",
+        "submitted_by": "user-2",
+        "form_data": {"vehicles": ["van", "truck"], "legacy_code": "X1", "clients_served": 7}
+    })
+    chunks = asyncio.run(collect_csv(iterate([first, second]), layout))
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+
+    assert rows[0]["Template"] == "Monthly Intake"
+    assert rows[0]["Submitted By"] == "clerk"
+    assert rows[0]["Clients Served"] == "1"
+    assert rows[0]["Vehicles"] == ""
+    assert rows[0]["Other Fields"] == ""
+    assert rows[1]["Template"] == "Fleet"
+    assert rows[1]["Submitted By"] == "manager"
+    assert rows[1]["Clients Served"] == "7"
+    assert rows[1]["Notes"] == ""
+    assert rows[1]["Vehicles"] == "van; truck"
+    assert json.loads(rows[1]["Other Fields"]) == {"legacy_code": "X1"}
+
+
+def test_xlsx_and_ndjson_share_the_csv_layout():
+    seed_usernames({"user-1": "clerk"})
+    layout = {"fields": [("clients_served", "Clients Served"), ("notes", "Notes")], "template_names": {"template-1": "Monthly Intake"}}
+
+    async def collect_bytes(writer, count):
+        chunks = []
+        async for chunk in writer(generate_submissions(count), layout):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    workbook = load_workbook(io.BytesIO(asyncio.run(collect_bytes(server.stream_submissions_xlsx, 2500))), read_only=True)
+    rows = list(workbook.active.iter_rows(values_only=True))
+    assert list(rows[0]) == server.export_header(layout)
+    assert len(rows) == 2501
+    assert rows[1][1] == "Monthly Intake"
+    assert rows[1][4] == "clerk"
+    assert isinstance(rows[1][5], datetime)
+
+    records = [json.loads(line) for line in asyncio.run(collect_bytes(server.stream_submissions_ndjson, 2500)).splitlines()]
+    assert len(records) == 2500
+    assert records[0]["template_name"] == "Monthly Intake"
+    assert records[0]["submitted_by_username"] == "clerk"
+    assert records[0]["form_data"]["clients_served"] == 0
+    datetime.fromisoformat(records[0]["submitted_at"])
+
+
+def test_xlsx_strips_control_characters_and_rolls_over_at_the_row_limit(monkeypatch):
+    seed_usernames({"user-1": "clerk"})
+    monkeypatch.setattr(server, "XLSX_MAX_ROWS", 1001)
+    layout = {"fields": [("clients_served", "Clients Served"), ("notes", "Notes")], "template_names": {}}
+
+    async def submissions():
+        async for submission in generate_submissions(2500):
+            submission["form_data"]["notes"] = "line\x00one\x0bbreak"
+            yield submission
+
+    async def collect_bytes():
+        return b"".join([chunk async for chunk in server.stream_submissions_xlsx(submissions(), layout)])
+
+    workbook = load_workbook(io.BytesIO(asyncio.run(collect_bytes())), read_only=True)
+    assert workbook.sheetnames == ["Submissions", "Submissions (2)", "Submissions (3)"]
+    sheets = [list(worksheet.iter_rows(values_only=True)) for worksheet in workbook.worksheets]
+    assert [len(rows) for rows in sheets] == [1001, 1001, 501]
+    assert all(list(rows[0]) == server.export_header(layout) for rows in sheets)
+    assert sheets[0][1][7] == "lineonebreak"
+
+
+@pytest.mark.skipif(not mongo_available(), reason="MongoDB is not reachable")
+def test_csv_export_of_500k_rows_streams_in_constant_memory():
+    async def export():
+        client = AsyncIOMotorClient(MONGO_URL)
+        original_client, original_db = server.client, server.db
+        server.client, server.db = client, client[TEST_DB_NAME]
+        try:
+            await client.drop_database(TEST_DB_NAME)
+            await server.initialize_default_data()
+            start = datetime.utcnow()
+            for offset in range(0, EXPORT_ROWS, 10_000):
+                await server.db.data_submissions.insert_many(
+                    [make_submission(i, start) for i in range(offset, min(offset + 10_000, EXPORT_ROWS))]
+                )
+
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                login = await http.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+                headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+            # httpx's ASGI transport buffers whole bodies, so drive the app directly and discard chunks
+            baseline = peak_rss_mb()
+            status, lines = await stream_asgi_get(server.app, "/api/reports/csv", headers)
+            assert status == 200
+            return lines, peak_rss_mb() - baseline
+        finally:
+            await client.drop_database(TEST_DB_NAME)
+            client.close()
+            server.client, server.db = original_client, original_db
+
+    lines, growth_mb = asyncio.run(export())
+    assert lines == EXPORT_ROWS + 1
+    assert growth_mb < MAX_RSS_GROWTH_MB, f"peak RSS grew by {growth_mb:.1f} MB"
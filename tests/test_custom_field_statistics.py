@@ -0,0 +1,77 @@
+"""
+Tests for numeric custom-field statistics.
+
+These run against the MongoDB configured in backend/.env (a throwaway database
+is created and dropped) and are skipped when no server is reachable.
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from pymongo import MongoClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+MONGO_URL = os.environ["MONGO_URL"]
+TEST_DB_NAME = f"{os.environ['DB_NAME']}_custom_field_test"
+ADMIN = server.TokenPrincipal(id="admin-1", username="admin", role="admin")
+
+
+def mongo_available():
+    try:
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not mongo_available(), reason="MongoDB is not reachable")
+
+
+def submission(i, field_type, value, derived=True):
+    document = {
+        "id": f"sub-{i}", "template_id": "template-1", "service_location": "Central Hub", "month_year": "2025-01",
+        "submitted_by": "user-1", "submitted_at": datetime(2025, 1, 1 + i), "status": "submitted",
+        "form_data": {"clients": value}
+    }
+    if derived:
+        document.update(server.derive_submission_fields(document["form_data"], [{"name": "clients", "type": field_type}]))
+    return document
+
+
+async def numeric_stats(documents):
+    client = AsyncIOMotorClient(MONGO_URL)
+    original_client, original_db = server.client, server.db
+    server.client, server.db = client, client[TEST_DB_NAME]
+    try:
+        await client.drop_database(TEST_DB_NAME)
+        await server.db.data_submissions.insert_many(documents)
+        query = server.StatisticsQuery(custom_field_name="clients", custom_field_analysis_type="numerical")
+        return (await server.generate_custom_field_statistics(query, ADMIN))["results"]
+    finally:
+        await client.drop_database(TEST_DB_NAME)
+        server.client, server.db = original_client, original_db
+        client.close()
+
+
+def test_text_typed_numeric_fields_still_get_numeric_stats():
+    results = asyncio.run(numeric_stats([submission(0, "text", "12"), submission(1, "text", "30"), submission(2, "text", "n/a")]))
+    assert results[0]["total_count"] == 2
+    assert results[0]["sum"] == 42
+
+
+def test_number_fields_use_typed_values_and_unindexed_rows_fall_back():
+    results = asyncio.run(numeric_stats([
+        submission(0, "number", "1,200"),
+        submission(1, "number", "1,5"),  # ambiguous: never stored as a number, and doesn't convert either
+        submission(2, "number", "8", derived=False)
+    ]))
+    assert results[0]["total_count"] == 2
+    assert results[0]["sum"] == 1208
@@ -0,0 +1,102 @@
+"""
+Tests for Idempotency-Key handling.
+
+The key tests run against the MongoDB configured in backend/.env (a throwaway
+database is created and dropped) and are skipped when no server is reachable.
+"""
+import asyncio
+import io
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from pymongo import MongoClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+MONGO_URL = os.environ["MONGO_URL"]
+TEST_DB_NAME = f"{os.environ['DB_NAME']}_idempotency_test"
+
+
+def mongo_available():
+    try:
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+requires_mongo = pytest.mark.skipif(not mongo_available(), reason="MongoDB is not reachable")
+
+
+async def run_with_test_db(scenario):
+    client = AsyncIOMotorClient(MONGO_URL)
+    original_client, original_db = server.client, server.db
+    server.client, server.db = client, client[TEST_DB_NAME]
+    try:
+        await client.drop_database(TEST_DB_NAME)
+        return await scenario()
+    finally:
+        await client.drop_database(TEST_DB_NAME)
+        server.client, server.db = original_client, original_db
+        client.close()
+
+
+@requires_mongo
+def test_key_replays_only_after_the_request_completed():
+    async def scenario():
+        assert await server.claim_idempotency_key("user-1", "submissions", "key-1", {"id": "sub-1"}, "abc") is None
+        with pytest.raises(HTTPException) as pending:
+            await server.claim_idempotency_key("user-1", "submissions", "key-1", {"id": "sub-2"}, "abc")
+        assert pending.value.status_code == 409
+
+        await server.complete_idempotency_key("user-1", "submissions", "key-1", {"id": "sub-1"})
+        claim = await server.claim_idempotency_key("user-1", "submissions", "key-1", {"id": "sub-3"}, "abc")
+        assert claim == {"response": {"id": "sub-1"}}
+
+        with pytest.raises(HTTPException) as mismatch:
+            await server.claim_idempotency_key("user-1", "submissions", "key-1", {"id": "sub-4"}, "def")
+        assert mismatch.value.status_code == 422
+
+    asyncio.run(run_with_test_db(scenario))
+
+
+@requires_mongo
+def test_released_key_can_be_claimed_again():
+    async def scenario():
+        assert await server.claim_idempotency_key("user-1", "upload", "key-2", {"filename": "a.csv"}, "abc") is None
+        await server.release_idempotency_key("user-1", "upload", "key-2")
+        assert await server.claim_idempotency_key("user-1", "upload", "key-2", {"filename": "b.csv"}, "abc") is None
+
+    asyncio.run(run_with_test_db(scenario))
+
+
+@requires_mongo
+def test_stale_pending_claim_is_taken_over_once():
+    async def scenario():
+        assert await server.claim_idempotency_key("user-1", "submissions", "key-3", {"id": "sub-1"}, "abc") is None
+        # The claiming request died without completing or releasing the key
+        stale = datetime.utcnow() - timedelta(seconds=server.IDEMPOTENCY_CLAIM_TIMEOUT + 1)
+        await server.db.idempotency_keys.update_one({"_id": "user-1:submissions:key-3"}, {"$set": {"claimed_at": stale}})
+
+        claim = await server.claim_idempotency_key("user-1", "submissions", "key-3", {"id": "sub-2"}, "abc")
+        assert claim == {"pending": {"id": "sub-1"}}  # finish the dead request's work under its id
+        with pytest.raises(HTTPException) as renewed:
+            await server.claim_idempotency_key("user-1", "submissions", "key-3", {"id": "sub-3"}, "abc")
+        assert renewed.value.status_code == 409
+
+    asyncio.run(run_with_test_db(scenario))
+
+
+def test_upload_fingerprint_hashes_the_content():
+    upload = io.BytesIO(b"a,b\n1,2\n")
+    fingerprint = server.upload_sha256(upload)
+    assert upload.read() == b"a,b\n1,2\n"  # rewound for saving
+    assert fingerprint != server.upload_sha256(io.BytesIO(b"a,b\n1,3\n"))
@@ -0,0 +1,193 @@
+"""
+Tests for PDF rendering on the process pool, the rendered-PDF cache and month-close report packs.
+No database is needed: the renderer takes already-aggregated data.
+"""
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+import report_rendering  # noqa: E402
+from report_rendering import LazyStory, render_detailed_report, render_pdf_report  # noqa: E402
+
+REPORT = {
+    "report_type": "statistics",
+    "scope": "All locations",
+    "generated_at": "2025-01-31 12:00:00 UTC",
+    "parameters": [["Group By:", "location"]],
+    "statistics": {
+        "summary": {
+            "total_submissions": 30, "total_approved": 20, "total_reviewed": 5,
+            "total_submitted": 3, "total_rejected": 2, "approval_rate": 66.67
+        },
+        "data": [
+            {"category": f"Hub {i}", "total_submissions": 10, "approved_count": 7, "reviewed_count": 1,
+             "submitted_count": 1, "rejected_count": 1, "unique_user_count": 2}
+            for i in range(3)
+        ]
+    }
+}
+
+
+def test_render_pdf_report_returns_pdf_bytes():
+    content = render_pdf_report(REPORT)
+    assert content.startswith(b"%PDF-")
+
+
+def test_pool_renders_and_enforces_per_user_limit():
+    async def render_concurrently():
+        return await asyncio.gather(
+            *[server.run_pdf_render(render_pdf_report, REPORT, "user-1") for _ in range(server.PDF_RENDER_PER_USER + 1)],
+            return_exceptions=True
+        )
+
+    results = asyncio.run(render_concurrently())
+    rendered = [result for result in results if isinstance(result, bytes)]
+    rejected = [result for result in results if isinstance(result, HTTPException)]
+    assert len(rendered) == server.PDF_RENDER_PER_USER
+    assert all(content.startswith(b"%PDF-") for content in rendered)
+    assert len(rejected) == 1
+    assert rejected[0].status_code == 429
+    assert rejected[0].headers["Retry-After"] == str(server.PDF_RENDER_RETRY_AFTER)
+
+    stats = server.get_pdf_render_stats()
+    assert stats["completed"] >= server.PDF_RENDER_PER_USER
+    assert stats["rejected_user_limit"] >= 1
+    assert stats["in_flight"] == 0
+
+
+def test_lazy_story_only_pulls_flowables_as_they_are_consumed():
+    pulled = []
+
+    def source():
+        for i in range(3):
+            pulled.append(i)
+            yield i
+
+    story = LazyStory(source())
+    assert pulled == []
+    assert len(story) == 1 and story[0] == 0
+    del story[0]
+    assert len(story) == 1 and pulled == [0, 1]
+    story.insert(0, "split remainder")
+    assert len(story) == 2 and pulled == [0, 1]
+
+
+def test_detailed_report_renders_rows_from_file_in_chunks(tmp_path, monkeypatch):
+    tables = []
+    original_table = report_rendering.detailed_table
+
+    def tracking_table(rows, cell_style):
+        tables.append(len(rows))
+        return original_table(rows, cell_style)
+
+    monkeypatch.setattr(report_rendering, "detailed_table", tracking_table)
+    rows_path = tmp_path / "rows.ndjson"
+    with open(rows_path, "w") as rows_file:
+        for i in range(1000):
+            rows_file.write(json.dumps(["2025-01-31 12:00", "Central Hub", "Monthly Intake", "clerk", "approved",
+                                        f"Clients Served: {i}; Notes: <b>row</b> & more"]) + "\n")
+
+    content = render_detailed_report({**REPORT, "report_type": "detailed", "rows_path": str(rows_path), "row_count": 1000})
+    assert content.startswith(b"%PDF-")
+    assert content.count(b"/Type /Page\n") > 10
+    assert tables == [report_rendering.DETAILED_CHUNK_ROWS] * (1000 // report_rendering.DETAILED_CHUNK_ROWS)
+
+
+def test_detailed_reports_are_limited_to_admins_and_managers():
+    clerk = server.TokenPrincipal(id="user-1", username="clerk", role="data_entry", assigned_location="Central Hub")
+    manager = server.TokenPrincipal(id="manager-1", username="hub", role="manager", assigned_location="Central Hub")
+    with pytest.raises(HTTPException) as denied:
+        server.check_pdf_report_access("detailed", clerk)
+    assert denied.value.status_code == 403
+    server.check_pdf_report_access("detailed", manager)
+
+
+def test_pdf_cache_key_ignores_empty_params_and_tracks_data_version():
+    admin = server.TokenPrincipal(id="admin-1", username="admin", role="admin")
+    other_admin = server.TokenPrincipal(id="admin-2", username="second", role="admin")
+    manager = server.TokenPrincipal(id="manager-1", username="hub", role="manager", assigned_location="Central Hub")
+
+    key = server.pdf_cache_key("statistics", '{"group_by": "location", "locations": []}', admin)
+    # Same scope and equivalent params share a key; another scope doesn't
+    assert key == server.pdf_cache_key("statistics", '{"locations": [], "group_by": "location"}', other_admin)
+    assert key != server.pdf_cache_key("statistics", '{"group_by": "location"}', manager)
+
+    server.bump_collection_version("data_submissions")
+    assert key != server.pdf_cache_key("statistics", '{"group_by": "location"}', admin)
+
+
+def test_pdf_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "PDF_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(server, "PDF_CACHE_MAX_BYTES", 250)
+    monkeypatch.setattr(server, "PDF_CACHE_EVICT_GRACE", 0)
+    monkeypatch.setattr(server, "_pdf_cache", server.OrderedDict())
+    monkeypatch.setattr(server, "_pdf_cache_bytes", 0)
+    monkeypatch.setattr(server, "_pdf_cache_evicted", server.deque())
+
+    def store(key, content):
+        return server.store_cached_pdf(key, server.write_cached_pdf(key, content), len(content))
+
+    first = store("first", b"%PDF-" + b"1" * 95)
+    store("second", b"%PDF-" + b"2" * 95)
+    assert server.get_cached_pdf("first") == first  # now most recently used
+    store("third", b"%PDF-" + b"3" * 95)
+
+    assert server.get_cached_pdf("second") is None
+    assert server.get_cached_pdf("first") == first
+    assert server.get_cached_pdf("third") is not None
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["first.pdf", "third.pdf"]
+
+
+def test_evicted_pdfs_outlive_the_grace_period(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "PDF_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(server, "PDF_CACHE_MAX_BYTES", 150)
+    monkeypatch.setattr(server, "_pdf_cache", server.OrderedDict())
+    monkeypatch.setattr(server, "_pdf_cache_bytes", 0)
+    monkeypatch.setattr(server, "_pdf_cache_evicted", server.deque())
+
+    first = server.write_cached_pdf("first", b"%PDF-" + b"1" * 95)
+    server.store_cached_pdf("first", first, 100)
+    server.store_cached_pdf("second", server.write_cached_pdf("second", b"%PDF-" + b"2" * 95), 100)
+    # Evicted from the index, but a response that already looked it up can still open it
+    assert server.get_cached_pdf("first") is None
+    assert first.exists()
+    assert server.get_pdf_cache_stats()["bytes"] == 100
+
+
+def test_report_pack_month_is_the_month_before_the_deadline():
+    deadline = server.parse_report_deadline("2025-01-10T00:00:00.000Z")
+    assert deadline == server.datetime(2025, 1, 10)
+    assert server.report_pack_month(deadline) == "2024-12"
+    assert server.report_pack_month(server.datetime(2025, 7, 5)) == "2025-06"
+    assert server.parse_report_deadline("not a date") is None
+
+
+def test_chart_drawings_are_shared_by_reports_with_the_same_aggregates():
+    report_rendering.chart_drawings.cache_clear()
+    charts = server.report_chart_data(
+        REPORT["statistics"]["data"],
+        [{"category": month, "total_submissions": 10, "approved_count": 7} for month in ("2025-02", "2025-01")]
+    )
+    assert [row[0] for row in charts["by_month"]] == ["2025-01", "2025-02"]
+
+    first = render_pdf_report({**REPORT, "charts": charts})
+    # Another variant of the report (different parameters) over the same aggregates
+    second = render_pdf_report({**REPORT, "parameters": [["Group By:", "month"]], "charts": dict(reversed(charts.items()))})
+    assert first.startswith(b"%PDF-") and second.startswith(b"%PDF-")
+    info = report_rendering.chart_drawings.cache_info()
+    assert (info.misses, info.hits) == (1, 1)
+
+
+def test_trend_chart_covers_trailing_months_only(monkeypatch):
+    monkeypatch.setattr(server, "REPORT_TREND_MONTHS", 12)
+    months = [f"{year}-{month:02d}" for year in (2023, 2024, 2025) for month in range(1, 13)]
+    charts = server.report_chart_data([], [{"category": month, "total_submissions": 1, "approved_count": 0} for month in months])
+    assert [row[0] for row in charts["by_month"]] == months[-12:]
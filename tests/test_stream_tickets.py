@@ -0,0 +1,38 @@
+"""
+Tests for the single-use tickets that authenticate EventSource streams.
+
+Only the ticket bookkeeping is exercised, so no database is needed.
+"""
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+
+
+def test_ticket_redeems_once():
+    ticket = server.issue_stream_ticket("jwt-token")
+    assert "jwt-token" not in ticket
+    assert server.redeem_stream_ticket(ticket) == "jwt-token"
+    assert server.redeem_stream_ticket(ticket) is None
+
+
+def test_unknown_ticket_is_rejected():
+    assert server.redeem_stream_ticket("not-a-ticket") is None
+
+
+def test_expired_ticket_is_rejected_and_purged(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(server.time, "time", lambda: now[0])
+    stale = server.issue_stream_ticket("jwt-token")
+    now[0] += server.STREAM_TICKET_TTL + 1
+    assert server.redeem_stream_ticket(stale) is None
+
+    another = server.issue_stream_ticket("jwt-token")
+    fresh = server.issue_stream_ticket("jwt-token")
+    now[0] += server.STREAM_TICKET_TTL + 1
+    server.issue_stream_ticket("jwt-token")
+    assert another not in server._stream_tickets
+    assert fresh not in server._stream_tickets
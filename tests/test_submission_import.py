@@ -0,0 +1,48 @@
+"""
+Tests for parsing bulk submission imports. No database is needed: parsing and validation run before
+anything is inserted.
+"""
+import asyncio
+import io
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+
+
+def collect_rows(upload_file, file_format):
+    async def collect():
+        return [item async for item in server.iter_import_chunks(upload_file, file_format)]
+    return asyncio.run(collect())
+
+
+def test_import_rows_are_parsed_in_chunks_and_the_upload_stays_open():
+    upload_file = io.BytesIO(("name,clients\n" + "".join(f"row {i},{i}\n" for i in range(2500))).encode())
+    assert server.check_import_file(upload_file, "csv") is None
+    assert upload_file.tell() == 0 and not upload_file.closed
+
+    rows = collect_rows(upload_file, "csv")
+    assert len(rows) == 2500
+    assert rows[-1] == (2500, {"name": "row 2499", "clients": "2499"})
+
+
+def test_undecodable_and_malformed_files_are_rejected_up_front():
+    assert server.check_import_file(io.BytesIO("name\nCafé\n".encode("latin-1")), "csv") == "File is not valid UTF-8"
+    # A field past csv's size limit is one of the ways csv.Error surfaces
+    error = server.check_import_file(io.BytesIO(b"name,notes\nok,fine\nbad," + b"x" * 200_000 + b"\n"), "csv")
+    assert error and error.startswith("Malformed CSV after row 1")
+    assert server.check_import_file(io.BytesIO(b'{"a": 1}\nnot json\n'), "ndjson") is None
+
+
+def test_number_fields_only_accept_commas_as_thousands_separators():
+    assert server.coerce_field_value("number", "1,234") == 1234.0
+    assert server.coerce_field_value("number", "-1,234,567.5") == -1234567.5
+    assert server.coerce_field_value("number", " 15 ") == 15.0
+    for ambiguous in ("1,5", "12,34", "1,2345", ",100"):
+        with pytest.raises(ValueError):
+            server.coerce_field_value("number", ambiguous)
@@ -0,0 +1,150 @@
+"""
+Query-count regression tests for submission listings.
+
+These run against the MongoDB configured in backend/.env (a throwaway database
+is created and dropped) and are skipped when no server is reachable.
+"""
+import asyncio
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from pymongo import MongoClient, monitoring
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import server  # noqa: E402
+import httpx  # noqa: E402
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+MONGO_URL = os.environ["MONGO_URL"]
+TEST_DB_NAME = f"{os.environ['DB_NAME']}_query_count_test"
+IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "buildInfo", "saslStart", "saslContinue"}
+
+
+def mongo_available():
+    try:
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not mongo_available(), reason="MongoDB is not reachable")
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = []
+
+    def started(self, event):
+        if event.command_name not in IGNORED_COMMANDS:
+            self.commands.append(event.command_name)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def seed_submissions(db, count, user_count):
+    users = [{"id": str(uuid.uuid4()), "username": f"clerk_{i}", "role": "data_entry"} for i in range(user_count)]
+    await db.users.insert_many([dict(user) for user in users])
+    start = datetime.utcnow()
+    await db.data_submissions.insert_many([
+        {
+            "id": str(uuid.uuid4()),
+            "template_id": "template-1",
+            "submitted_by": users[i % user_count]["id"],
+            "service_location": "Central Hub",
+            "month_year": "2025-01",
+            "form_data": {"clients_served": i},
+            "attachments": [],
+            "submitted_at": start - timedelta(minutes=i),
+            "status": "submitted"
+        }
+        for i in range(count)
+    ])
+
+
+async def count_commands_per_page(page_sizes):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(MONGO_URL, event_listeners=[counter])
+    original_client, original_db = server.client, server.db
+    server.client, server.db = client, client[TEST_DB_NAME]
+    try:
+        await client.drop_database(TEST_DB_NAME)
+        await server.ensure_indexes()
+        await server.initialize_default_data()
+        await seed_submissions(server.db, count=600, user_count=150)
+
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            login = await http.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+            headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+            counts = {}
+            for page_size in page_sizes:
+                # Start every measurement from a cold username directory
+                server._username_directory.clear()
+                # Warm the principal cache so only listing queries are counted
+                await http.get("/api/auth/me", headers=headers)
+                counter.commands.clear()
+                response = await http.get("/api/submissions-detailed", params={"limit": page_size}, headers=headers)
+                assert response.status_code == 200
+                body = response.json()
+                assert len(body["items"]) == page_size
+                assert all(item["submitted_by_username"].startswith("clerk_") for item in body["items"])
+                counts[page_size] = list(counter.commands)
+            return counts
+    finally:
+        await client.drop_database(TEST_DB_NAME)
+        client.close()
+        server.client, server.db = original_client, original_db
+
+
+def test_detailed_submissions_command_count_is_independent_of_page_size():
+    counts = asyncio.run(count_commands_per_page([5, 50, 500]))
+    assert counts[5] == counts[50] == counts[500], counts
+    # One page query plus one batched username lookup
+    assert len(counts[500]) <= 2, counts[500]
+
+
+def test_detailed_submissions_are_sorted_newest_first():
+    async def fetch():
+        client = AsyncIOMotorClient(MONGO_URL)
+        original_client, original_db = server.client, server.db
+        server.client, server.db = client, client[TEST_DB_NAME]
+        try:
+            await client.drop_database(TEST_DB_NAME)
+            await server.initialize_default_data()
+            await seed_submissions(server.db, count=50, user_count=5)
+            transport = httpx.ASGITransport(app=server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+                login = await http.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+                headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+                items, cursor = [], None
+                while True:
+                    params = {"limit": 20}
+                    if cursor:
+                        params["cursor"] = cursor
+                    body = (await http.get("/api/submissions-detailed", params=params, headers=headers)).json()
+                    items.extend(body["items"])
+                    cursor = body["next_cursor"]
+                    if not cursor:
+                        return items
+        finally:
+            await client.drop_database(TEST_DB_NAME)
+            client.close()
+            server.client, server.db = original_client, original_db
+
+    items = asyncio.run(fetch())
+    assert len(items) == 50
+    assert len({item["id"] for item in items}) == 50
+    timestamps = [item["submitted_at"] for item in items]
+    assert timestamps == sorted(timestamps, reverse=True)